@@ -1,2 +1,12 @@
-from fjlc.main import Lexicon
-from fjlc.main import LexiconClassifier
+__all__ = ["Lexicon", "LexiconClassifier"]
+
+
+def __getattr__(name):
+    """
+    Imports fjlc.main when Lexicon or LexiconClassifier is first accessed (PEP 562), so importing a submodule of fjlc
+    does not import the whole package
+    """
+    if name in __all__:
+        import fjlc.main
+        return getattr(fjlc.main, name)
+    raise AttributeError("module %r has no attribute %r" % (__name__, name))
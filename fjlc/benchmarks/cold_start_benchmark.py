@@ -0,0 +1,100 @@
+"""
+Measures the cold start of a LexiconClassifier: the time a fresh interpreter takes to create it from the JSON lexicon,
+options and dictionary files, and from the same model compiled to a binary model file (see model_artifact). Larger
+lexicons are made by adding seeded random phrases to the default lexicon.
+
+Usage: python -m fjlc.benchmarks.cold_start_benchmark [--phrases 300000] [--repeat 5]
+"""
+import argparse
+import json
+import os
+import random
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+import fjlc.main as main
+from fjlc.utils import json_utils
+
+# Run in a fresh interpreter, prints the seconds spent importing fjlc and creating the classifier as JSON
+CHILD_SCRIPT = """
+import json, sys, time
+start = time.perf_counter()
+import fjlc.main
+imported = time.perf_counter()
+fjlc.main.LexiconClassifier(**json.loads(sys.argv[1]))
+print(json.dumps({"import": imported - start, "init": time.perf_counter() - imported}))
+"""
+
+
+def generate_lexicon(file_name, num_phrases, seed=1337):
+    """
+    Writes the default lexicon with num_phrases random phrases of one to three words added
+    """
+    json_utils.to_json_file(file_name, create_lexicon(num_phrases, seed), False)
+
+
+def create_lexicon(num_phrases, seed=1337):
+    """
+    :return: Map of phrase to sentiment value of the default lexicon with num_phrases random phrases of one to three
+    words added
+    """
+    lexicon = json_utils.from_json_file(main.DEFAULT_LEXICON)
+    generator = random.Random(seed)
+    words = ["word%d" % i for i in range(max(1, num_phrases // 5))]
+    target = len(lexicon) + num_phrases
+    while len(lexicon) < target:
+        phrase = " ".join(generator.choice(words) for _ in range(generator.choice([1, 1, 2, 2, 3])))
+        lexicon[phrase] = round(generator.uniform(-5, 5), 4)
+    return lexicon
+
+
+def time_cold_start(arguments, repeat):
+    """
+    :param arguments: Keyword arguments of LexiconClassifier
+    :return: Median seconds of (process wall time, import time, classifier creation time) over repeat fresh processes
+    """
+    wall_times, import_times, init_times = [], [], []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        output = subprocess.check_output([sys.executable, "-c", CHILD_SCRIPT, json.dumps(arguments)])
+        wall_times.append(time.perf_counter() - start)
+        times = json.loads(output.decode("utf-8").strip().splitlines()[-1])
+        import_times.append(times["import"])
+        init_times.append(times["init"])
+    return statistics.median(wall_times), statistics.median(import_times), statistics.median(init_times)
+
+
+def main_benchmark(num_phrases, repeat):
+    directory = tempfile.mkdtemp()
+    try:
+        lexicon_file = main.DEFAULT_LEXICON
+        if num_phrases > 0:
+            lexicon_file = os.path.join(directory, "lexicon.json")
+            generate_lexicon(lexicon_file, num_phrases)
+        model_file = os.path.join(directory, "model.fjlc")
+        main.LexiconClassifier(lexicon_file).compile_model(model_file)
+
+        print("{:<8}{:>12}{:>12}{:>12}{:>14}".format("source", "size [B]", "wall [s]", "import [s]", "creation [s]"))
+        results = {}
+        for source, size, arguments in [
+                ("json", os.path.getsize(lexicon_file), {"lexicon": lexicon_file}),
+                ("model", os.path.getsize(model_file), {"model": model_file})]:
+            results[source] = time_cold_start(arguments, repeat)
+            print("{:<8}{:>12}{:>12.3f}{:>12.3f}{:>14.3f}".format(source, size, *results[source]))
+
+        print("Creating the classifier from the compiled model is {:.1f}x faster".format(
+            results["json"][2] / results["model"][2]))
+    finally:
+        shutil.rmtree(directory)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Cold start benchmark of LexiconClassifier")
+    parser.add_argument("--phrases", type=int, default=300000, help="Number of random phrases added to the lexicon")
+    parser.add_argument("--repeat", type=int, default=5, help="Number of fresh processes per source")
+    args = parser.parse_args()
+    main_benchmark(args.phrases, args.repeat)
@@ -0,0 +1,52 @@
+"""
+Measures throughput of the tweet filter chains, before (Filters.apply) and after (Filters.compile().apply).
+
+Usage: python -m fjlc.benchmarks.filters_benchmark [--tweets 20000] [--repeat 3]
+"""
+import argparse
+import time
+
+import fjlc.lexical_classifier as lexical_classifier
+import fjlc.main as main
+import fjlc.preprocessing.filters.canonical_form as canonical_form
+from fjlc.benchmarks.synthetic_corpus import SyntheticCorpus, DATA_DIR
+
+FILTERS = {
+    "classifier": lexical_classifier.CLASSIFIER_FILTERS,
+    "n-gram": main.N_GRAM_FILTERS,
+    "tweet": main.TWEET_FILTERS,
+}
+
+
+def tweets_per_second(filters, tweets, repeat):
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for tweet in tweets:
+            filters.apply(tweet)
+        best = min(best, time.perf_counter() - start)
+    return len(tweets) / best
+
+
+def main_benchmark(num_tweets, repeat):
+    canonical_form.load_dictionary(DATA_DIR + "/canonical.json")
+    tweets = SyntheticCorpus().generate_tweets(num_tweets)
+
+    print("{:<12}{:>16}{:>16}{:>10}".format("filters", "before [t/s]", "after [t/s]", "speedup"))
+    for name, filters in FILTERS.items():
+        compiled = filters.compile()
+        for tweet in tweets:
+            if filters.apply(tweet) != compiled.apply(tweet):
+                raise AssertionError("Compiled {} filters differ on: {!r}".format(name, tweet))
+
+        before = tweets_per_second(filters, tweets, repeat)
+        after = tweets_per_second(compiled, tweets, repeat)
+        print("{:<12}{:>16.0f}{:>16.0f}{:>9.2f}x".format(name, before, after, after / before))
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Benchmark of the tweet filter chains")
+    parser.add_argument("--tweets", type=int, default=20000, help="Number of synthetic tweets")
+    parser.add_argument("--repeat", type=int, default=3, help="Number of timed runs, best is reported")
+    args = parser.parse_args()
+    main_benchmark(args.tweets, args.repeat)
@@ -0,0 +1,70 @@
+"""
+Compares the memory used by a PriorPolarityLexicon, which holds every phrase and polarity as Python objects in a dict,
+with a FlatPolarityLexicon of the same phrases, which holds them in a few flat buffers, and the time both take to look
+up phrases. Large lexicons are made by adding seeded random phrases to the default lexicon.
+
+Usage: python -m fjlc.benchmarks.lexicon_memory_benchmark [--phrases 3000000] [--lookups 200000]
+"""
+import argparse
+import random
+import time
+import tracemalloc
+
+from fjlc.benchmarks.cold_start_benchmark import create_lexicon
+from fjlc.lexicon.container.prior_polarity_lexicon import FlatPolarityLexicon, PriorPolarityLexicon
+
+
+def measure(create):
+    """
+    :param create: Callable that creates a lexicon
+    :return: (lexicon, bytes still allocated after creating it, peak bytes allocated while creating it) tuple
+    """
+    tracemalloc.start()
+    lexicon = create()
+    current, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return lexicon, current, peak
+
+
+def time_lookups(lexicon, phrases):
+    """
+    :return: Seconds taken to check and look up the polarity of every phrase
+    """
+    start = time.perf_counter()
+    for phrase in phrases:
+        if lexicon.has_token(phrase):
+            lexicon.get_token_polarity(phrase)
+    return time.perf_counter() - start
+
+
+def main_benchmark(num_phrases, num_lookups):
+    polarity_lexicon, dict_bytes, dict_peak = measure(lambda: create_lexicon(num_phrases))
+    lexicons = [("dict", PriorPolarityLexicon(polarity_lexicon), dict_bytes, dict_peak)]
+    for name, typecode in [("flat float64", "d"), ("flat float32", "f")]:
+        lexicon, current, peak = measure(lambda: FlatPolarityLexicon.from_lexicon(polarity_lexicon, typecode))
+        lexicons.append((name, lexicon, current, peak))
+
+    # Half of the looked up phrases are in the lexicon
+    generator = random.Random(42)
+    phrases = generator.sample(list(polarity_lexicon), min(num_lookups // 2, len(polarity_lexicon)))
+    phrases.extend("missing phrase %d" % i for i in range(len(phrases)))
+    generator.shuffle(phrases)
+
+    mebibyte = float(1 << 20)
+    print("{} phrases, {} look ups".format(len(polarity_lexicon), len(phrases)))
+    print("{:<14}{:>14}{:>16}{:>16}{:>16}".format("lexicon", "memory [MiB]", "B per phrase", "peak [MiB]",
+                                                  "look ups [s]"))
+    for name, lexicon, current, peak in lexicons:
+        print("{:<14}{:>14.1f}{:>16.1f}{:>16.1f}{:>16.3f}".format(
+            name, current / mebibyte, current / float(len(polarity_lexicon)), peak / mebibyte,
+            time_lookups(lexicon, phrases)))
+    print("The flat float64 lexicon uses {:.1f}x less memory (reported: {} B)".format(
+        dict_bytes / float(lexicons[1][2]), lexicons[1][1].get_memory_usage()))
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Memory benchmark of dict and flat sentiment lexicons")
+    parser.add_argument("--phrases", type=int, default=3000000, help="Number of random phrases added to the lexicon")
+    parser.add_argument("--lookups", type=int, default=200000, help="Number of phrases looked up")
+    args = parser.parse_args()
+    main_benchmark(args.phrases, args.lookups)
@@ -0,0 +1,120 @@
+"""
+Compares the memory used by the n-gram tree (TweetNGramsPMI.NGramTree) with the compact NGramCounts store, and the
+memory freed by pruning infrequent n-grams. Then measures end-to-end how many tweets each store, with and without
+periodic pruning as in TweetNGramsPMI.count_n_grams, counts before its memory exceeds a fixed cap.
+
+The stores on their own count the same n-grams, and NGramCounts fits about 3x more tweets in the cap. Pruning fits far
+more, but it is lossy and opt-in (see TweetNGramsPMI prune_interval): n-grams that become frequent late are missed.
+
+Usage: python -m fjlc.benchmarks.n_gram_memory_benchmark [--tweets 20000] [--n 3] [--prune-limit 2]
+                                                         [--memory-cap 10] [--max-tweets 200000]
+                                                         [--prune-interval 2000] [--min-frequency 0.0005]
+"""
+import argparse
+import math
+import random
+import tracemalloc
+
+import fjlc.main as main
+from fjlc.benchmarks.synthetic_corpus import SyntheticCorpus
+from fjlc.preprocessing.preprocessors.n_gram_counts import NGramCounts
+from fjlc.preprocessing.preprocessors.tweet_n_grams_pmi import TweetNGramsPMI, add_tweet
+
+# Number of tweets between each check of the memory against the cap of measure_capacity
+CAPACITY_CHECK_INTERVAL = 500
+
+
+def measure(store, tweets, n, prune_limit):
+    """
+    :return: Bytes allocated by store after counting tweets, and after pruning n-grams with fewer than prune_limit
+    occurrences
+    """
+    tracemalloc.start()
+    for tweet in tweets:
+        add_tweet(store, tweet, n)
+    counted = tracemalloc.get_traced_memory()[0]
+    store.prune_infrequent(prune_limit)
+    pruned = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    return counted, pruned
+
+
+def measure_capacity(store, tweets, n, memory_cap, prune_interval=None, min_frequency=0.0):
+    """
+    Counts tweets until the memory allocated by the store exceeds memory_cap, checking every CAPACITY_CHECK_INTERVAL
+    tweets
+
+    :param tweets: Iterable of filtered tweets, generated lazily so that they are not part of the measured memory
+    :param prune_interval: Number of tweets between each pruning, like TweetNGramsPMI.count_n_grams, None to not prune
+    :return: (number of tweets counted within the cap, whether the cap was reached, peak bytes allocated) tuple
+    """
+    line_counter = 0
+    tracemalloc.start()
+    try:
+        for tweet in tweets:
+            line_counter += 1
+            if prune_interval is not None and line_counter % prune_interval == 0:
+                store.prune_infrequent(math.ceil(min_frequency * line_counter / 2.))
+            add_tweet(store, tweet, n)
+            if line_counter % CAPACITY_CHECK_INTERVAL == 0 and tracemalloc.get_traced_memory()[0] > memory_cap:
+                return line_counter - CAPACITY_CHECK_INTERVAL, True, tracemalloc.get_traced_memory()[1]
+        return line_counter, False, tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+
+def generate_filtered_tweets(num_tweets, filters, seed=1337):
+    """
+    :return: Generator of num_tweets filtered synthetic tweets
+    """
+    corpus = SyntheticCorpus(seed)
+    rand = random.Random(seed)
+    for _ in range(num_tweets):
+        yield filters.apply(corpus.generate_tweet(rand, 3, 25))
+
+
+def capacity_benchmark(n, memory_cap, max_tweets, prune_interval, min_frequency):
+    filters = main.N_GRAM_FILTERS.with_canonical_dictionary(main.load_settings()[1]).compile()
+    stores = [("NGramTree", TweetNGramsPMI.NGramTree, None), ("NGramCounts", NGramCounts, None),
+              ("NGramTree, pruned", TweetNGramsPMI.NGramTree, prune_interval),
+              ("NGramCounts, pruned", NGramCounts, prune_interval)]
+
+    print("\nTweets counted within {:.0f} MiB, at most {}, pruning every {} tweets with min_frequency {}".format(
+        memory_cap / float(1 << 20), max_tweets, prune_interval, min_frequency))
+    print("{:<22}{:>12}{:>14}{:>16}".format("store", "tweets", "peak [MiB]", "vs NGramTree"))
+    reference = None
+    for name, create_store, interval in stores:
+        tweets, capped, peak = measure_capacity(create_store(), generate_filtered_tweets(max_tweets, filters), n,
+                                                memory_cap, interval, min_frequency)
+        reference = tweets if reference is None else reference
+        print("{:<22}{:>12}{:>14.1f}{:>15.1f}x".format(name, ("" if capped else ">=") + str(tweets),
+                                                       peak / float(1 << 20), tweets / float(reference)))
+
+
+def main_benchmark(num_tweets, n, prune_limit):
+    filters = main.N_GRAM_FILTERS.with_canonical_dictionary(main.load_settings()[1]).compile()
+    tweets = [filters.apply(tweet) for tweet in SyntheticCorpus().generate_tweets(num_tweets)]
+
+    counts = NGramCounts()
+    tree_bytes, tree_pruned_bytes = measure(TweetNGramsPMI.NGramTree(), tweets, n, prune_limit)
+    counts_bytes, counts_pruned_bytes = measure(counts, tweets, n, prune_limit)
+
+    print("{:<14}{:>16}{:>20}".format("store", "counted [B]", "after pruning [B]"))
+    print("{:<14}{:>16}{:>20}".format("NGramTree", tree_bytes, tree_pruned_bytes))
+    print("{:<14}{:>16}{:>20}".format("NGramCounts", counts_bytes, counts_pruned_bytes))
+    print("NGramCounts uses {:.1f}x less memory, {} n-grams left after pruning (reported: {} B)".format(
+        tree_bytes / float(counts_bytes), len(counts), counts.get_memory_usage()))
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Memory benchmark of n-gram counting")
+    parser.add_argument("--tweets", type=int, default=20000, help="Number of synthetic tweets")
+    parser.add_argument("--n", type=int, default=3, help="Maximum n-gram length")
+    parser.add_argument("--prune-limit", type=int, default=2, help="Minimum occurrences kept by pruning")
+    parser.add_argument("--memory-cap", type=float, default=10, help="Memory cap of the capacity benchmark in MiB")
+    parser.add_argument("--max-tweets", type=int, default=200000, help="Most tweets counted by the capacity benchmark")
+    parser.add_argument("--prune-interval", type=int, default=2000, help="Tweets between each pruning")
+    parser.add_argument("--min-frequency", type=float, default=0.0005, help="Minimum frequency pruning is based on")
+    args = parser.parse_args()
+    main_benchmark(args.tweets, args.n, args.prune_limit)
+    capacity_benchmark(args.n, args.memory_cap * (1 << 20), args.max_tweets, args.prune_interval, args.min_frequency)
@@ -0,0 +1,101 @@
+"""
+Compares scoring of filtered tweets through LexicalToken objects (lexical_parser + score_lexical_tokens) with the
+ScoringEngine used by Classifier, in time and in memory allocated per tweet. score_lexical_tokens is the original token
+object based scorer, kept here as the reference implementation ScoringEngine is tested against.
+
+Usage: python -m fjlc.benchmarks.scoring_benchmark [--tweets 20000]
+"""
+import argparse
+import time
+import tracemalloc
+
+import fjlc.classifier.classifier_options as classifier_options
+from fjlc.benchmarks.synthetic_corpus import SyntheticCorpus
+from fjlc.classifier.sentence.lexical_parser import lexically_parse_tweet
+from fjlc.main import LexiconClassifier
+
+
+def propagate_negation(lexical_tokens, index, options):
+    for i in range(index + 1, int(min(index + options.negation_scope_length, len(lexical_tokens)))):
+        lexical_tokens[i].set_in_negated_context(True)
+        if lexical_tokens[i].is_at_the_end_of_sentence():
+            break
+
+
+def intensify_next(lexical_tokens, index, intensification):
+    if not lexical_tokens[index].is_at_the_end_of_sentence():
+        lexical_tokens[index + 1].intensify_token(intensification)
+
+
+def score_lexical_tokens(lexicon, lexical_tokens, options):
+    """
+    Applies lexicon values, negation and intensification to LexicalTokens and sums their sentiment values. This is the
+    token object based equivalent of ScoringEngine.calculate_sentiment. lexical_parser and LexicalToken read the
+    exclamation and question intensifiers and the negation value from the module level options, which must be set to
+    the same options, see classifier_options.set_options.
+
+    :param lexicon: PriorPolarityLexicon to look up phrase values in
+    :param lexical_tokens: List of LexicalTokens as returned by lexical_parser.lexically_parse_tweet
+    :param options: ClassifierOptions with the negators and intensifiers
+    :return: Sentiment value
+    """
+    for i in range(len(lexical_tokens)):
+        token = lexical_tokens[i]
+        phrase = token.get_phrase()
+
+        if lexicon.has_token(phrase):
+            token.set_lexical_value(lexicon.get_token_polarity(phrase))
+
+        elif options.is_negation(phrase):
+            propagate_negation(lexical_tokens, i, options)
+
+        elif options.is_intensifier(phrase):
+            intensify_next(lexical_tokens, i, options.get_intensifier_value(phrase))
+
+    return sum(map(lambda t: t.get_sentiment_value(), lexical_tokens))
+
+
+def measure(score, tweets):
+    start = time.perf_counter()
+    for tweet in tweets:
+        score(tweet)
+    elapsed = time.perf_counter() - start
+
+    peak_bytes = 0
+    tracemalloc.start()
+    for tweet in tweets:
+        tracemalloc.reset_peak()
+        baseline = tracemalloc.get_traced_memory()[0]
+        score(tweet)
+        peak_bytes += tracemalloc.get_traced_memory()[1] - baseline
+    tracemalloc.stop()
+
+    return len(tweets) / elapsed, peak_bytes / float(len(tweets))
+
+
+def main_benchmark(num_tweets):
+    lexicon_classifier = LexiconClassifier()
+    classifier = lexicon_classifier.classifier
+    # lexical_parser and LexicalToken read the module level options
+    classifier_options.set_options(lexicon_classifier.words)
+    tweets = [classifier.filters.apply(tweet) for tweet in SyntheticCorpus().generate_tweets(num_tweets)]
+
+    def score_with_tokens(tweet):
+        return score_lexical_tokens(classifier.lexicon, lexically_parse_tweet(tweet, classifier.phrase_tree),
+                                    classifier.options)
+
+    for tweet in tweets:
+        if score_with_tokens(tweet) != classifier.scoring_engine.calculate_sentiment(tweet):
+            raise AssertionError("ScoringEngine differs on: {!r}".format(tweet))
+
+    print("{:<16}{:>16}{:>24}".format("scoring", "tweets/s", "peak bytes per tweet"))
+    engine = classifier.scoring_engine
+    for name, score in [("LexicalToken", score_with_tokens), ("ScoringEngine", engine.calculate_sentiment)]:
+        throughput, peak = measure(score, tweets)
+        print("{:<16}{:>16.0f}{:>24.0f}".format(name, throughput, peak))
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Benchmark of tweet scoring")
+    parser.add_argument("--tweets", type=int, default=20000, help="Number of synthetic tweets")
+    main_benchmark(parser.parse_args().tweets)
@@ -0,0 +1,80 @@
+"""
+Measures the resident memory of the worker processes of LexiconClassifier batch methods, when every worker loads its
+own copy of the lexicon and phrase tree, and when they share a memory-mapped model (share_memory=True). Reports the
+resident set size (RSS), the proportional set size (PSS, shared pages divided between the processes sharing them) and
+the private memory of every worker, read from /proc (Linux only).
+
+Usage: python -m fjlc.benchmarks.shared_memory_benchmark [--phrases 300000] [--jobs 4] [--tweets 20000]
+"""
+import argparse
+import multiprocessing
+import os
+import shutil
+import tempfile
+import time
+
+import fjlc.main as main
+from fjlc.benchmarks.cold_start_benchmark import generate_lexicon
+from fjlc.benchmarks.synthetic_corpus import SyntheticCorpus
+
+
+def get_process_memory(pid):
+    """
+    :return: (RSS, PSS, private) bytes of process pid, as reported by /proc/<pid>/smaps_rollup
+    """
+    fields = {}
+    with open("/proc/%d/smaps_rollup" % pid) as f:
+        for line in f:
+            parts = line.split()
+            if len(parts) == 3 and parts[2] == "kB":
+                fields[parts[0].rstrip(":")] = int(parts[1]) * 1024
+    return fields["Rss"], fields["Pss"], fields["Private_Clean"] + fields["Private_Dirty"]
+
+
+def measure_workers(arguments, tweets, jobs):
+    """
+    Classifies tweets in jobs worker processes and measures the memory of every worker
+
+    :param arguments: Keyword arguments of LexiconClassifier
+    :return: (seconds spent classifying, list of (RSS, PSS, private) bytes of every worker) tuple
+    """
+    with main.LexiconClassifier(**arguments) as classifier:
+        start = time.perf_counter()
+        classifier.calculate_sentiment_batch(tweets, jobs=jobs)
+        elapsed = time.perf_counter() - start
+        return elapsed, [get_process_memory(process.pid) for process in multiprocessing.active_children()]
+
+
+def main_benchmark(num_phrases, jobs, num_tweets):
+    if not os.path.exists("/proc/self/smaps_rollup"):
+        raise SystemExit("Reading the memory of processes requires /proc/<pid>/smaps_rollup (Linux)")
+
+    directory = tempfile.mkdtemp()
+    try:
+        lexicon_file = os.path.join(directory, "lexicon.json")
+        generate_lexicon(lexicon_file, num_phrases)
+        model_file = os.path.join(directory, "model.fjlc")
+        main.LexiconClassifier(lexicon_file).compile_model(model_file)
+        tweets = list(SyntheticCorpus(seed=42).generate_tweets(num_tweets))
+
+        mebibyte = float(1 << 20)
+        print("{:<8}{:>8}{:>12}{:>12}{:>16}{:>12}".format("mode", "worker", "RSS [MiB]", "PSS [MiB]",
+                                                          "private [MiB]", "time [s]"))
+        for mode, share_memory in [("copies", False), ("shared", True)]:
+            elapsed, workers = measure_workers({"model": model_file, "share_memory": share_memory}, tweets, jobs)
+            for worker, (rss, pss, private) in enumerate(workers):
+                print("{:<8}{:>8}{:>12.1f}{:>12.1f}{:>16.1f}{:>12.2f}".format(
+                    mode, worker, rss / mebibyte, pss / mebibyte, private / mebibyte, elapsed))
+            print("{:<8}{:>8}{:>12.1f}{:>12.1f}{:>16.1f}".format(
+                mode, "total", *[sum(memory[i] for memory in workers) / mebibyte for i in range(3)]))
+    finally:
+        shutil.rmtree(directory)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Memory of classifier worker processes, with and without sharing")
+    parser.add_argument("--phrases", type=int, default=300000, help="Number of random phrases added to the lexicon")
+    parser.add_argument("--jobs", type=int, default=4, help="Number of worker processes")
+    parser.add_argument("--tweets", type=int, default=20000, help="Number of tweets to classify")
+    args = parser.parse_args()
+    main_benchmark(args.phrases, args.jobs, args.tweets)
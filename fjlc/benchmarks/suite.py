@@ -0,0 +1,231 @@
+"""
+Stage-level benchmark suite. Measures throughput and latency percentiles of every stage of the classification
+pipeline on a seeded synthetic corpus, and of lexicon creation (LexiconCreator) and n-gram generation (TweetNGramsPMI)
+on a labeled synthetic data set. Results are written as JSON, and can be compared against a saved baseline.
+
+Usage: python -m fjlc.benchmarks.suite [--tweets 5000] [--repeat 3] [--stages filters,scoring] [-o results.json]
+       python -m fjlc.benchmarks.suite --compare baseline.json [--threshold 0.1]
+"""
+import argparse
+import json
+import os
+import platform
+import sys
+import tempfile
+import time
+
+import fjlc.classifier.classifier_options as classifier_options
+import fjlc.lexical_classifier as lexical_classifier
+import fjlc.main as main
+from fjlc.benchmarks.synthetic_corpus import SyntheticCorpus
+from fjlc.classifier.sentence.lexical_parser import lexically_parse_tweet
+from fjlc.lexicon.lexicon_creator import LexiconCreator
+from fjlc.preprocessing.filters.regex_filters import RegexFilters
+from fjlc.preprocessing.preprocessors.tweet_n_grams_pmi import TweetNGramsPMI
+from fjlc.utils.reader.data_set_reader import DataSetReader
+
+FORMAT_VERSION = 1
+PERCENTILES = [50, 90, 99]
+DEFAULT_THRESHOLD = 0.1
+
+
+def percentile(sorted_values, p):
+    """
+    :param sorted_values: Non-empty list of values in ascending order
+    :param p: Percentile in [0, 100]
+    :return: Value at the p-th percentile, by the nearest-rank method
+    """
+    rank = max(1, -(-len(sorted_values) * p // 100))
+    return sorted_values[int(rank) - 1]
+
+
+def summarize(latencies, items):
+    """
+    :param latencies: Seconds taken by every call
+    :param items: Number of tweets processed by all calls together
+    :return: Dictionary with throughput (tweets per second) and latency percentiles (seconds)
+    """
+    latencies = sorted(latencies)
+    total = sum(latencies)
+    summary = {"calls": len(latencies), "tweets": items, "throughput": items / total if total > 0 else float("inf"),
+               "latency": {"p" + str(p): percentile(latencies, p) for p in PERCENTILES}}
+    summary["latency"]["max"] = latencies[-1]
+    summary["latency"]["mean"] = total / len(latencies)
+    return summary
+
+
+def time_per_call(function, inputs, repeat):
+    """
+    Calls function on every input, repeat times, and summarizes the fastest run
+    """
+    best = None
+    for _ in range(repeat):
+        latencies = []
+        timer = time.perf_counter
+        for value in inputs:
+            start = timer()
+            function(value)
+            latencies.append(timer() - start)
+        if best is None or sum(latencies) < sum(best):
+            best = latencies
+    return summarize(best, len(inputs))
+
+
+def time_per_run(function, items, repeat):
+    """
+    Calls function (which processes items tweets at once) repeat times, latencies are the duration of each run
+    """
+    latencies = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        function()
+        latencies.append(time.perf_counter() - start)
+    summary = summarize(latencies, items * repeat)
+    summary["tweets"] = items
+    return summary
+
+
+class BenchmarkSuite:
+    """
+    Prepares the inputs of every stage from one synthetic corpus, so stages can be timed in isolation
+    """
+
+    def __init__(self, num_tweets, seed=1337, repeat=3):
+        self.num_tweets = num_tweets
+        self.seed = seed
+        self.repeat = repeat
+
+        corpus = SyntheticCorpus(seed)
+        self.tweets = corpus.generate_tweets(num_tweets)
+        self.labeled_tweets = corpus.generate_labeled_tweets(num_tweets)
+        self.n_grams = [phrase for phrase in corpus.phrases if " " in phrase]
+
+        self.lexicon_classifier = main.LexiconClassifier()
+        self.classifier = self.lexicon_classifier.classifier
+        self.options, canonical_dictionary = main.load_settings()
+        self.filters = lexical_classifier.get_classifier_filters(canonical_dictionary)
+        self.tweet_filters = main.TWEET_FILTERS.with_canonical_dictionary(canonical_dictionary).compile()
+        self.n_gram_filters = main.N_GRAM_FILTERS.with_canonical_dictionary(canonical_dictionary).compile()
+        # lexical_parser reads the module level options
+        classifier_options.set_options(self.lexicon_classifier.words)
+        self.filtered_tweets = [self.classifier.filters.apply(tweet) for tweet in self.tweets]
+        self.tokenized_tweets = [RegexFilters.WHITESPACE.split(tweet) for tweet in self.filtered_tweets]
+
+        self.stages = {
+            "filters": lambda: time_per_call(self.filters.apply, self.tweets, repeat),
+            "compiled_filters": lambda: time_per_call(self.classifier.filters.apply, self.tweets, repeat),
+            "lexical_parser": lambda: time_per_call(self.parse, self.filtered_tweets, repeat),
+            "tokenization": lambda: time_per_call(self.classifier.phrase_tree.find_optimal_tokenization,
+                                                  self.tokenized_tweets, repeat),
+            "scoring": lambda: time_per_call(self.classifier.scoring_engine.calculate_sentiment,
+                                             self.filtered_tweets, repeat),
+            "classify": lambda: time_per_call(self.lexicon_classifier.classify, self.tweets, repeat),
+            "lexicon_creator": lambda: time_per_run(self.create_lexicon, num_tweets, repeat),
+            "tweet_n_grams": lambda: time_per_run(self.generate_n_grams, num_tweets, repeat),
+        }
+
+    def parse(self, tweet):
+        return lexically_parse_tweet(tweet, self.classifier.phrase_tree)
+
+    def create_lexicon(self):
+        with tempfile.NamedTemporaryFile("w", suffix=".tsv", delete=False) as data_set:
+            for label, tweet in self.labeled_tweets:
+                data_set.write(label + "\t" + tweet + "\n")
+        try:
+            return LexiconCreator(self.options).create_lexicon(DataSetReader(data_set.name, 1, 0), self.n_grams, 10,
+                                                               0.5, self.tweet_filters)
+        finally:
+            os.remove(data_set.name)
+
+    def generate_n_grams(self):
+        return TweetNGramsPMI(self.options).get_frequent_n_grams(self.tweets, 3, 0.001, 0.5, self.n_gram_filters)
+
+    def run(self, stages=None):
+        """
+        :param stages: Names of stages to run, all stages if None
+        :return: Dictionary with metadata and a summary of every stage
+        """
+        stages = list(self.stages.keys()) if stages is None else stages
+        unknown = [stage for stage in stages if stage not in self.stages]
+        if len(unknown) > 0:
+            raise ValueError("Unknown stages: " + ", ".join(unknown))
+
+        return {
+            "version": FORMAT_VERSION,
+            "metadata": {"tweets": self.num_tweets, "seed": self.seed, "repeat": self.repeat,
+                         "python": platform.python_version(), "platform": platform.platform(),
+                         "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S")},
+            "stages": {stage: self.stages[stage]() for stage in stages},
+        }
+
+
+def compare_results(baseline, current, threshold=DEFAULT_THRESHOLD):
+    """
+    Compares two benchmark results stage by stage. A stage has regressed if its throughput dropped, or its median
+    latency grew, by more than threshold (relative to the baseline).
+
+    :param baseline: Result of BenchmarkSuite.run, f.ex. loaded from a saved JSON file
+    :param current: Result of BenchmarkSuite.run
+    :param threshold: Tolerated relative change, f.ex. 0.1 for 10%
+    :return: List of (stage, metric, baseline value, current value, relative change, regressed) tuples
+    """
+    comparisons = []
+    for stage, result in current["stages"].items():
+        if stage not in baseline["stages"]:
+            continue
+
+        reference = baseline["stages"][stage]
+        for metric, before, after, higher_is_better in [
+                ("throughput", reference["throughput"], result["throughput"], True),
+                ("latency_p50", reference["latency"]["p50"], result["latency"]["p50"], False)]:
+            change = (after - before) / before if before > 0 else 0.0
+            regressed = change < -threshold if higher_is_better else change > threshold
+            comparisons.append((stage, metric, before, after, change, regressed))
+    return comparisons
+
+
+def print_comparison(comparisons, output=sys.stdout):
+    output.write("{:<18}{:<14}{:>14}{:>14}{:>10}\n".format("stage", "metric", "baseline", "current", "change"))
+    for stage, metric, before, after, change, regressed in comparisons:
+        output.write("{:<18}{:<14}{:>14.6g}{:>14.6g}{:>+9.1f}%{}\n".format(
+            stage, metric, before, after, 100 * change, "  REGRESSION" if regressed else ""))
+
+
+def main_benchmark(argv=None):
+    parser = argparse.ArgumentParser(description="Stage-level benchmark of the classification pipeline")
+    parser.add_argument("--tweets", type=int, default=5000, help="Number of synthetic tweets")
+    parser.add_argument("--seed", type=int, default=1337, help="Seed of the synthetic corpus")
+    parser.add_argument("--repeat", type=int, default=3, help="Number of timed runs per stage")
+    parser.add_argument("--stages", help="Comma separated stages to run, all if omitted")
+    parser.add_argument("-o", "--output", help="Write results as JSON to this file, stdout if omitted")
+    parser.add_argument("--compare", help="Baseline JSON file to compare results against")
+    parser.add_argument("--threshold", type=float, default=DEFAULT_THRESHOLD,
+                        help="Relative change in throughput or median latency that counts as a regression")
+    args = parser.parse_args(argv)
+
+    stages = None if args.stages is None else args.stages.split(",")
+    results = BenchmarkSuite(args.tweets, args.seed, args.repeat).run(stages)
+
+    json_results = json.dumps(results, indent=4, sort_keys=True)
+    if args.output is None:
+        print(json_results)
+    else:
+        with open(args.output, "w") as f:
+            f.write(json_results)
+
+    if args.compare is not None:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+        for key in ["tweets", "seed"]:
+            if baseline["metadata"][key] != results["metadata"][key]:
+                sys.stderr.write("Warning: baseline was run with {} {}, not {}\n".format(
+                    key, baseline["metadata"][key], results["metadata"][key]))
+        comparisons = compare_results(baseline, results, args.threshold)
+        print_comparison(comparisons, sys.stderr)
+        if any(comparison[-1] for comparison in comparisons):
+            return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main_benchmark())
@@ -0,0 +1,103 @@
+import random
+from os import path
+
+from fjlc.utils import json_utils
+
+DATA_DIR = path.join(path.abspath(path.dirname(__file__)), "../res/data")
+
+HASHTAGS = ["#happy", "#fail", "#mondays", "#win", "#giveaway", "#tbt", "#love", "#nofilter", "#worst", "#2016"]
+USERNAMES = ["@user", "@jack", "@some_body_123", "@news", "@abcdefghijklmnopqrstu"]
+URLS = ["http://t.co/abc123", "https://example.com/some/path?x=1", "www.example.org/page"]
+EMOTICONS = [":)", ":-)", ":(", ":-(", ":D", "xD", ";p", "<3", "<333", "^_^", ":'(", "=]", ":/"]
+SPECIAL = ["RT", "&amp;", "&lt;3", "&quot;", "it's", "don't", "café", "2016", "1,000", "a@b.com", "\U0001F600"]
+SEPARATORS = [" ", " ", " ", " ", "  ", "! ", ". ", "? ", ", ", "!!! ", "?! "]
+LABELS = ["positive", "neutral", "negative"]
+
+
+class SyntheticCorpus:
+    """
+    Deterministic generator of tweet-like text, built from the vocabulary of the bundled lexicon and options so that
+    the generated tweets exercise every part of the classification pipeline.
+    """
+
+    def __init__(self, seed=1337,
+                 lexicon=path.join(DATA_DIR, "lexicon.pmi.json"),
+                 options=path.join(DATA_DIR, "options.pmi.json")):
+        self.seed = seed
+        polarities = json_utils.from_json_file(lexicon)
+        self.phrases = sorted(polarities.keys())
+        self.positive_phrases = [phrase for phrase in self.phrases if polarities[phrase] > 0]
+        self.negative_phrases = [phrase for phrase in self.phrases if polarities[phrase] < 0]
+        words = json_utils.from_json_file(options)
+        self.negators = sorted(words["negators"])
+        self.intensifiers = sorted(words["intensifiers"])
+        self.words = sorted({word for phrase in self.phrases for word in phrase.split(" ")} | set(words["stopWords"]))
+
+    def generate_tweets(self, count, min_length=3, max_length=25):
+        """
+        Generates tweets, the same seed always gives the same tweets
+
+        :param count: Number of tweets to generate
+        :param min_length: Minimum number of parts (words, phrases, hashtags, ...) per tweet
+        :param max_length: Maximum number of parts per tweet
+        :return: List of tweets
+        """
+        rand = random.Random(self.seed)
+        return [self.generate_tweet(rand, min_length, max_length) for _ in range(count)]
+
+    def generate_labeled_tweets(self, count, min_length=3, max_length=25):
+        """
+        Generates tweets with a classification label. Positive and negative tweets get a few extra phrases of the same
+        polarity, so that the label correlates with the content as in a real training set.
+
+        :return: List of (label, tweet) tuples, label is "positive", "neutral" or "negative"
+        """
+        rand = random.Random(self.seed)
+        labeled_tweets = []
+        for _ in range(count):
+            label = rand.choice(LABELS)
+            tweet = self.generate_tweet(rand, min_length, max_length)
+            if label != "neutral":
+                phrases = self.positive_phrases if label == "positive" else self.negative_phrases
+                tweet += " ".join(rand.choice(phrases) for _ in range(rand.randint(1, 3)))
+            labeled_tweets.append((label, tweet))
+        return labeled_tweets
+
+    def generate_tweet(self, rand, min_length, max_length):
+        tweet = []
+        for _ in range(rand.randint(min_length, max_length)):
+            tweet.append(self.generate_part(rand))
+            tweet.append(rand.choice(SEPARATORS))
+        return "".join(tweet)
+
+    def generate_part(self, rand):
+        x = rand.random()
+        if x < 0.45:
+            return rand.choice(self.words)
+        if x < 0.65:
+            return rand.choice(self.phrases)
+        if x < 0.70:
+            return rand.choice(self.negators)
+        if x < 0.75:
+            return rand.choice(self.intensifiers)
+        if x < 0.80:
+            return elongate(rand.choice(self.words), rand)
+        if x < 0.84:
+            return rand.choice(HASHTAGS)
+        if x < 0.87:
+            return rand.choice(USERNAMES)
+        if x < 0.89:
+            return rand.choice(URLS)
+        if x < 0.95:
+            return rand.choice(EMOTICONS)
+        return rand.choice(SPECIAL)
+
+
+def elongate(word, rand):
+    """
+    Repeats a random character of the word, f.ex. "great" => "greeeeat"
+    """
+    if len(word) == 0:
+        return word
+    i = rand.randrange(len(word))
+    return word[:i] + word[i] * rand.randint(2, 6) + word[i + 1:]
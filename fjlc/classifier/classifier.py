@@ -1,60 +1,53 @@
 import fjlc.classifier.classifier_options as classifier_options
-import fjlc.classifier.sentence.lexical_parser as lexical_parser
+from fjlc.classifier.scoring_engine import ScoringEngine
 from fjlc.lexicon.container.token_trie import TokenTrie
 from fjlc.utils.reader.data_set_reader import Classification
 
 
-def propagate_negation(lexical_tokens, index):
-    negation_scope_length = classifier_options.get_variable(classifier_options.Variable.NEGATION_SCOPE_LENGTH)
-    for i in range(index + 1, int(min(index + negation_scope_length, len(lexical_tokens)))):
-        lexical_tokens[i].set_in_negated_context(True)
-        if lexical_tokens[i].is_at_the_end_of_sentence():
-            break
-
-
-def intensify_next(lexical_tokens, index, intensification):
-    if not lexical_tokens[index].is_at_the_end_of_sentence():
-        lexical_tokens[index + 1].intensify_token(intensification)
-
-
 class Classifier:
-    def __init__(self, lexicon, filters=None):
+    def __init__(self, lexicon, filters=None, options=None, phrase_tree=None, phrase_values=None):
+        """
+        :param lexicon: PriorPolarityLexicon with the sentiment values of phrases
+        :param filters: Filters to apply to tweets before classification
+        :param options: ClassifierOptions, defaults to a snapshot of the options loaded with
+        classifier_options.load_options
+        :param phrase_tree: TokenTrie of the phrases of lexicon, f.ex. of a compiled model (see model_artifact), built
+        from lexicon if None
+        :param phrase_values: Sentiment value of every vocabulary id of phrase_tree (NaN for ids that are not lexicon
+        phrases), f.ex. of a memory-mapped model. If given, phrases are scored with these values instead of lexicon.
+        """
         self.lexicon = lexicon
         self.filters = filters
-        self.phrase_tree = TokenTrie(lexicon.get_subjective_words())
+        self.options = classifier_options.ClassifierOptions.from_loaded_options() if options is None else options
+        self.phrase_tree = TokenTrie(lexicon.get_subjective_words()) if phrase_tree is None else phrase_tree
+        if phrase_values is None:
+            self.scoring_engine = ScoringEngine(lexicon, self.phrase_tree, self.options)
+        else:
+            self.scoring_engine = ScoringEngine.from_phrase_values(self.phrase_tree, phrase_values, self.options)
 
     def classify(self, tweet):
         """
         Classifies the tweet into one of three classes (negative, neutral or positive) depending on the sentiment value
-        of the tweet and the thresholds specified in the classifier_options
+        of the tweet and the thresholds specified in the classifier options
 
         :param tweet: String tweet to classify
         :return: Sentiment classification (negative, neutral or positive)
         """
-        sentiment_value = self.calculate_sentiment(tweet)
+        return self.get_classification(self.calculate_sentiment(tweet))
+
+    def get_classification(self, sentiment_value):
+        """
+        Classifies a sentiment value into one of three classes (negative, neutral or positive) using the thresholds
+        specified in the classifier options
 
-        return Classification.classify_from_thresholds(sentiment_value,
-                                                       classifier_options.get_variable(
-                                                           classifier_options.Variable.CLASSIFICATION_THRESHOLD_LOWER),
-                                                       classifier_options.get_variable(
-                                                           classifier_options.Variable.CLASSIFICATION_THRESHOLD_HIGHER))
+        :param sentiment_value: Sentiment value as returned by calculate_sentiment
+        :return: Sentiment classification (negative, neutral or positive)
+        """
+        return Classification.classify_from_thresholds(sentiment_value, self.options.classification_threshold_lower,
+                                                       self.options.classification_threshold_higher)
 
     def calculate_sentiment(self, tweet):
         if self.filters is not None:
             tweet = self.filters.apply(tweet)
 
-        lexical_tokens = lexical_parser.lexically_parse_tweet(tweet, self.phrase_tree)
-        for i in range(len(lexical_tokens)):
-            token = lexical_tokens[i]
-            phrase = token.get_phrase()
-
-            if self.lexicon.has_token(phrase):
-                token.set_lexical_value(self.lexicon.get_token_polarity(phrase))
-
-            elif classifier_options.is_negation(phrase):
-                propagate_negation(lexical_tokens, i)
-
-            elif classifier_options.is_intensifier(phrase):
-                intensify_next(lexical_tokens, i, classifier_options.get_intensifier_value(phrase))
-
-        return sum(map(lambda t: t.get_sentiment_value(), lexical_tokens))
+        return self.scoring_engine.calculate_sentiment(tweet)
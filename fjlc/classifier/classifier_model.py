@@ -0,0 +1,210 @@
+import os
+import shutil
+import tempfile
+import threading
+
+import fjlc.classifier.classifier_options as classifier_options
+import fjlc.lexical_classifier as lexical_classifier
+from fjlc.classifier.classifier import Classifier
+from fjlc.classifier.model_artifact import load_model, map_model, write_model
+from fjlc.lexicon.container.prior_polarity_lexicon import FlatPolarityLexicon, PriorPolarityLexicon
+from fjlc.preprocessing.filters.canonical_form import CanonicalDictionary
+from fjlc.utils import file_utils, json_utils
+
+
+class ClassifierModel:
+    """
+    Everything a LexiconClassifier classifies with: the classifier with its lexicon, phrase tree, options and canonical
+    dictionary, and the worker pool started for it. A model is never changed once it is created, reloading creates a
+    new model, so a classification that started on a model finishes on it.
+    """
+
+    def __init__(self, lexicon, options, dictionary, model=None, share_memory=False, version=1):
+        """
+        :param lexicon: Path to sentiment lexicon file
+        :param options: Path to options file
+        :param dictionary: Path to canonical dictionary
+        :param model: Path to a compiled model, lexicon, options and dictionary are ignored if given
+        :param share_memory: Read the compiled model in place from a memory map, see LexiconClassifier
+        :param version: Version number of the model, see LexiconClassifier.reload
+        """
+        self.lexicon = lexicon
+        self.options = options
+        self.dictionary = dictionary
+        self.model = model
+        self.share_memory = share_memory
+        self.version = version
+        phrase_values = None
+
+        if model is None:
+            words = classifier_options.read_options(options)
+            dictionary_words = json_utils.from_json_file(dictionary)
+            self.prior_polarity_lexicon = PriorPolarityLexicon(lexicon)
+            phrase_tree = None
+            # Identifies the model results are calculated with, cached results of any other model are discarded
+            self.fingerprint = file_utils.fingerprint_files(lexicon, options, dictionary)
+        elif share_memory:
+            mapped_model = map_model(model)
+            words = mapped_model.words
+            dictionary_words = mapped_model.dictionary
+            phrase_tree = mapped_model.phrase_tree
+            phrase_values = mapped_model.phrase_values
+            # The lexicon is read from the mapped vocabulary and phrase values as well, it is not loaded
+            self.prior_polarity_lexicon = FlatPolarityLexicon(phrase_tree.vocabulary, phrase_values)
+            self.fingerprint = mapped_model.fingerprint
+        else:
+            artifact = load_model(model)
+            words = artifact.words
+            dictionary_words = artifact.dictionary
+            self.prior_polarity_lexicon = artifact.lexicon
+            phrase_tree = artifact.phrase_tree
+            self.fingerprint = artifact.fingerprint
+
+        self.words = words
+        self.dictionary_words = dictionary_words
+        # The model owns its options and canonical dictionary, so models of different versions can classify at the
+        # same time
+        filters = lexical_classifier.get_classifier_filters(CanonicalDictionary(dictionary_words))
+        self.classifier = Classifier(self.prior_polarity_lexicon, filters.compile(),
+                                     classifier_options.ClassifierOptions(words), phrase_tree, phrase_values)
+
+        # Temporary model compiled for the workers with share_memory, see get_worker_arguments
+        self.worker_model = None
+        self.pool = None
+        self.pool_lock = threading.Lock()
+        self.active_batches = 0
+        self.retired = False
+
+    def get_files(self):
+        """
+        :return: Paths of the files the model is created from
+        """
+        return [self.model] if self.model is not None else [self.lexicon, self.options, self.dictionary]
+
+    def compile_model(self, file_name):
+        """
+        Writes the model to a binary model file, see model_artifact
+        """
+        if self.share_memory and self.model is not None:
+            # Mapped from a model, which is already compiled
+            shutil.copyfile(self.model, file_name)
+            return
+        write_model(file_name, self.classifier, self.words, self.dictionary_words, self.fingerprint)
+
+    def get_worker_arguments(self):
+        """
+        :return: Keyword arguments of LexiconClassifier that recreate this model in a worker process
+        """
+        model = self.model
+        if self.share_memory and model is None:
+            if self.worker_model is None:
+                descriptor, self.worker_model = tempfile.mkstemp(suffix=".fjlc")
+                os.close(descriptor)
+                self.compile_model(self.worker_model)
+            model = self.worker_model
+
+        return {"lexicon": self.lexicon, "options": self.options, "dictionary": self.dictionary, "model": model,
+                "share_memory": self.share_memory}
+
+    def get_pool(self, factory, arguments, jobs):
+        """
+        Returns the persistent worker pool of this model, (re)starting it if it is not running with the requested
+        number of jobs
+
+        :param factory: Picklable callable that creates the classifier in each worker, see ClassifierPool
+        :param arguments: Keyword arguments of factory, in addition to get_worker_arguments
+        """
+        with self.pool_lock:
+            return self.start_pool(factory, arguments, jobs)
+
+    def start_pool(self, factory, arguments, jobs):
+        """
+        See get_pool, called with pool_lock held
+        """
+        if self.pool is None or self.pool.jobs != jobs:
+            if self.pool is not None:
+                self.pool.close()
+            from fjlc.classifier.classifier_pool import ClassifierPool
+            self.pool = ClassifierPool(factory, dict(arguments, **self.get_worker_arguments()), jobs)
+        return self.pool
+
+    def start_batch(self, factory, arguments, method, tweets, jobs, chunksize):
+        """
+        Starts applying a classifier method to tweets in the worker pool of this model, see ClassifierPool.imap. The
+        batch is registered before this returns, so a reload that retires the model meanwhile keeps its pool running
+        until the batch has finished. A retired model does not start a new pool.
+
+        :param factory: Picklable callable that creates the classifier in each worker, see get_pool
+        :param arguments: Keyword arguments of factory, in addition to get_worker_arguments
+        :return: PoolBatch of the results, None if the model is retired and has no pool with jobs workers
+        """
+        with self.pool_lock:
+            if self.retired and (self.pool is None or self.pool.jobs != jobs):
+                return None
+            pool = self.start_pool(factory, arguments, jobs)
+            self.active_batches += 1
+        return PoolBatch(self, pool.imap(method, tweets, chunksize))
+
+    def finish_batch(self):
+        """
+        Called once a batch started with start_batch has finished. A retired model closes its pool once the last batch
+        has finished.
+        """
+        with self.pool_lock:
+            self.active_batches -= 1
+            close = self.retired and self.active_batches == 0
+        if close:
+            self.close()
+
+    def retire(self):
+        """
+        Marks the model as replaced by a newer one. Its worker pool is closed now if no batch is running on it, or else
+        when the last running batch finishes.
+        """
+        with self.pool_lock:
+            self.retired = True
+            close = self.active_batches == 0
+        if close:
+            self.close()
+
+    def close(self):
+        """
+        Stops the worker pool of this model, if any, and removes its temporary worker model
+        """
+        with self.pool_lock:
+            pool, self.pool = self.pool, None
+            worker_model, self.worker_model = self.worker_model, None
+        if pool is not None:
+            pool.close()
+        if worker_model is not None:
+            os.remove(worker_model)
+
+
+class PoolBatch:
+    """
+    Iterator of the results of a batch started with ClassifierModel.start_batch. The batch is finished when the results
+    are exhausted, when iterating fails, or when the iterator is closed or garbage collected.
+    """
+
+    def __init__(self, model, results):
+        self.model = model
+        self.results = results
+        self.finished = False
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        try:
+            return next(self.results)
+        except BaseException:
+            self.close()
+            raise
+
+    def close(self):
+        if not self.finished:
+            self.finished = True
+            self.model.finish_batch()
+
+    def __del__(self):
+        self.close()
@@ -1,4 +1,5 @@
 import copy
+import types
 from enum import Enum
 
 from fjlc.utils.file_utils import read_entire_file_into_string
@@ -70,8 +71,15 @@ def load_options(file_name):
     @param file_name Name of file containing the options
     @throws IOException
     """
-    words = from_json(read_entire_file_into_string(file_name))
+    set_options(read_options(file_name))
 
+
+def set_options(words):
+    """
+    Sets the module level options
+
+    :param words: Dictionary with "options", "intensifiers", "negators" and "stopWords", as in the options file
+    """
     global options, intensifiers, negators, stop_words
     options = words["options"]
     intensifiers = words["intensifiers"]
@@ -79,6 +87,23 @@ def load_options(file_name):
     stop_words = words["stopWords"]
 
 
+def read_options(file_name):
+    """
+    Reads an options JSON file
+
+    :param file_name: Name of file containing the options
+    :return: Dictionary with "options", "intensifiers", "negators" and "stopWords"
+    """
+    return from_json(read_entire_file_into_string(file_name))
+
+
+def get_loaded_words():
+    """
+    :return: The module level options as a dictionary in the format of the options file, see set_options
+    """
+    return {"options": options, "intensifiers": intensifiers, "negators": negators, "stopWords": stop_words}
+
+
 def get_intensifier_value(word):
     intensifier = intensifiers.get(word, 0.0)
     mult = get_variable(Variable.AMPLIFIER_SCALAR) if intensifier > 0 else get_variable(
@@ -95,3 +120,86 @@ class Variable(Enum):
     AMPLIFIER_SCALAR = 5,
     CLASSIFICATION_THRESHOLD_LOWER = 6,
     CLASSIFICATION_THRESHOLD_HIGHER = 7
+
+
+class ClassifierOptions:
+    """
+    Immutable, precompiled classifier options. Every Classifier owns one, so classifiers with different options can be
+    used side by side in the same process. Variables are resolved to plain attributes and the amplifier/downtoner
+    scalars are already applied to the intensifier values.
+    """
+    __slots__ = ("words", "variables", "negation_value", "exclamation_intensifier", "question_intensifier",
+                 "negation_scope_length", "classification_threshold_lower", "classification_threshold_higher",
+                 "intensifiers", "negators", "stop_words")
+
+    def __init__(self, words):
+        """
+        :param words: Dictionary with "options", "intensifiers", "negators" and "stopWords", as in the options file
+        """
+        variables = dict(words["options"])
+        amplifier_scalar = variables[Variable.AMPLIFIER_SCALAR.name]
+        downtoner_scalar = variables[Variable.DOWNTONER_SCALAR.name]
+
+        intensifiers = {}
+        for word, intensifier in words["intensifiers"].items():
+            intensifiers[word] = (amplifier_scalar if intensifier > 0 else downtoner_scalar) * intensifier
+
+        set_attribute = super().__setattr__
+        # The words the options are created from, in the format of the options file
+        set_attribute("words", types.MappingProxyType(dict(words)))
+        set_attribute("variables", types.MappingProxyType(variables))
+        set_attribute("negation_value", variables[Variable.NEGATION_VALUE.name])
+        set_attribute("exclamation_intensifier", variables[Variable.EXCLAMATION_INTENSIFIER.name])
+        set_attribute("question_intensifier", variables[Variable.QUESTION_INTENSIFIER.name])
+        set_attribute("negation_scope_length", variables[Variable.NEGATION_SCOPE_LENGTH.name])
+        set_attribute("classification_threshold_lower", variables[Variable.CLASSIFICATION_THRESHOLD_LOWER.name])
+        set_attribute("classification_threshold_higher", variables[Variable.CLASSIFICATION_THRESHOLD_HIGHER.name])
+        set_attribute("intensifiers", types.MappingProxyType(intensifiers))
+        set_attribute("negators", frozenset(words["negators"]))
+        set_attribute("stop_words", frozenset(words["stopWords"]))
+
+    def __setattr__(self, key, value):
+        raise AttributeError("ClassifierOptions is immutable")
+
+    def __delattr__(self, key):
+        raise AttributeError("ClassifierOptions is immutable")
+
+    def __reduce__(self):
+        # Immutable attributes can not be restored one by one, the options are recreated from their words instead
+        return ClassifierOptions, (dict(self.words),)
+
+    @staticmethod
+    def from_file(file_name):
+        return ClassifierOptions(read_options(file_name))
+
+    @staticmethod
+    def from_loaded_options():
+        """
+        Creates ClassifierOptions from the module level options, as set by load_options
+        """
+        return ClassifierOptions(get_loaded_words())
+
+    def get_variable(self, variable):
+        return self.variables[variable.name]
+
+    def is_stop_word(self, word):
+        return word in self.stop_words
+
+    def is_negation(self, word):
+        return word in self.negators
+
+    def is_intensifier(self, word):
+        return word in self.intensifiers
+
+    def contains_intensifier(self, words):
+        for word in words:
+            if self.is_intensifier(word):
+                return True
+
+        return False
+
+    def get_intensifier_value(self, word):
+        """
+        Returns the intensification of word, with amplifier or downtoner scalar applied, 0.0 if not an intensifier
+        """
+        return self.intensifiers.get(word, 0.0)
@@ -0,0 +1,71 @@
+import functools
+import multiprocessing
+import os
+import queue
+import time
+
+from fjlc.utils.tools import parallel
+
+# The classifier of the current worker process, created once by init_worker
+worker_classifier = None
+
+
+def init_worker(factory, arguments, ready):
+    global worker_classifier
+    worker_classifier = factory(**arguments)
+    ready.put(os.getpid())
+
+
+def apply_to_chunk(method, tweets):
+    return getattr(worker_classifier, method)(tweets)
+
+
+class ClassifierPool:
+    """
+    Persistent pool of worker processes, each holding its own classifier. Workers load the lexicon, options and
+    canonical dictionary once when the pool starts, and are then reused for every batch.
+    """
+
+    def __init__(self, factory, arguments, jobs):
+        """
+        :param factory: Picklable callable that creates the classifier in each worker (f.ex. LexiconClassifier)
+        :param arguments: Dictionary of keyword arguments passed to factory
+        :param jobs: Number of worker processes
+        """
+        self.jobs = jobs
+        # Every worker reports its pid once its classifier is created, see wait_until_ready
+        self.ready = multiprocessing.Queue()
+        self.pool = multiprocessing.Pool(jobs, init_worker, (factory, arguments, self.ready))
+
+    def wait_until_ready(self, timeout=None):
+        """
+        Waits until every worker has created its classifier, so that the first batch is not slowed down by loading
+
+        :param timeout: Maximum number of seconds to wait, None to wait as long as it takes
+        :raises TimeoutError: If the workers are not ready within timeout
+        """
+        deadline = None if timeout is None else time.monotonic() + timeout
+        workers = set()
+        while len(workers) < self.jobs:
+            try:
+                workers.add(self.ready.get(timeout=None if deadline is None else max(0, deadline - time.monotonic())))
+            except queue.Empty:
+                raise TimeoutError("Workers not ready within " + str(timeout) + " seconds")
+
+    def imap(self, method, tweets, chunksize):
+        """
+        Applies a classifier method to every tweet, in the worker processes
+
+        :param method: Name of method of the classifier created by factory that takes a list of tweets, f.ex.
+        "classify" or "calculate_sentiment"
+        :param tweets: Iterable of tweets, consumed lazily
+        :param chunksize: Number of tweets sent to a worker at a time
+        :return: Generator of results in the same order as tweets
+        """
+        return parallel.ordered_imap(self.pool, functools.partial(apply_to_chunk, method), tweets, chunksize,
+                                     2 * self.jobs)
+
+    def close(self):
+        self.pool.terminate()
+        self.pool.join()
+        self.ready.close()
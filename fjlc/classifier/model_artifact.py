@@ -0,0 +1,289 @@
+"""
+Precompiled binary model of a LexiconClassifier: the lexicon, the phrase trie, the options and the canonical dictionary
+in one versioned, checksummed file. Loading a model memory-maps the file and converts its arrays in bulk, so no JSON
+lexicon is parsed and no phrase is split or interned, which makes classifier startup several times faster for large
+lexicons. A model can also be mapped (see map_model): its arrays are then used in place, and the pages of the file are
+shared by all processes that map it.
+
+Usage: python -m fjlc.classifier.model_artifact -o model.fjlc [--lexicon lexicon.json] [--options options.json]
+                                                [--dictionary canonical.json]
+"""
+import gc
+import hashlib
+import json
+import math
+import mmap
+import os
+import struct
+import sys
+from array import array
+
+from fjlc.lexicon.container.prior_polarity_lexicon import PriorPolarityLexicon
+from fjlc.lexicon.container.token_trie import FlatTokenTrie, TokenTrie, get_first_edges
+from fjlc.lexicon.container.vocabulary import FlatVocabulary, Vocabulary, build_hash_table
+
+MAGIC = b"FJLCMODL"
+FORMAT_VERSION = 2
+
+# File header (magic, version, number of sections, checksum of everything after the header) and section table entry
+# (name, offset from the start of the file, size). All integers are little endian.
+HEADER = struct.Struct("<8sII16s")
+SECTION = struct.Struct("<16sQQ")
+
+# Sections start at multiples of this many bytes, so their arrays can be used in place
+ALIGNMENT = 8
+
+# Type codes of the array sections, all other sections are UTF-8 text
+ARRAY_SECTIONS = {
+    "token_offsets": "I",
+    "token_table": "I",
+    "lexicon_ids": "I",
+    "lexicon_values": "d",
+    "phrase_values": "d",
+    "node_phrase_ids": "I",
+    "node_first_edges": "I",
+    "edge_tokens": "I",
+}
+
+
+class MappedModel:
+    """
+    Model file mapped into memory, see map_model
+    """
+
+    def __init__(self, words, dictionary, fingerprint, phrase_tree, phrase_values):
+        """
+        :param phrase_tree: FlatTokenTrie of the phrases of the lexicon, with a FlatVocabulary
+        :param phrase_values: Sentiment value of every vocabulary id, NaN for ids that are not lexicon phrases
+        """
+        self.words = words
+        self.dictionary = dictionary
+        self.fingerprint = fingerprint
+        self.phrase_tree = phrase_tree
+        self.phrase_values = phrase_values
+
+
+class ModelArtifact:
+    """
+    Contents of a compiled model, see load_model
+    """
+
+    def __init__(self, words, dictionary, fingerprint, lexicon, phrase_tree):
+        """
+        :param words: Options, in the format of the options file (see classifier_options.set_options)
+        :param dictionary: Canonical dictionary, in the format of the dictionary file
+        :param fingerprint: Fingerprint of the lexicon, options and dictionary files the model was compiled from
+        :param lexicon: PriorPolarityLexicon
+        :param phrase_tree: TokenTrie of the phrases of lexicon, with the vocabulary of the compiled classifier
+        """
+        self.words = words
+        self.dictionary = dictionary
+        self.fingerprint = fingerprint
+        self.lexicon = lexicon
+        self.phrase_tree = phrase_tree
+
+
+def write_model(file_name, classifier, words, dictionary, fingerprint):
+    """
+    Writes a compiled model. The file is replaced atomically, so a model file is always complete.
+
+    :param classifier: Classifier to compile, its phrase tree and vocabulary are stored as they are
+    :param words: Options the classifier was created with, in the format of the options file
+    :param dictionary: Canonical dictionary, in the format of the dictionary file
+    :param fingerprint: Fingerprint of the files the model is compiled from, see LexiconClassifier.fingerprint
+    """
+    vocabulary = classifier.phrase_tree.vocabulary
+    tokens = vocabulary.get_token_list()
+    if any("\n" in token for token in tokens):
+        raise ValueError("Phrases of a compiled model can not contain newlines")
+
+    lexicon = classifier.lexicon
+    phrases = list(lexicon.get_subjective_words())
+    phrase_ids = [vocabulary.get_id(phrase) for phrase in phrases]
+    lexicon_values = [lexicon.get_token_polarity(phrase) for phrase in phrases]
+    phrase_values = [math.nan] * (len(tokens) + 1)
+    for phrase_id, value in zip(phrase_ids, lexicon_values):
+        phrase_values[phrase_id] = value
+
+    # Every token is followed by a newline, token_offsets are the start offsets of the tokens and the end offset
+    encoded_tokens = [token.encode("utf-8") for token in tokens]
+    token_offsets = [0]
+    for data in encoded_tokens:
+        token_offsets.append(token_offsets[-1] + len(data) + 1)
+
+    node_phrase_ids, node_child_counts, edge_tokens = classifier.phrase_tree.flatten()
+    metadata = {"options": words, "dictionary": dictionary, "fingerprint": fingerprint}
+
+    sections = [
+        ("metadata", json.dumps(metadata, default=sorted).encode("utf-8")),
+        ("tokens", b"".join(data + b"\n" for data in encoded_tokens)),
+        ("token_offsets", token_offsets),
+        ("token_table", build_hash_table(encoded_tokens)),
+        ("lexicon_ids", phrase_ids),
+        ("lexicon_values", lexicon_values),
+        ("phrase_values", phrase_values),
+        ("node_phrase_ids", node_phrase_ids),
+        ("node_first_edges", get_first_edges(node_child_counts)),
+        ("edge_tokens", edge_tokens),
+    ]
+
+    table = []
+    body = bytearray()
+    offset = HEADER.size + len(sections) * SECTION.size
+    for name, data in sections:
+        if name in ARRAY_SECTIONS:
+            values = array(ARRAY_SECTIONS[name], data)
+            if sys.byteorder == "big":
+                values.byteswap()
+            data = values.tobytes()
+        padding = -(offset + len(body)) % ALIGNMENT
+        body.extend(b"\0" * padding)
+        table.append(SECTION.pack(name.encode("ascii"), offset + len(body), len(data)))
+        body.extend(data)
+
+    content = b"".join(table) + body
+    checksum = hashlib.blake2b(content, digest_size=16).digest()
+
+    temporary_file = "%s.%d.tmp" % (file_name, os.getpid())
+    try:
+        with open(temporary_file, "wb") as f:
+            f.write(HEADER.pack(MAGIC, FORMAT_VERSION, len(sections), checksum))
+            f.write(content)
+        os.replace(temporary_file, file_name)
+    finally:
+        if os.path.exists(temporary_file):
+            os.remove(temporary_file)
+
+
+def load_model(file_name, verify=True):
+    """
+    Loads a model written by write_model
+
+    :param verify: Whether to verify the checksum, which reads the whole file once
+    :return: ModelArtifact
+    """
+    with open(file_name, "rb") as f:
+        buffer = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+    # Rebuilding the trie allocates an object per node, collecting garbage in between only slows it down
+    gc_enabled = gc.isenabled()
+    gc.disable()
+    try:
+        sections = read_sections(buffer, file_name, verify)
+        metadata = json.loads(sections["metadata"].decode("utf-8"))
+        tokens = sections["tokens"].decode("utf-8").split("\n")[:-1]
+        vocabulary = Vocabulary.from_token_list(tokens)
+
+        phrases = list(map(vocabulary.tokens.__getitem__, sections["lexicon_ids"]))
+        lexicon = PriorPolarityLexicon(dict(zip(phrases, sections["lexicon_values"])))
+        first_edges = sections["node_first_edges"]
+        child_counts = [end - start for start, end in zip(first_edges, first_edges[1:])]
+        phrase_tree = TokenTrie.from_flattened(vocabulary, sections["node_phrase_ids"], child_counts,
+                                               sections["edge_tokens"])
+    finally:
+        if gc_enabled:
+            gc.enable()
+        buffer.close()
+
+    return ModelArtifact(metadata["options"], metadata["dictionary"], metadata["fingerprint"], lexicon, phrase_tree)
+
+
+def map_model(file_name, verify=True):
+    """
+    Maps a model written by write_model into memory. Its vocabulary, phrase trie and phrase values are read in place
+    from the read-only mapping, so the pages of the file are shared with every other process that maps it, instead of
+    every process holding its own copy of the lexicon as Python objects. Scoring with a mapped model gives the same
+    results as with load_model, but is somewhat slower.
+
+    :param verify: Whether to verify the checksum, which reads the whole file once
+    :return: MappedModel
+    """
+    with open(file_name, "rb") as f:
+        buffer = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+    sections = read_sections(buffer, file_name, verify, in_place=True)
+    metadata = json.loads(bytes(sections["metadata"]).decode("utf-8"))
+    vocabulary = FlatVocabulary(sections["tokens"], sections["token_offsets"], sections["token_table"])
+    phrase_tree = FlatTokenTrie(vocabulary, sections["node_phrase_ids"], sections["node_first_edges"],
+                                sections["edge_tokens"])
+    return MappedModel(metadata["options"], metadata["dictionary"], metadata["fingerprint"], phrase_tree,
+                       sections["phrase_values"])
+
+
+def read_sections(buffer, file_name, verify=True, in_place=False):
+    """
+    Checks the header of a model file and reads its sections
+
+    :param buffer: Contents of the model file
+    :param in_place: Return memoryviews into buffer instead of copies, see read_section
+    :return: Map of section name to bytes, or to a list of numbers for array sections
+    """
+    if len(buffer) < HEADER.size:
+        raise ValueError("Not a model file: " + file_name)
+    magic, version, num_sections, checksum = HEADER.unpack_from(buffer)
+    if magic != MAGIC:
+        raise ValueError("Not a model file: " + file_name)
+    if version != FORMAT_VERSION:
+        raise ValueError("Unsupported model version: " + str(version))
+    if verify:
+        with memoryview(buffer) as view:
+            with view[HEADER.size:] as content:
+                if hashlib.blake2b(content, digest_size=16).digest() != checksum:
+                    raise ValueError("Corrupt model file, checksum mismatch: " + file_name)
+
+    sections = {}
+    for i in range(num_sections):
+        name, offset, size = SECTION.unpack_from(buffer, HEADER.size + i * SECTION.size)
+        name = name.rstrip(b"\0").decode("ascii")
+        if offset + size > len(buffer):
+            raise ValueError("Truncated model file: " + file_name)
+        sections[name] = read_section(buffer, name, offset, size, in_place)
+    return sections
+
+
+def read_section(buffer, name, offset, size, in_place=False):
+    """
+    :param in_place: Return a memoryview into buffer (cast to the type of array sections) instead of a copy. Array
+    sections are still copied on big endian machines.
+    """
+    if in_place and (name not in ARRAY_SECTIONS or sys.byteorder == "little"):
+        view = memoryview(buffer)[offset:offset + size]
+        return view.cast(ARRAY_SECTIONS[name]) if name in ARRAY_SECTIONS else view
+
+    if name not in ARRAY_SECTIONS:
+        return buffer[offset:offset + size]
+
+    if sys.byteorder == "little":
+        with memoryview(buffer) as view:
+            with view[offset:offset + size] as data:
+                with data.cast(ARRAY_SECTIONS[name]) as values:
+                    return values.tolist()
+
+    values = array(ARRAY_SECTIONS[name])
+    values.frombytes(buffer[offset:offset + size])
+    values.byteswap()
+    return values.tolist()
+
+
+def compile_model(file_name, lexicon, options, dictionary):
+    """
+    Compiles the model of a lexicon, options and canonical dictionary file (see LexiconClassifier) to file_name
+    """
+    from fjlc.main import LexiconClassifier
+    LexiconClassifier(lexicon, options, dictionary).compile_model(file_name)
+
+
+def main(argv=None):
+    import argparse
+    from fjlc.main import DEFAULT_LEXICON, DEFAULT_OPTIONS, DEFAULT_DICTIONARY
+    parser = argparse.ArgumentParser(description="Compiles a lexicon classifier to a binary model file")
+    parser.add_argument("-o", "--output", required=True, help="Model file to write")
+    parser.add_argument("--lexicon", default=DEFAULT_LEXICON, help="Path to sentiment lexicon file")
+    parser.add_argument("--options", default=DEFAULT_OPTIONS, help="Path to options file")
+    parser.add_argument("--dictionary", default=DEFAULT_DICTIONARY, help="Path to canonical dictionary")
+    args = parser.parse_args(argv)
+    compile_model(args.output, args.lexicon, args.options, args.dictionary)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,81 @@
+import os
+import threading
+
+# Seconds between checks of the watched files
+DEFAULT_INTERVAL = 1.0
+
+
+class ModelWatcher:
+    """
+    Watches the files of a model for changes, by polling their modification time and size in a background thread. A
+    change is reported once the files have stayed the same for one interval, so a file that is still being written is
+    not reported half-way.
+    """
+
+    def __init__(self, get_files, on_change, interval=DEFAULT_INTERVAL):
+        """
+        :param get_files: Callable returning the paths of the files to watch, called on every check so that the watched
+        files can change with the model
+        :param on_change: Callable called from the watcher thread when the files have changed
+        :param interval: Seconds between checks
+        """
+        self.get_files = get_files
+        self.on_change = on_change
+        self.interval = interval
+        self.signature = get_signature(get_files())
+        self.pending_signature = None
+        self.stopped = threading.Event()
+        self.thread = None
+
+    def start(self):
+        self.thread = threading.Thread(target=self.run, name="fjlc-model-watcher", daemon=True)
+        self.thread.start()
+
+    def run(self):
+        while not self.stopped.wait(self.interval):
+            self.check()
+
+    def check(self):
+        """
+        Checks the files once, and calls on_change if they changed and are unchanged since the previous check
+
+        :return: Whether on_change was called
+        """
+        signature = get_signature(self.get_files())
+        if [entry[0] for entry in signature] != [entry[0] for entry in self.signature]:
+            # The model was reloaded from other files, which are watched from now on
+            self.signature = signature
+            self.pending_signature = None
+            return False
+        if signature == self.signature:
+            self.pending_signature = None
+            return False
+        if signature != self.pending_signature:
+            self.pending_signature = signature
+            return False
+
+        self.signature = signature
+        self.pending_signature = None
+        self.on_change()
+        return True
+
+    def stop(self):
+        self.stopped.set()
+        if self.thread is not None and self.thread is not threading.current_thread():
+            self.thread.join()
+        self.thread = None
+
+
+def get_signature(file_names):
+    """
+    :return: Tuple of (path, modification time in nanoseconds, size) of every file, None for files that do not exist
+    """
+    signature = []
+    for file_name in file_names:
+        try:
+            stat = os.stat(file_name)
+        except OSError:
+            signature.append((file_name, None))
+            continue
+        signature.append((file_name, stat.st_mtime_ns, stat.st_size))
+    return tuple(signature)
@@ -0,0 +1,119 @@
+import collections
+import hashlib
+import sys
+import threading
+
+# Eviction policies: LRU bounds the number of entries, SIZE_AWARE bounds the estimated number of bytes used by the
+# entries. Both evict the least recently used entries first.
+LRU = "lru"
+SIZE_AWARE = "size"
+
+# Key types: TEXT keys entries by the tweet itself, HASH by a 16 byte digest of the tweet, which bounds the memory
+# used per entry for long tweets
+TEXT = "text"
+HASH = "hash"
+
+# Estimated bytes used per entry besides the key: the cached float and the entry in the ordered dictionary
+ENTRY_OVERHEAD = 128
+
+
+class ResultCache:
+    """
+    Bounded cache of sentiment values of tweets. All entries belong to one model fingerprint; looking up or storing a
+    value for another fingerprint empties the cache, so values computed by an outdated lexicon or options are never
+    returned.
+    """
+
+    def __init__(self, max_size, eviction=LRU, key=TEXT):
+        """
+        :param max_size: Maximum number of entries (LRU) or maximum estimated size in bytes (SIZE_AWARE)
+        :param eviction: Eviction policy, LRU or SIZE_AWARE
+        :param key: What entries are keyed by, TEXT or HASH
+        """
+        if eviction not in (LRU, SIZE_AWARE):
+            raise ValueError("Unknown eviction policy: " + str(eviction))
+        if key not in (TEXT, HASH):
+            raise ValueError("Unknown cache key: " + str(key))
+
+        self.max_size = max_size
+        self.eviction = eviction
+        self.key = key
+        self.entries = collections.OrderedDict()
+        self.fingerprint = None
+        self.size = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+        self.lock = threading.Lock()
+
+    def get(self, fingerprint, tweet):
+        """
+        :param fingerprint: Fingerprint of the model the value must have been calculated with
+        :param tweet: Raw tweet
+        :return: Cached value, None if not cached
+        """
+        key = self.make_key(tweet)
+        with self.lock:
+            if fingerprint != self.fingerprint:
+                self.invalidate(fingerprint)
+
+            value = self.entries.get(key)
+            if value is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+                self.entries.move_to_end(key)
+            return value
+
+    def put(self, fingerprint, tweet, value):
+        key = self.make_key(tweet)
+        with self.lock:
+            if fingerprint != self.fingerprint:
+                self.invalidate(fingerprint)
+            if key in self.entries:
+                return
+
+            self.entries[key] = value
+            self.size += self.get_entry_size(key)
+            while len(self.entries) > 0 and self.get_used_size() > self.max_size:
+                evicted_key, _ = self.entries.popitem(last=False)
+                self.size -= self.get_entry_size(evicted_key)
+                self.evictions += 1
+
+    def invalidate(self, fingerprint=None):
+        """
+        Removes all entries and binds the cache to a new model fingerprint
+        """
+        self.entries.clear()
+        self.size = 0
+        self.fingerprint = fingerprint
+        self.invalidations += 1
+
+    def make_key(self, tweet):
+        if self.key == HASH:
+            return hashlib.blake2b(tweet.encode("utf-8", "surrogatepass"), digest_size=16).digest()
+        return tweet
+
+    def get_entry_size(self, key):
+        return sys.getsizeof(key) + ENTRY_OVERHEAD if self.eviction == SIZE_AWARE else 1
+
+    def get_used_size(self):
+        return self.size
+
+    def get_statistics(self):
+        """
+        :return: Dictionary with hits, misses, hit rate, evictions, invalidations, number of entries and used size
+        """
+        with self.lock:
+            lookups = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / float(lookups) if lookups > 0 else 0.0,
+                "evictions": self.evictions,
+                "invalidations": self.invalidations,
+                "entries": len(self.entries),
+                "size": self.size,
+                "max_size": self.max_size,
+            }
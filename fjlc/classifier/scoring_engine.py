@@ -0,0 +1,164 @@
+import itertools
+
+from fjlc.preprocessing.filters.regex_filters import RegexFilters
+
+# Kinds of phrases, in order of precedence: a phrase in the lexicon is never treated as a negator or intensifier
+LEXICAL = 0
+NEGATOR = 1
+INTENSIFIER = 2
+NEUTRAL = 3
+
+NEUTRAL_PHRASE = (NEUTRAL, 0.0)
+NEGATOR_PHRASE = (NEGATOR, 0.0)
+
+
+class ScoringEngine:
+    """
+    Calculates the sentiment value of filtered tweets in a single pass over the tokenized tweet. Every phrase is
+    resolved to a shared (kind, value) tuple with one dictionary lookup, and negation and intensification are carried
+    forward as plain state instead of being stored on per-token LexicalToken objects. Gives the same values as parsing
+    the tweet into LexicalTokens and scoring them with the reference implementation in benchmarks/scoring_benchmark.py.
+
+    Phrases are looked up by their id in the vocabulary of the phrase tree, so a sentence is mapped to token ids once
+    and tokenized without building any phrase strings.
+    """
+    __slots__ = ("phrase_tree", "vocabulary", "options", "phrases")
+
+    def __init__(self, lexicon, phrase_tree, options):
+        """
+        :param lexicon: PriorPolarityLexicon with the sentiment values of phrases
+        :param phrase_tree: TokenTrie of the phrases in lexicon
+        :param options: ClassifierOptions to score with
+        """
+        self.phrase_tree = phrase_tree
+        self.vocabulary = phrase_tree.vocabulary
+        self.options = options
+        self.phrases = get_option_phrases(options, self.vocabulary.add)
+
+        add = self.vocabulary.add
+        # The phrases of the lexicon are usually all in the vocabulary of phrase_tree already, and are then resolved
+        # in bulk
+        phrases = list(lexicon.get_subjective_words())
+        phrase_ids = list(map(self.vocabulary.ids.get, phrases))
+        if None in phrase_ids:
+            phrase_ids = list(map(add, phrases))
+        self.phrases.update(zip(phrase_ids, zip(itertools.repeat(LEXICAL), lexicon.get_polarities())))
+
+    @staticmethod
+    def from_phrase_values(phrase_tree, phrase_values, options):
+        """
+        Creates a scoring engine that reads the values of lexicon phrases from an array instead of a dictionary, f.ex.
+        from a memory-mapped model file (see model_artifact)
+
+        :param phrase_tree: TokenTrie or FlatTokenTrie of the lexicon phrases, its vocabulary is not extended
+        :param phrase_values: Sequence of the sentiment value of every vocabulary id, NaN for ids that are not lexicon
+        phrases
+        :param options: ClassifierOptions to score with, negators and intensifiers that are not in the vocabulary of
+        phrase_tree are ignored, as they can not match any token
+        """
+        engine = ScoringEngine.__new__(ScoringEngine)
+        engine.phrase_tree = phrase_tree
+        engine.vocabulary = phrase_tree.vocabulary
+        engine.options = options
+        engine.phrases = PhraseValues(phrase_values, get_option_phrases(options, engine.vocabulary.get_id))
+        return engine
+
+    def calculate_sentiment(self, tweet):
+        """
+        Calculates sentiment value of an already filtered tweet
+
+        :param tweet: Filtered tweet
+        :return: Sum of the sentiment values of the phrases in tweet
+        """
+        options = self.options
+        negation_value = options.negation_value
+        negation_scope_length = options.negation_scope_length
+        exclamation_intensifier = options.exclamation_intensifier
+        question_intensifier = options.question_intensifier
+
+        get_phrase = self.phrases.get
+        get_id = self.vocabulary.ids.get
+        find_optimal_phrase_ids = self.phrase_tree.find_optimal_phrase_ids
+        split = RegexFilters.WHITESPACE.split
+
+        sentiment_values = []
+        index = 0
+        # Tokens with index + 1 <= negation_limit are in a negated context
+        negation_limit = 0
+        next_intensification = None
+
+        sentences = RegexFilters.SENTENCE_END_PUNCTUATION.split(tweet)
+        last_sentence = len(sentences) - 1
+        position = 0
+        for sentence_index, sentence in enumerate(sentences):
+            sentence_intensification = 1
+            position += len(sentence)
+            if sentence_index < last_sentence:
+                punctuation = tweet[position]
+                position += 1
+                if punctuation == "!":
+                    sentence_intensification = exclamation_intensifier
+                elif punctuation == "?":
+                    sentence_intensification = question_intensifier
+
+            # Tokens that are not in the vocabulary get id 0, which is never a phrase
+            phrases = find_optimal_phrase_ids([get_id(token, 0) for token in split(sentence)])
+            last_phrase = len(phrases) - 1
+            for phrase_index, phrase_id in enumerate(phrases):
+                kind, value = get_phrase(phrase_id, NEUTRAL_PHRASE)
+
+                if kind == LEXICAL:
+                    intensification = sentence_intensification
+                    if next_intensification is not None:
+                        intensification *= next_intensification
+                    if intensification != 1:
+                        value *= intensification
+                    if index + 1 <= negation_limit and value != 0:
+                        value = value - negation_value if value > 0 else value + negation_value
+                    sentiment_values.append(value)
+
+                next_intensification = None
+                if phrase_index == last_phrase:
+                    negation_limit = 0
+                elif kind == INTENSIFIER:
+                    next_intensification = value
+
+                if kind == NEGATOR:
+                    negation_limit = max(negation_limit, index + negation_scope_length)
+                index += 1
+
+        return sum(sentiment_values, 0.0)
+
+
+class PhraseValues:
+    """
+    Resolves phrase ids to (kind, value) tuples like the phrase dictionary of ScoringEngine, from an array of the
+    values of lexicon phrases and a dictionary of the few negator and intensifier phrases
+    """
+    __slots__ = ("phrase_values", "option_phrases")
+
+    def __init__(self, phrase_values, option_phrases):
+        self.phrase_values = phrase_values
+        self.option_phrases = option_phrases
+
+    def get(self, phrase_id, default=None):
+        value = self.phrase_values[phrase_id]
+        # NaN marks ids that are not lexicon phrases
+        if value == value:
+            return LEXICAL, value
+        return self.option_phrases.get(phrase_id, default)
+
+
+def get_option_phrases(options, get_id):
+    """
+    :param options: ClassifierOptions with the negators and intensifiers
+    :param get_id: Function from word to vocabulary id, None for words to leave out
+    :return: Dictionary of id to (kind, value) tuple of the negators and intensifiers
+    """
+    option_phrases = {}
+    for word, intensification in options.intensifiers.items():
+        option_phrases[get_id(word)] = (INTENSIFIER, intensification)
+    for word in options.negators:
+        option_phrases[get_id(word)] = NEGATOR_PHRASE
+    option_phrases.pop(None, None)
+    return option_phrases
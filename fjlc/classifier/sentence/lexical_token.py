@@ -2,6 +2,8 @@ import fjlc.classifier.classifier_options as classifier_options
 
 
 class LexicalToken:
+    __slots__ = ("phrase", "lexical_value", "intensification", "in_negated_context", "at_end_of_sentence")
+
     def __init__(self, phrase):
         self.phrase = phrase
         self.lexical_value = 0.0
@@ -23,6 +23,18 @@ CLASSIFIER_CHARACTER_FILTERS = [
 
 CLASSIFIER_FILTERS = Filters(CLASSIFIER_STRING_FILTERS, CLASSIFIER_CHARACTER_FILTERS)
 
+
+def get_classifier_filters(canonical_dictionary):
+    """
+    :param canonical_dictionary: CanonicalDictionary to correct words with
+    :return: CLASSIFIER_FILTERS, correcting words with canonical_dictionary instead of the module level dictionary of
+    canonical_form
+    """
+    character_filters = [canonical_dictionary.correct_word if character_filter is correct_word_via_canonical
+                         else character_filter for character_filter in CLASSIFIER_CHARACTER_FILTERS]
+    return Filters(CLASSIFIER_STRING_FILTERS, character_filters)
+
+
 TEST_SETS = {
     "2013-TEST": "res/semeval/2013-2-test-gold-B.tsv",
     "2014-TEST": "res/semeval/2014-9-test-gold-B.tsv",
@@ -1,4 +1,11 @@
-import copy
+import itertools
+import math
+import sys
+import types
+from array import array
+from collections.abc import Mapping, ValuesView
+
+from fjlc.lexicon.container.vocabulary import DEFAULT_CACHE_SIZE, FlatVocabulary, build_hash_table
 from fjlc.utils.json_utils import from_json_file
 
 
@@ -21,9 +28,151 @@ class PriorPolarityLexicon:
     def get_subjective_words(self):
         return self.polarity_lexicon.keys()
 
+    def get_polarities(self):
+        """
+        :return: The polarities of all phrases, in the order of get_subjective_words
+        """
+        return self.polarity_lexicon.values()
+
     def get_lexicon(self):
-        return copy.deepcopy(self.polarity_lexicon)
+        """
+        :return: Read-only view of the map of phrase to polarity, nothing is copied
+        """
+        return types.MappingProxyType(self.polarity_lexicon)
+
+    def get_memory_usage(self):
+        """
+        :return: Approximate number of bytes used by the lexicon: the dict, its phrases and polarities
+        """
+        return sys.getsizeof(self.polarity_lexicon) + \
+            sum(sys.getsizeof(phrase) + sys.getsizeof(value) for phrase, value in self.polarity_lexicon.items())
 
     @staticmethod
     def read_lexicon(file_name):
         return from_json_file(file_name)
+
+
+class FlatPolarityLexicon:
+    """
+    Read-only PriorPolarityLexicon over flat buffers. The phrases are UTF-8 encoded in one string of bytes and found
+    with the hash table of a FlatVocabulary, and the polarities are held in one array of C doubles (or floats), so no
+    Python object is kept per phrase. The buffers can also be the sections of a memory-mapped model, see
+    model_artifact.map_model.
+    """
+
+    def __init__(self, vocabulary, values):
+        """
+        :param vocabulary: FlatVocabulary of the phrases, it may also have ids that are not phrases of the lexicon
+        :param values: Sequence of the polarity of every vocabulary id (index 0 is unused), NaN for ids that are not
+        phrases of the lexicon
+        """
+        self.vocabulary = vocabulary
+        self.values = values
+        # Counted when first needed, which reads all values
+        self.size = None
+
+    @staticmethod
+    def from_lexicon(polarity_lexicon, typecode="d", cache_size=DEFAULT_CACHE_SIZE):
+        """
+        :param polarity_lexicon: Map of phrase to polarity, or path to a lexicon file
+        :param typecode: Array type code of the polarities, "f" halves their memory but rounds them to single precision
+        :param cache_size: Maximum number of memoized phrase look ups, see FlatVocabulary
+        """
+        if type(polarity_lexicon) is str:
+            polarity_lexicon = PriorPolarityLexicon.read_lexicon(polarity_lexicon)
+
+        # Phrases are encoded once, into the string of all phrases, and sliced from it to build the hash table
+        num_phrases = len(polarity_lexicon)
+        phrase_bytes = "".join(phrase + "\n" for phrase in polarity_lexicon).encode("utf-8")
+        phrase_offsets = array("I", [0])
+        phrase_offsets.extend(itertools.accumulate(len(phrase.encode("utf-8")) + 1 for phrase in polarity_lexicon))
+        encoded_phrases = (phrase_bytes[phrase_offsets[i]:phrase_offsets[i + 1] - 1] for i in range(num_phrases))
+        vocabulary = FlatVocabulary(phrase_bytes, phrase_offsets, build_hash_table(encoded_phrases, num_phrases),
+                                    cache_size)
+
+        values = array(typecode, [math.nan])
+        values.extend(polarity_lexicon.values())
+        lexicon = FlatPolarityLexicon(vocabulary, values)
+        lexicon.size = num_phrases
+        return lexicon
+
+    def get_token_polarity(self, phrase):
+        value = self.values[self.vocabulary.get(phrase, 0)]
+        if value != value:
+            raise KeyError(phrase)
+        return value
+
+    def has_token(self, word):
+        value = self.values[self.vocabulary.get(word, 0)]
+        return value == value
+
+    def get_phrase_ids(self):
+        """
+        :return: Iterator of the vocabulary ids of all phrases, in increasing order
+        """
+        values = self.values
+        return (phrase_id for phrase_id in range(1, len(values)) if values[phrase_id] == values[phrase_id])
+
+    def get_subjective_words(self):
+        return self.get_lexicon().keys()
+
+    def get_polarities(self):
+        """
+        :return: The polarities of all phrases, in the order of get_subjective_words
+        """
+        return self.get_lexicon().values()
+
+    def get_lexicon(self):
+        """
+        :return: Read-only view of the map of phrase to polarity, nothing is copied
+        """
+        return FlatLexiconView(self)
+
+    def __len__(self):
+        if self.size is None:
+            self.size = sum(1 for _ in self.get_phrase_ids())
+        return self.size
+
+    def get_memory_usage(self):
+        """
+        :return: Approximate number of bytes used by the lexicon. Buffers of a memory-mapped model count only with the
+        size of their view, their pages are shared.
+        """
+        vocabulary = self.vocabulary
+        return sum(sys.getsizeof(buffer) for buffer in [vocabulary.token_bytes, vocabulary.token_offsets,
+                                                        vocabulary.hash_table, self.values])
+
+
+class FlatLexiconView(Mapping):
+    """
+    Read-only map of phrase to polarity over a FlatPolarityLexicon, see FlatPolarityLexicon.get_lexicon. Phrases are
+    decoded while iterating.
+    """
+
+    def __init__(self, lexicon):
+        self.lexicon = lexicon
+
+    def __getitem__(self, phrase):
+        return self.lexicon.get_token_polarity(phrase)
+
+    def __contains__(self, phrase):
+        return self.lexicon.has_token(phrase)
+
+    def __iter__(self):
+        return map(self.lexicon.vocabulary.get_token, self.lexicon.get_phrase_ids())
+
+    def __len__(self):
+        return len(self.lexicon)
+
+    def values(self):
+        return FlatLexiconValues(self)
+
+
+class FlatLexiconValues(ValuesView):
+    """
+    Polarities of a FlatLexiconView, read from the array of values instead of looking up every phrase
+    """
+
+    def __iter__(self):
+        lexicon = self._mapping.lexicon
+        return map(lexicon.values.__getitem__, lexicon.get_phrase_ids())
@@ -1,3 +1,6 @@
+from bisect import bisect_left
+
+from fjlc.lexicon.container.vocabulary import Vocabulary
 from fjlc.preprocessing.filters.regex_filters import RegexFilters
 import fjlc.classifier.classifier_options as classifier_options
 import functools
@@ -5,24 +8,90 @@ import functools
 
 class TokenTrie:
 
-    def __init__(self, sentences):
+    def __init__(self, sentences, vocabulary=None):
         """
-        Creates a phrase trie for efficient sub-phrase look up
+        Creates a phrase trie for efficient sub-phrase look up. The trie is keyed by token ids of vocabulary, and every
+        phrase is interned in vocabulary as well: the phrase id of a single word phrase is the id of the word.
 
         @param sentences List of Strings of all the phrases which are whitespace delimited n-grams
+        @param vocabulary Vocabulary to intern tokens and phrases in, a new one if None
         """
+        self.vocabulary = Vocabulary() if vocabulary is None else vocabulary
         self.root = TokenTrie.Node()
         for sentence in sentences:
             words = RegexFilters.WHITESPACE.split(sentence)
-            self.add_token_sequence(words)
+            self.add_token_sequence(words, sentence)
 
-    def add_token_sequence(self, token_sequence):
+    def add_token_sequence(self, token_sequence, phrase=None):
+        """
+        :param token_sequence: List of tokens of the phrase
+        :param phrase: The phrase as a string, tokens joined by a space if None
+        """
+        add = self.vocabulary.add
         tree = self.root
         for token in token_sequence:
-            if not tree.has_child(token):
-                tree.add_child(token)
-            tree = tree.get_child(token)
-        tree.set_phrase_end(True)
+            token_id = add(token)
+            if not tree.has_child(token_id):
+                tree.add_child(token_id)
+            tree = tree.get_child(token_id)
+        tree.set_phrase_id(add(" ".join(token_sequence) if phrase is None else phrase))
+
+    def flatten(self):
+        """
+        Flattens the trie to arrays of integers, in breadth first order of the nodes. The root is node 0, and the child
+        of edge i is node i + 1. The children of a node are consecutive edges, ordered by token id so that they can be
+        binary searched (see FlatTokenTrie).
+
+        :return: (phrase id of every node, number of children of every node, token id of every edge) tuple of lists
+        """
+        nodes = [self.root]
+        phrase_ids = []
+        child_counts = []
+        edge_tokens = []
+        for node in nodes:
+            phrase_ids.append(node.phrase_id)
+            child_counts.append(len(node.children))
+            children = sorted(node.children.items())
+            edge_tokens.extend(token_id for token_id, child in children)
+            nodes.extend(child for token_id, child in children)
+        return phrase_ids, child_counts, edge_tokens
+
+    @staticmethod
+    def from_flattened(vocabulary, phrase_ids, child_counts, edge_tokens):
+        """
+        Recreates a trie from the arrays of flatten, without splitting or interning any phrases
+
+        :param vocabulary: Vocabulary the flattened trie was keyed by
+        :return: TokenTrie equal to the flattened trie
+        """
+        token_trie = TokenTrie((), vocabulary)
+        new_node = TokenTrie.Node.__new__
+        nodes = [new_node(TokenTrie.Node) for _ in range(len(phrase_ids))]
+
+        edge = 0
+        for node, phrase_id, child_count in zip(nodes, phrase_ids, child_counts):
+            node.phrase_id = phrase_id
+            if child_count == 0:
+                node.children = {}
+            else:
+                node.children = dict(zip(edge_tokens[edge:edge + child_count], nodes[edge + 1:edge + child_count + 1]))
+                edge += child_count
+
+        if len(nodes) > 0:
+            token_trie.root = nodes[0]
+        return token_trie
+
+    def get_token_ids(self, tokens, add=False):
+        """
+        :param tokens: List of tokens
+        :param add: Add tokens that are not in the vocabulary, instead of mapping them to 0
+        :return: List of token ids
+        """
+        if add:
+            return list(map(self.vocabulary.add, tokens))
+
+        get_id = self.vocabulary.ids.get
+        return [get_id(token, 0) for token in tokens]
 
     def has_tokens(self, phrase):
         """
@@ -42,10 +111,10 @@ class TokenTrie:
             return True
 
         tree = self.root
-        for token in phrase:
-            if not tree.has_child(token):
+        for token_id in self.get_token_ids(phrase):
+            if not tree.has_child(token_id):
                 return False
-            tree = tree.get_child(token)
+            tree = tree.get_child(token_id)
 
         return True if tree.is_end_of_phrase() else None
 
@@ -57,20 +126,83 @@ class TokenTrie:
         :type tokens: list of str
         :return: List of Tokens found in tokens
         """
-        tracked_words = []
+        return [TokenTrie.Token(tokens[start:end + 1], start, end) for start, end in self.find_phrase_ranges(tokens)]
+
+    def find_phrase_ranges(self, tokens):
+        """
+        Finds (start, end) index pairs (both inclusive) of all phrases in tokens stored in TokenTrie, ordered by start
+        index, then end index. The trie is walked only once from every start position.
+
+        :param tokens: Sequence of tokens to find phrases in
+        :type tokens: list of str
+        :return: List of (start, end) tuples
+        """
+        ranges = []
+        root_children = self.root.children
+        token_ids = self.get_token_ids(tokens)
+        num_tokens = len(tokens)
+
+        for i in range(num_tokens):
+            node = root_children.get(token_ids[i])
+            if classifier_options.is_special_class_word(tokens[i]) or (node is not None and node.phrase_id != 0):
+                ranges.append((i, i))
+            if node is None:
+                continue
+
+            for j in range(i + 1, num_tokens):
+                node = node.children.get(token_ids[j])
+                if node is None:
+                    break
+                if node.phrase_id != 0:
+                    ranges.append((i, j))
+
+        return ranges
+
+    def find_phrase_id_ranges(self, token_ids):
+        """
+        Finds all phrases in a sequence of token ids, like find_phrase_ranges
+
+        :param token_ids: List of token ids, as returned by get_token_ids
+        :return: List of (start, end, phrase id) tuples, ordered by start index, then end index
+        """
+        ranges = []
+        root_children = self.root.children
+        num_tokens = len(token_ids)
+
+        for i in range(num_tokens):
+            node = root_children.get(token_ids[i])
+            if node is None:
+                continue
+            if node.phrase_id != 0:
+                ranges.append((i, i, node.phrase_id))
+
+            for j in range(i + 1, num_tokens):
+                node = node.children.get(token_ids[j])
+                if node is None:
+                    break
+                if node.phrase_id != 0:
+                    ranges.append((i, j, node.phrase_id))
+
+        return ranges
+
+    def find_optimal_ranges(self, tokens):
+        """
+        Finds longest, non-overlapping word-ranges of phrases in tokens stored in TokenTrie, see select_optimal_ranges
 
-        for i in range(len(tokens)):
-            for j in range(i + 1, len(tokens) + 1):
-                phrase = tokens[i:j]
-                status = self.has_tokens(phrase)
+        :param tokens: tokens to tokenize
+        :type tokens: list of str
+        :return: List of (start, end) tuples, ordered by start index
+        """
+        return select_optimal_ranges(self.find_phrase_ranges(tokens), len(tokens))
 
-                if status is not None:
-                    if status is True:
-                        tracked_words.append(TokenTrie.Token(phrase, i, j - 1))
-                    elif status is False:
-                        break
+    def find_optimal_phrase_ids(self, token_ids):
+        """
+        Id based equivalent of find_optimal_tokenization
 
-        return tracked_words
+        :param token_ids: List of token ids, as returned by get_token_ids
+        :return: List of ids: the phrase id of every optimal phrase, and the token id of every token not in a phrase
+        """
+        return select_optimal_phrase_ids(self.find_phrase_id_ranges(token_ids), token_ids)
 
     def find_optimal_allocation(self, tokens):
         """
@@ -81,21 +213,7 @@ class TokenTrie:
         :return: Optimal allocation of tokens to phrases
         :rtype: list of TokenTrie.Token
         """
-        token_ranges = self.find_tracked_words(tokens)
-        token_ranges.sort()
-
-        for offset in range(1, len(token_ranges)):
-            to_be_removed = []
-            for candidate in token_ranges[offset:]:
-                for i in range(offset):
-                    if token_ranges[i].overlaps_with(candidate):
-                        to_be_removed.append(candidate)
-                        break
-
-            token_ranges = [token for token in token_ranges if token not in to_be_removed]
-
-        token_ranges.sort(key=lambda token: token.get_start_index())
-        return token_ranges
+        return [TokenTrie.Token(tokens[start:end + 1], start, end) for start, end in self.find_optimal_ranges(tokens)]
 
     def find_optimal_tokenization(self, tokens):
         """
@@ -105,21 +223,15 @@ class TokenTrie:
         :param tokens: tokens to tokenize
         :return: Optimal allocation of tokens to phrases, with non matching tokens as singletons.
         """
-        token_ranges = self.find_optimal_allocation(tokens)
         tokenized_sentence = []
 
         set_index = 0
-        for token in token_ranges:
-            while set_index < token.get_start_index():
-                tokenized_sentence.append(tokens[set_index])
-                set_index += 1
-            tokenized_sentence.append(" ".join(token.get_token_sequence()))
-            set_index = token.get_end_index() + 1
-
-        while set_index < len(tokens):
-            tokenized_sentence.append(tokens[set_index])
-            set_index += 1
+        for start, end in self.find_optimal_ranges(tokens):
+            tokenized_sentence.extend(tokens[set_index:start])
+            tokenized_sentence.append(tokens[start] if start == end else " ".join(tokens[start:end + 1]))
+            set_index = end + 1
 
+        tokenized_sentence.extend(tokens[set_index:])
         return tokenized_sentence
 
     @functools.total_ordering
@@ -167,10 +279,12 @@ class TokenTrie:
             return "Token(" + str(self.start_index) + "," + str(self.end_index) + ")<" + str(self.token_sequence) + ">"
 
     class Node:
+        __slots__ = ("children", "phrase_id")
 
         def __init__(self):
             self.children = {}
-            self.end_of_phrase = False
+            # Vocabulary id of the phrase ending at this node, 0 if no phrase ends here
+            self.phrase_id = 0
 
         def has_child(self, value):
             return value in self.children
@@ -181,8 +295,123 @@ class TokenTrie:
         def get_child(self, value):
             return self.children[value]
 
-        def set_phrase_end(self, phrase_end):
-            self.end_of_phrase = phrase_end
+        def set_phrase_id(self, phrase_id):
+            self.phrase_id = phrase_id
 
         def is_end_of_phrase(self):
-            return self.end_of_phrase
+            return self.phrase_id != 0
+
+
+class FlatTokenTrie:
+    """
+    Read-only phrase trie over the arrays of TokenTrie.flatten, f.ex. the sections of a memory-mapped model file (see
+    model_artifact). No Python object is created per node, so processes that map the same file share its memory.
+    Implements the id based look ups of TokenTrie that ScoringEngine uses.
+    """
+
+    def __init__(self, vocabulary, phrase_ids, first_edges, edge_tokens):
+        """
+        :param vocabulary: Vocabulary or FlatVocabulary the trie is keyed by
+        :param phrase_ids: Phrase id of every node, see TokenTrie.flatten
+        :param first_edges: Index of the first edge of every node, followed by the number of edges
+        :param edge_tokens: Token id of every edge, see TokenTrie.flatten
+        """
+        self.vocabulary = vocabulary
+        self.phrase_ids = phrase_ids
+        self.first_edges = first_edges
+        self.edge_tokens = edge_tokens
+
+    def find_phrase_id_ranges(self, token_ids):
+        """
+        Finds all phrases in a sequence of token ids, see TokenTrie.find_phrase_id_ranges
+        """
+        ranges = []
+        phrase_ids, first_edges, edge_tokens = self.phrase_ids, self.first_edges, self.edge_tokens
+        num_tokens = len(token_ids)
+
+        for i in range(num_tokens):
+            node = 0
+            for j in range(i, num_tokens):
+                start, end = first_edges[node], first_edges[node + 1]
+                token_id = token_ids[j]
+                edge = bisect_left(edge_tokens, token_id, start, end)
+                if edge == end or edge_tokens[edge] != token_id:
+                    break
+                node = edge + 1
+                if phrase_ids[node] != 0:
+                    ranges.append((i, j, phrase_ids[node]))
+
+        return ranges
+
+    def find_optimal_phrase_ids(self, token_ids):
+        """
+        See TokenTrie.find_optimal_phrase_ids
+        """
+        return select_optimal_phrase_ids(self.find_phrase_id_ranges(token_ids), token_ids)
+
+
+def get_first_edges(child_counts):
+    """
+    :param child_counts: Number of children of every node, see TokenTrie.flatten
+    :return: Index of the first edge of every node, followed by the number of edges, see FlatTokenTrie
+    """
+    first_edges = [0]
+    for child_count in child_counts:
+        first_edges.append(first_edges[-1] + child_count)
+    return first_edges
+
+
+def select_optimal_phrase_ids(ranges, token_ids):
+    """
+    :param ranges: (start, end, phrase id) tuples of all phrases in token_ids, ordered by start index, then end index
+    :param token_ids: List of token ids
+    :return: List of ids: the phrase id of every optimal phrase, and the token id of every token not in a phrase
+    """
+    if len(ranges) == 0 or all(token_range[0] == token_range[1] for token_range in ranges):
+        # The phrase id of a single word phrase is its token id
+        return token_ids
+
+    phrase_ids = []
+    set_index = 0
+    for start, end, phrase_id in select_optimal_ranges(ranges, len(token_ids)):
+        phrase_ids.extend(token_ids[set_index:start])
+        phrase_ids.append(phrase_id)
+        set_index = end + 1
+
+    phrase_ids.extend(token_ids[set_index:])
+    return phrase_ids
+
+
+def select_optimal_ranges(ranges, num_tokens):
+    """
+    Picks the longest, non-overlapping ranges: longest first and rightmost first among ranges of equal length, each
+    kept if none of its tokens are taken by an already picked range. Ranges are bucketed by length instead of sorted,
+    so this runs in time linear in the number of tokens for a trie of bounded depth.
+
+    :param ranges: Tuples starting with (start, end), ordered by start index, then end index
+    :param num_tokens: Number of tokens the ranges are in
+    :return: The picked tuples, ordered by start index
+    """
+    if len(ranges) < 2:
+        return ranges
+
+    buckets = {}
+    for token_range in ranges:
+        length = token_range[1] - token_range[0]
+        if length in buckets:
+            buckets[length].append(token_range)
+        else:
+            buckets[length] = [token_range]
+
+    taken = [False] * num_tokens
+    picked = [None] * num_tokens
+    for length in sorted(buckets, reverse=True):
+        for token_range in reversed(buckets[length]):
+            start, end = token_range[0], token_range[1]
+            if True in taken[start:end + 1]:
+                continue
+            for i in range(start, end + 1):
+                taken[i] = True
+            picked[start] = token_range
+
+    return [token_range for token_range in picked if token_range is not None]
@@ -0,0 +1,164 @@
+import functools
+import sys
+import zlib
+from array import array
+
+# Maximum number of memoized token look ups of a FlatVocabulary
+DEFAULT_CACHE_SIZE = 2 ** 14
+
+
+class Vocabulary:
+    """
+    Interns tokens to consecutive integer ids. Ids start at 1, so 0 is never the id of a token.
+    """
+
+    def __init__(self, tokens=()):
+        self.ids = {}
+        self.tokens = [None]
+        for token in tokens:
+            self.add(token)
+
+    @staticmethod
+    def from_token_list(tokens):
+        """
+        Creates the vocabulary with the ids of get_token_list, without checking tokens for duplicates
+
+        :param tokens: List of distinct tokens, the token with id i at index i - 1
+        """
+        vocabulary = Vocabulary()
+        vocabulary.tokens.extend(tokens)
+        vocabulary.ids = dict(zip(tokens, range(1, len(tokens) + 1)))
+        return vocabulary
+
+    def get_token_list(self):
+        """
+        :return: List of all tokens, ordered by id
+        """
+        return self.tokens[1:]
+
+    def add(self, token):
+        """
+        :return: Id of token, a new id if token was not in the vocabulary
+        """
+        token_id = self.ids.get(token)
+        if token_id is None:
+            token_id = len(self.tokens)
+            self.ids[token] = token_id
+            self.tokens.append(token)
+        return token_id
+
+    def get_id(self, token):
+        """
+        :return: Id of token, None if token is not in the vocabulary
+        """
+        return self.ids.get(token)
+
+    def get_token(self, token_id):
+        return self.tokens[token_id]
+
+    def __len__(self):
+        return len(self.tokens) - 1
+
+    def __contains__(self, token):
+        return token in self.ids
+
+    def get_memory_usage(self):
+        """
+        :return: Approximate number of bytes used by the vocabulary, including the token strings
+        """
+        return sys.getsizeof(self.ids) + sys.getsizeof(self.tokens) + \
+            sum(sys.getsizeof(token) for token in self.tokens[1:])
+
+
+class FlatVocabulary:
+    """
+    Read-only Vocabulary over flat buffers, f.ex. the sections of a memory-mapped model file (see model_artifact). No
+    Python object is created per token, so processes that map the same file share its memory. Tokens are found with
+    an open addressing hash table of token ids, see build_hash_table. Look ups of frequent tokens are memoized in a
+    small per process LRU cache.
+    """
+
+    def __init__(self, token_bytes, token_offsets, hash_table, cache_size=DEFAULT_CACHE_SIZE):
+        """
+        :param token_bytes: UTF-8 encoded tokens ordered by id, each followed by a one byte separator
+        :param token_offsets: Sequence of len(vocabulary) + 1 offsets, the token with id i is
+        token_bytes[token_offsets[i - 1]:token_offsets[i] - 1]
+        :param hash_table: Sequence of token ids (0 for empty slots) of power of two length, see build_hash_table
+        :param cache_size: Maximum number of memoized look ups, 0 disables memoization
+        """
+        self.token_bytes = token_bytes
+        self.token_offsets = token_offsets
+        self.hash_table = hash_table
+        self.mask = len(hash_table) - 1
+        if cache_size > 0:
+            self.get = functools.lru_cache(maxsize=cache_size)(self.find_id)
+        # ScoringEngine looks up token ids with vocabulary.ids.get, like in Vocabulary
+        self.ids = self
+
+    def get(self, token, default=None):
+        """
+        :return: Id of token, default if token is not in the vocabulary
+        """
+        return self.find_id(token, default)
+
+    def find_id(self, token, default=None):
+        """
+        Looks up a token in the hash table, without using the memoization cache, see get
+        """
+        data = token.encode("utf-8")
+        token_bytes, token_offsets, hash_table, mask = self.token_bytes, self.token_offsets, self.hash_table, self.mask
+        slot = zlib.crc32(data) & mask
+        while True:
+            token_id = hash_table[slot]
+            if token_id == 0:
+                return default
+            if token_bytes[token_offsets[token_id - 1]:token_offsets[token_id] - 1] == data:
+                return token_id
+            slot = (slot + 1) & mask
+
+    def get_id(self, token):
+        """
+        :return: Id of token, None if token is not in the vocabulary
+        """
+        return self.get(token)
+
+    def get_token(self, token_id):
+        start, end = self.token_offsets[token_id - 1], self.token_offsets[token_id] - 1
+        return bytes(self.token_bytes[start:end]).decode("utf-8")
+
+    def get_token_list(self):
+        """
+        :return: List of all tokens, ordered by id
+        """
+        return [self.get_token(token_id) for token_id in range(1, len(self) + 1)]
+
+    def __len__(self):
+        return len(self.token_offsets) - 1
+
+    def __contains__(self, token):
+        return self.get(token) is not None
+
+
+def build_hash_table(encoded_tokens, num_tokens=None):
+    """
+    Builds the hash table of FlatVocabulary: linear probing on the CRC-32 of the UTF-8 encoded token, at most half
+    full
+
+    :param encoded_tokens: List (or iterable) of distinct UTF-8 encoded tokens, the token with id i at index i - 1
+    :param num_tokens: Number of tokens, required if encoded_tokens is not a list
+    :return: Array of token ids, 0 for empty slots
+    """
+    if num_tokens is None:
+        num_tokens = len(encoded_tokens)
+    size = 1
+    while size < 2 * num_tokens:
+        size *= 2
+    mask = size - 1
+
+    hash_table = array("I", [0]) * size
+    for token_id, data in enumerate(encoded_tokens, 1):
+        slot = zlib.crc32(data) & mask
+        while hash_table[slot] != 0:
+            slot = (slot + 1) & mask
+        hash_table[slot] = token_id
+    return hash_table
@@ -1,18 +1,48 @@
 import math
+import multiprocessing
+import os
+import time
 
 from fjlc.lexicon.container.token_trie import TokenTrie
+from fjlc.preprocessing.preprocessors.corpus_cache import CorpusReader, split_into_block_ranges
 from fjlc.preprocessing.filters.regex_filters import RegexFilters
+from fjlc.utils.progressbar.build_metrics import BuildMetrics, UPDATE_INTERVAL
+from fjlc.utils.reader.byte_range_reader import split_into_byte_ranges
+from fjlc.utils.reader.data_set_reader import DataSetReader
+from fjlc.utils import array_utils
+from fjlc.utils.tools import parallel
 import fjlc.classifier.classifier_options as classifier_options
 import fjlc.lexicon.container.adjectives as adjectives
+import fjlc.preprocessing.filters.canonical_form as canonical_form
 import fjlc.utils.map_utils as map_utils
 
+# Number of byte range shards per worker process, more shards than workers evens out the load between workers
+SHARDS_PER_JOB = 4
+
+# Stages of counting a tweet, timed by count_tweets
+COUNTING_STAGES = ("reading", "filtering", "tokenizing", "counting")
+
+# State of the current worker process, set once by init_counting_worker
+worker_token_trie = None
+worker_filters = None
+worker_options = None
+
 
 class LexiconCreator:
 
-    def __init__(self):
+    def __init__(self, options, metrics=None, corpus_cache=None):
+        """
+        :param options: ClassifierOptions with the intensifiers and stop words of the n-grams that are not counted
+        :param metrics: BuildMetrics to report progress, throughput and stage times to, None for no reporting
+        :param corpus_cache: CorpusCache to look up the filtered and tokenized tweets of datasets in, so that they are
+                             only filtered the first time a dataset is counted. None to filter every time.
+        """
+        self.options = options
         self.data_set_reader = None
+        self.metrics = BuildMetrics() if metrics is None else metrics
+        self.corpus_cache = corpus_cache
 
-    def create_lexicon(self, data_set_reader, n_grams, min_total_occurrences, min_sentiment_value, filters):
+    def create_lexicon(self, data_set_reader, n_grams, min_total_occurrences, min_sentiment_value, filters, jobs=1):
         """
          Generates sentiment lexicon using PMI on words and classification of context they are in.
          
@@ -24,32 +54,54 @@ class LexiconCreator:
                                      often words that are used equally in positive or negative context, possibly even
                                      different words, but with same spelling, and thus having uncertain value)
          :param: filters             filters to apply to tweets before searching for n-grams
+         :param: jobs                number of worker processes counting n-grams, None for one per core. The lexicon
+                                     is the same for any number of jobs.
          :return: map of n-grams and their sentiment values, sentiment values are in [-5, 5]
         """
-        counter = self.count_n_grams_py_polarity(data_set_reader, n_grams, filters)
-        lexicon = {}
+        return self.compute_lexicon(self.count_n_grams(data_set_reader, n_grams, filters, jobs), min_total_occurrences,
+                                    min_sentiment_value)
 
-        pos = sum(map(lambda i: i.num_positive, counter.values()))
-        neg = sum(map(lambda i: i.num_negative, counter.values()))
-        ratio = neg / float(pos)
+    def update_lexicon(self, checkpoint, data_set_reader, min_total_occurrences, min_sentiment_value, filters, jobs=1):
+        """
+        Counts the n-grams of checkpoint in a new dataset, adds the counts to checkpoint and generates the sentiment
+        lexicon of all data counted so far. The lexicon is the same as create_lexicon gives for the concatenation of
+        all the datasets, in the order they were counted.
 
-        for key, value in counter.items():
-            if value.get_total_occurrences() <= min_total_occurrences:
-                continue
+        :param checkpoint: PolarityCheckpoint of the datasets counted so far, updated in place. It must have been
+                           counted with the options of this LexiconCreator and filters.
+        :param data_set_reader: Dataset with the new tweets and their sentiment classification
+        :return: map of n-grams and their sentiment values, see create_lexicon
+        """
+        checkpoint.check_compatible(self.options, filters)
+        merge_counters(checkpoint.counter, self.count_n_grams(data_set_reader, checkpoint.n_grams, filters, jobs))
+        return self.compute_lexicon(checkpoint.counter, min_total_occurrences, min_sentiment_value)
 
-            over = value.num_positive
-            under = value.num_negative
+    def compute_lexicon(self, counter, min_total_occurrences, min_sentiment_value):
+        """
+        Calculates the sentiment values of the counted n-grams (see calculate_lexicon) and finishes the build
 
-            sentiment_value = math.log(ratio * over / under)
-            if abs(sentiment_value) >= min_sentiment_value:
-                lexicon[key] = sentiment_value
+        :return: map of n-grams and their sentiment values, sentiment values are in [-5, 5]
+        """
+        with self.metrics.stage("normalization"):
+            lexicon = calculate_lexicon(counter, min_total_occurrences, min_sentiment_value)
+        self.metrics.finish()
+        return lexicon
 
-                if RegexFilters.WHITESPACE.split(key).length == 1 and not classifier_options.is_special_class_word(key):
-                    for related_word in adjectives.get_adverb_and_adjectives(key):
-                        if related_word in counter and related_word not in lexicon:
-                            lexicon[related_word] = sentiment_value
+    def count_n_grams(self, data_set_reader, n_grams, filters, jobs=1):
+        """
+        :param jobs: number of worker processes, None for one per core. Compressed datasets are counted serially.
+        :return: Map of Counter instances for n-grams, see count_n_grams_py_polarity
+        """
+        if self.corpus_cache is not None:
+            with self.metrics.stage("caching"):
+                corpus_file = self.corpus_cache.get_corpus(data_set_reader.get_file_name(), filters,
+                                                           data_set_reader.tweet_index, data_set_reader.class_index,
+                                                           jobs)
+            return self.count_cached_n_grams(CorpusReader(corpus_file), n_grams, jobs)
 
-        return map_utils.normalize_map_between(lexicon, -5, 5)
+        if parallel.get_num_jobs(jobs) == 1 or not data_set_reader.is_splittable():
+            return self.count_n_grams_py_polarity(data_set_reader, n_grams, filters)
+        return self.count_n_grams_py_polarity_in_parallel(data_set_reader, n_grams, filters, jobs)
 
     def count_n_grams_py_polarity(self, data_set_reader, n_grams, filters):
         """
@@ -62,40 +114,314 @@ class LexiconCreator:
         :return: Map of Counter instances for n-grams in nGrams Collection
         """
         self.data_set_reader = data_set_reader
-        token_trie = TokenTrie(n_grams)
+        self.metrics.start(os.path.getsize(data_set_reader.get_file_name()), data_set_reader.get_bytes_read)
+        return count_entries(data_set_reader, TokenTrie(n_grams), filters, self.options, self.metrics)
 
-        counter = {}
+    def count_n_grams_py_polarity_in_parallel(self, data_set_reader, n_grams, filters, jobs):
+        """
+        Same as count_n_grams_py_polarity, but the dataset file is split into byte range shards that are filtered,
+        tokenized and counted in worker processes. The counter maps of the shards are merged in file order, so the
+        result is identical to counting serially, including the order of the map.
 
-        # Todo: parallelize
-        for entry in data_set_reader.items():
-            tweet = filters.apply(entry.get_tweet())
-            tokens = token_trie.find_optimal_tokenization(RegexFilters.WHITESPACE.split(tweet))
+        :param jobs: Number of worker processes, None for one per core
+        """
+        self.data_set_reader = data_set_reader
+        jobs = parallel.get_num_jobs(jobs)
+        file_name = data_set_reader.get_file_name()
+        self.metrics.start(os.path.getsize(file_name))
+        shards = [(file_name, start, end, data_set_reader.tweet_index, data_set_reader.class_index)
+                  for start, end in split_into_byte_ranges(file_name, jobs * SHARDS_PER_JOB)]
+        return self.count_shards(count_shard, shards, n_grams, filters, jobs)
+
+    def count_cached_n_grams(self, corpus_reader, n_grams, jobs=1):
+        """
+        Same as count_n_grams, for the already filtered and tokenized tweets of a corpus file, see CorpusCache. Block
+        range shards of the corpus file are counted in parallel if jobs is not 1.
 
-            for n_gram in tokens:
-                n_gram_words = RegexFilters.WHITESPACE.split(n_gram)
-                if self.contains_illegal_word(n_gram_words):
-                    continue
-                if not n_gram in counter:
-                    counter[n_gram] = self.Counter()
+        :param corpus_reader: CorpusReader of the corpus file of the dataset
+        """
+        self.data_set_reader = corpus_reader
+        jobs = parallel.get_num_jobs(jobs)
+        file_name = corpus_reader.file_name
+        if jobs == 1:
+            self.metrics.start(os.path.getsize(file_name), corpus_reader.get_bytes_read)
+            return count_corpus(corpus_reader, TokenTrie(n_grams), self.options, self.metrics)
 
-                if entry.get_classification().is_positive():
-                    counter[n_gram].num_positive += 1
-                elif entry.get_classification().is_negative():
-                    counter[n_gram].num_negative += 1
+        self.metrics.start(os.path.getsize(file_name))
+        shards = [(file_name, start, end) for start, end in split_into_block_ranges(file_name, jobs * SHARDS_PER_JOB)]
+        return self.count_shards(count_corpus_shard, shards, n_grams, None, jobs)
+
+    def count_shards(self, count_function, shards, n_grams, filters, jobs):
+        """
+        Counts shards in worker processes and merges their counter maps in order
+
+        :param count_function: Function counting a shard in a worker process, count_shard or count_corpus_shard
+        :return: Map of Counter instances for n-grams
+        """
+        counter = {}
+        worker_arguments = (n_grams, filters, self.options, canonical_form.dictionary)
+        pool = multiprocessing.Pool(jobs, init_counting_worker, worker_arguments)
+        try:
+            for shard_counter, shard_metrics in pool.imap(count_function, shards):
+                merge_counters(counter, shard_counter)
+                self.metrics.record_size("n_grams", len(counter))
+                self.metrics.merge(shard_metrics)
+        finally:
+            pool.terminate()
+            pool.join()
 
         return counter
 
     @staticmethod
-    def contains_illegal_word(n_gram):
-        return classifier_options.is_stop_word(n_gram[-1] or classifier_options.contains_intensifier(n_gram))
+    def contains_illegal_word(n_gram, options):
+        return options.is_stop_word(n_gram[-1] or options.contains_intensifier(n_gram))
 
     def get_progress(self):
         return 0 if self.data_set_reader is None else self.data_set_reader.get_progress()
 
     class Counter:
+        # Every n-gram starts with this many positive and negative occurrences, which smooths the sentiment value of
+        # rare n-grams and avoids division by zero
+        PRIOR = 4
+
         def __init__(self):
-            self.num_positive = 4
-            self.num_negative = 4
+            self.num_positive = self.PRIOR
+            self.num_negative = self.PRIOR
 
         def get_total_occurrences(self):
             return self.num_positive + self.num_negative
+
+        def merge(self, other):
+            """
+            Adds the occurrences counted by other (without its prior) to this counter
+            """
+            self.num_positive += other.num_positive - self.PRIOR
+            self.num_negative += other.num_negative - self.PRIOR
+
+
+def calculate_lexicon(counter, min_total_occurrences, min_sentiment_value):
+    """
+    Calculates the sentiment values of the counted n-grams, see LexiconCreator.create_lexicon. Uses bulk array
+    operations if NumPy is installed, see calculate_lexicon_vectorized.
+
+    :param counter: Map of n-gram to LexiconCreator.Counter
+    :return: map of n-grams and their sentiment values, sentiment values are in [-5, 5]
+    """
+    if array_utils.use_numpy():
+        return calculate_lexicon_vectorized(counter, min_total_occurrences, min_sentiment_value)
+
+    lexicon = {}
+
+    pos = sum(map(lambda i: i.num_positive, counter.values()))
+    neg = sum(map(lambda i: i.num_negative, counter.values()))
+    ratio = neg / float(pos)
+
+    for key, value in counter.items():
+        if value.get_total_occurrences() <= min_total_occurrences:
+            continue
+
+        over = value.num_positive
+        under = value.num_negative
+
+        sentiment_value = math.log(ratio * over / under)
+        if abs(sentiment_value) >= min_sentiment_value:
+            lexicon[key] = sentiment_value
+            add_related_words(lexicon, counter, key, sentiment_value)
+
+    return map_utils.normalize_map_between(lexicon, -5, 5)
+
+
+def calculate_lexicon_vectorized(counter, min_total_occurrences, min_sentiment_value):
+    """
+    NumPy implementation of calculate_lexicon. The counts are exported to arrays once, and the log ratios, the
+    occurrence and sentiment value thresholds and the normalization are bulk array operations. Only the n-grams that
+    make it into the lexicon are visited in Python, in the order of counter.
+    """
+    numpy = array_utils.get_numpy()
+    n_gram_counters = list(counter.values())
+    num_positive = numpy.fromiter([value.num_positive for value in n_gram_counters], numpy.int64, len(counter))
+    num_negative = numpy.fromiter([value.num_negative for value in n_gram_counters], numpy.int64, len(counter))
+    del n_gram_counters
+
+    ratio = int(num_negative.sum()) / float(int(num_positive.sum()))
+    sentiment_values = array_utils.sentiment_values(num_positive, num_negative, ratio)
+    kept = numpy.flatnonzero((num_positive + num_negative > min_total_occurrences) &
+                             (numpy.abs(sentiment_values) >= min_sentiment_value))
+
+    keys = list(counter)
+    lexicon = {}
+    for i, sentiment_value in zip(kept.tolist(), sentiment_values[kept].tolist()):
+        key = keys[i]
+        lexicon[key] = sentiment_value
+        add_related_words(lexicon, counter, key, sentiment_value)
+
+    return map_utils.normalize_map_between(lexicon, -5, 5)
+
+
+def add_related_words(lexicon, counter, key, sentiment_value):
+    """
+    Gives the counted adverbs and adjectives of word key that are not yet in lexicon the sentiment value of key
+    """
+    if RegexFilters.WHITESPACE.search(key) is None and not classifier_options.is_special_class_word(key):
+        for related_word in adjectives.get_adverb_and_adjectives(key):
+            if related_word in counter and related_word not in lexicon:
+                lexicon[related_word] = sentiment_value
+
+
+def count_entries(entries, token_trie, filters, options, metrics=None):
+    """
+    Counts the positive and negative occurrences of the n-grams of token_trie in the tweets of entries, see
+    count_tweets
+
+    :param entries: Iterable of DataSetEntry
+    :param filters: filters to apply to tweets before searching for n-grams
+    :return: Map of n-gram to LexiconCreator.Counter, in order of first occurrence
+    """
+    tweets = ((entry.get_tweet(), entry.get_classification()) for entry in entries)
+    return count_tweets(tweets, token_trie, options, filters, metrics)
+
+
+def count_corpus(records, token_trie, options, metrics=None):
+    """
+    Same as count_entries, for the (classification, tokens) records of a corpus file (see CorpusReader), whose
+    tweets are already filtered and tokenized
+
+    :param records: Iterable of (classification, tokens) tuples
+    :return: Map of n-gram to LexiconCreator.Counter, in order of first occurrence
+    """
+    tweets = ((tokens, classification) for classification, tokens in records)
+    return count_tweets(tweets, token_trie, options, None, metrics)
+
+
+def count_tweets(tweets, token_trie, options, filters=None, metrics=None):
+    """
+    Counts the positive and negative occurrences of the n-grams of token_trie in tweets. Tweets are tokenized to ids in
+    the vocabulary of token_trie, and n-grams are counted by id, so every distinct n-gram is only checked for illegal
+    words once.
+
+    :param tweets: Iterable of (tweet, classification) tuples. A tweet is a string if filters is given, otherwise the
+                   list of its already filtered tokens.
+    :param token_trie: TokenTrie of the n-grams to count, its vocabulary is extended with the tokens of the tweets
+    :param options: ClassifierOptions with the intensifiers and stop words of the n-grams that are not counted
+    :param filters: filters to apply to tweets before splitting them into tokens, None for tokenized tweets
+    :param metrics: BuildMetrics to add lines, COUNTING_STAGES times and the number of n-grams to
+    :return: Map of n-gram to LexiconCreator.Counter, in order of first occurrence
+    """
+    vocabulary = token_trie.vocabulary
+    add = vocabulary.add
+    find_optimal_phrase_ids = token_trie.find_optimal_phrase_ids
+    split = RegexFilters.WHITESPACE.split
+    perf_counter = time.perf_counter
+
+    counter = {}
+    illegal = {}
+    lines = 0
+    stage_times = [0.0] * len(COUNTING_STAGES)
+    end = perf_counter()
+    for tweet, classification in tweets:
+        start = perf_counter()
+        if filters is not None:
+            tweet = split(filters.apply(tweet))
+        filtered = perf_counter()
+        phrase_ids = find_optimal_phrase_ids([add(token) for token in tweet])
+        tokenized = perf_counter()
+
+        count_phrase_ids(counter, illegal, vocabulary, phrase_ids, classification, options)
+        counted = perf_counter()
+        stage_times[0] += start - end
+        stage_times[1] += filtered - start
+        stage_times[2] += tokenized - filtered
+        stage_times[3] += counted - tokenized
+        end = counted
+
+        lines += 1
+        if lines == UPDATE_INTERVAL and metrics is not None:
+            add_counting_metrics(metrics, lines, stage_times, len(counter))
+            lines = 0
+            stage_times = [0.0] * len(COUNTING_STAGES)
+
+    if metrics is not None:
+        add_counting_metrics(metrics, lines, stage_times, len(counter))
+    return {vocabulary.get_token(phrase_id): n_gram_counter for phrase_id, n_gram_counter in counter.items()}
+
+
+def count_phrase_ids(counter, illegal, vocabulary, phrase_ids, classification, options):
+    """
+    Counts the occurrence of the phrases of a tweet in the polarity of its classification
+
+    :param counter: Map of phrase id to LexiconCreator.Counter, updated in place
+    :param illegal: Map of phrase id to whether the phrase contains an illegal word, updated in place
+    :param phrase_ids: Ids of the phrases found in the tweet
+    :param options: ClassifierOptions the illegal words are looked up in
+    """
+    is_positive = classification.is_positive()
+    is_negative = classification.is_negative()
+    for phrase_id in phrase_ids:
+        is_illegal = illegal.get(phrase_id)
+        if is_illegal is None:
+            is_illegal = illegal[phrase_id] = LexiconCreator.contains_illegal_word(
+                RegexFilters.WHITESPACE.split(vocabulary.get_token(phrase_id)), options)
+        if is_illegal:
+            continue
+
+        n_gram_counter = counter.get(phrase_id)
+        if n_gram_counter is None:
+            n_gram_counter = counter[phrase_id] = LexiconCreator.Counter()
+
+        if is_positive:
+            n_gram_counter.num_positive += 1
+        elif is_negative:
+            n_gram_counter.num_negative += 1
+
+
+def add_counting_metrics(metrics, lines, stage_times, num_n_grams):
+    metrics.record_size("n_grams", num_n_grams)
+    metrics.add(lines, stage_times=dict(zip(COUNTING_STAGES, stage_times)))
+
+
+def merge_counters(counter, other):
+    """
+    Merges the counter map other into counter. N-grams new to counter are added in the order of other, so merging the
+    maps of consecutive shards in order gives the same map as counting all shards at once.
+    """
+    for n_gram, n_gram_counter in other.items():
+        if n_gram in counter:
+            counter[n_gram].merge(n_gram_counter)
+        else:
+            counter[n_gram] = n_gram_counter
+    return counter
+
+
+def init_counting_worker(n_grams, filters, options, dictionary):
+    """
+    Restores the n-grams, filters and options of the parent process in a worker process, and the module level
+    canonical dictionary for filters that correct words with it
+    """
+    global worker_token_trie, worker_filters, worker_options
+    canonical_form.set_dictionary(dictionary)
+    worker_token_trie = TokenTrie(n_grams)
+    worker_filters = filters
+    worker_options = options
+
+
+def count_shard(shard):
+    """
+    :param shard: (file name, start byte, end byte, tweet index, class index) tuple
+    :return: Counter map and BuildMetrics of the dataset entries in the byte range
+    """
+    file_name, start, end, tweet_index, class_index = shard
+    metrics = BuildMetrics()
+    metrics.add(num_bytes=end - start)
+    entries = DataSetReader(file_name, tweet_index, class_index, start, end)
+    return count_entries(entries, worker_token_trie, worker_filters, worker_options, metrics), metrics
+
+
+def count_corpus_shard(shard):
+    """
+    :param shard: (corpus file name, start byte, end byte) tuple of a block range
+    :return: Counter map and BuildMetrics of the records in the block range
+    """
+    file_name, start, end = shard
+    metrics = BuildMetrics()
+    metrics.add(num_bytes=end - start)
+    return count_corpus(CorpusReader(file_name, start, end), worker_token_trie, worker_options, metrics), metrics
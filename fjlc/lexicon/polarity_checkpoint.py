@@ -0,0 +1,92 @@
+import gzip
+import hashlib
+import json
+import os
+
+from fjlc.lexicon.lexicon_creator import LexiconCreator
+from fjlc.preprocessing.preprocessors.corpus_cache import describe_filters
+
+# Version of the checkpoint file format, checkpoints of another version are refused
+FORMAT_VERSION = 1
+
+
+class PolarityCheckpoint:
+    """
+    Positive and negative occurrence counts of n-grams in all data sets counted so far, so that a lexicon can be
+    updated with new data without counting the old data again. The counts are only valid for the n-grams, options and
+    filters (with their canonical dictionary) they were counted with, which the checkpoint records.
+    """
+
+    def __init__(self, n_grams, settings, counter=None):
+        """
+        :param n_grams: n-grams the counts are for
+        :param settings: Fingerprint of the options and filters the counts are made with, see get_settings_fingerprint
+        :param counter: Map of n-gram to LexiconCreator.Counter, in order of first occurrence
+        """
+        self.n_grams = list(n_grams)
+        self.settings = settings
+        self.counter = {} if counter is None else counter
+
+    def check_compatible(self, options, filters, n_grams=None):
+        """
+        Raises ValueError if counts made with options and filters (and n_grams, if given) can not be merged into this
+        checkpoint
+        """
+        if n_grams is not None and list(n_grams) != self.n_grams:
+            raise ValueError("Checkpoint was counted with other n-grams")
+        if get_settings_fingerprint(options, filters) != self.settings:
+            raise ValueError("Checkpoint was counted with other options, filters or canonical dictionary")
+
+    def save(self, file_name):
+        """
+        Writes the checkpoint as gzipped JSON. Counts are stored without the prior of LexiconCreator.Counter, in one
+        list per polarity. The file is replaced atomically, so a failed save never corrupts an existing checkpoint.
+        """
+        data = {
+            "version": FORMAT_VERSION,
+            "settings": self.settings,
+            "nGrams": self.n_grams,
+            "phrases": list(self.counter),
+            "positive": [counter.num_positive - LexiconCreator.Counter.PRIOR for counter in self.counter.values()],
+            "negative": [counter.num_negative - LexiconCreator.Counter.PRIOR for counter in self.counter.values()],
+        }
+
+        temporary_file = "%s.%d.tmp" % (file_name, os.getpid())
+        try:
+            with gzip.open(temporary_file, "wt", encoding="utf-8") as f:
+                json.dump(data, f, separators=(",", ":"))
+            os.replace(temporary_file, file_name)
+        finally:
+            if os.path.exists(temporary_file):
+                os.remove(temporary_file)
+
+    @staticmethod
+    def load(file_name):
+        """
+        :param file_name: File written by save
+        :return: The PolarityCheckpoint stored in file_name
+        """
+        with gzip.open(file_name, "rt", encoding="utf-8") as f:
+            data = json.load(f)
+        if data.get("version") != FORMAT_VERSION:
+            raise ValueError("Unsupported checkpoint version: " + str(data.get("version")))
+
+        counter = {}
+        for phrase, num_positive, num_negative in zip(data["phrases"], data["positive"], data["negative"]):
+            n_gram_counter = counter[phrase] = LexiconCreator.Counter()
+            n_gram_counter.num_positive += num_positive
+            n_gram_counter.num_negative += num_negative
+
+        return PolarityCheckpoint(data["nGrams"], data["settings"], counter)
+
+
+def get_settings_fingerprint(options, filters):
+    """
+    :param options: ClassifierOptions of the LexiconCreator counting the tweets
+    :param filters: Filters (or CompiledFilters) applied to the tweets, including the canonical dictionary they
+                    correct words with
+    :return: Hex digest of options and filters, which decide how tweets are counted
+    """
+    settings = json.dumps([dict(options.words), describe_filters(filters.string_filters),
+                           describe_filters(filters.token_filters)], sort_keys=True)
+    return hashlib.blake2b(settings.encode("utf-8"), digest_size=16).hexdigest()
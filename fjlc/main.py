@@ -1,16 +1,18 @@
+import concurrent.futures
+import threading
 from os import path
 
 import fjlc.classifier.classifier_options as classifier_options
-import fjlc.lexical_classifier as lexical_classifier
 import fjlc.preprocessing.filters.canonical_form as canonical_form
-from fjlc.classifier.classifier import Classifier
-from fjlc.lexicon.container.prior_polarity_lexicon import PriorPolarityLexicon
+from fjlc.classifier.classifier_model import ClassifierModel
+from fjlc.classifier.model_watcher import ModelWatcher, DEFAULT_INTERVAL
+from fjlc.classifier.result_cache import ResultCache, LRU, TEXT
 from fjlc.preprocessing.filters.filters import Filters
-from fjlc.preprocessing.preprocessors.tweet_n_grams_pmi import TweetNGramsPMI
 from fjlc.utils import json_utils, map_utils
-from fjlc.lexicon.lexicon_creator import LexiconCreator
-from fjlc.utils.reader.data_set_reader import DataSetReader
-from fjlc.utils.reader.line_reader import LineReader
+from fjlc.utils.tools import parallel
+
+# Lexicon creation (Lexicon, LexiconCreator, TweetNGramsPMI, CorpusCache) and worker pools import their modules when
+# first used, so that importing fjlc to classify stays fast, see tests/import_time_test.py
 
 N_GRAM_STRING_FILTERS = [
     Filters.html_unescape, Filters.remove_unicode_emoticons, Filters.normalize_form, Filters.remove_url,
@@ -31,49 +33,293 @@ TWEET_CHARACTER_FILTERS = [Filters.remove_inner_word_characters, Filters.remove_
                            canonical_form.correct_word_via_canonical]
 TWEET_FILTERS = Filters(TWEET_STRING_FILTERS, TWEET_CHARACTER_FILTERS)
 
+DEFAULT_LEXICON = path.join(path.abspath(path.dirname(__file__)), "res/data/lexicon.pmi.json")
+DEFAULT_OPTIONS = path.join(path.abspath(path.dirname(__file__)), "res/data/options.pmi.json")
+DEFAULT_DICTIONARY = path.join(path.abspath(path.dirname(__file__)), "res/data/canonical.json")
+DEFAULT_CHUNKSIZE = 256
+
 
 class Lexicon:
-    def __init__(self, n_grams_file, data_set_file, lexicon_file, max_error_rate, sentiment_value_threshold):
+    def __init__(self, n_grams_file, data_set_file, lexicon_file, max_error_rate, sentiment_value_threshold,
+                 options=DEFAULT_OPTIONS, dictionary=DEFAULT_DICTIONARY):
+        """
+        :param options: Path to the options file with the intensifiers and stop words of n-grams that are not counted
+        :param dictionary: Path to the canonical dictionary the tweets are corrected with
+        """
         self.n_grams_file = n_grams_file
         self.data_set_file = data_set_file
         self.lexicon_file = lexicon_file
         self.max_error_rate = max_error_rate
         self.sentiment_value_threshold = sentiment_value_threshold
+        self.options = options
+        self.dictionary = dictionary
+
+    def create_lexicon(self, jobs=1, checkpoint_file=None, metrics=None, cache_directory=None):
+        """
+        Creates the lexicon and writes it to lexicon_file
+
+        :param jobs: Number of worker processes counting n-grams in the data set, None for one per core
+        :param checkpoint_file: If given, the n-gram counts are also written to this file, so that the lexicon can
+                                later be updated with new data by update_lexicon
+        :param metrics: BuildMetrics to report progress and throughput to, e.g.
+                        BuildMetrics(ProgressBar("Creating lexicon...")). None for no reporting.
+        :param cache_directory: Directory of a CorpusCache of filtered tweets, which lets later runs on the same data
+                                set skip filtering. None to filter without caching.
+        """
+        from fjlc.lexicon.lexicon_creator import LexiconCreator
+        from fjlc.lexicon.polarity_checkpoint import PolarityCheckpoint, get_settings_fingerprint
+        from fjlc.utils.reader.data_set_reader import DataSetReader
 
-    def create_lexicon(self):
         frequent_n_grams = json_utils.from_json_file(self.n_grams_file)
         data_set_reader = DataSetReader(self.data_set_file, 1, 0)
 
-        lexicon_creator = LexiconCreator()
-        # ProgressBar.track_progress(lexicon_creator, "Creating lexicon...")
-        lexicon = lexicon_creator.create_lexicon(data_set_reader, frequent_n_grams, self.max_error_rate,
-                                                 self.sentiment_value_threshold, TWEET_FILTERS)
+        options, canonical_dictionary = load_settings(self.options, self.dictionary)
+        filters = TWEET_FILTERS.with_canonical_dictionary(canonical_dictionary).compile()
+        lexicon_creator = LexiconCreator(options, metrics, get_corpus_cache(cache_directory))
+        if checkpoint_file is None:
+            lexicon = lexicon_creator.create_lexicon(data_set_reader, frequent_n_grams, self.max_error_rate,
+                                                     self.sentiment_value_threshold, filters, jobs)
+        else:
+            checkpoint = PolarityCheckpoint(frequent_n_grams, get_settings_fingerprint(options, filters),
+                                            lexicon_creator.count_n_grams(data_set_reader, frequent_n_grams, filters,
+                                                                          jobs))
+            checkpoint.save(checkpoint_file)
+            lexicon = lexicon_creator.compute_lexicon(checkpoint.counter, self.max_error_rate,
+                                                      self.sentiment_value_threshold)
+        json_utils.to_json_file(self.lexicon_file, map_utils.sort_map_by_value(lexicon), True)
+
+    def update_lexicon(self, checkpoint_file, jobs=1, metrics=None, cache_directory=None):
+        """
+        Counts the tweets of data_set_file, adds the counts to the checkpoint written by an earlier create_lexicon or
+        update_lexicon, and writes the lexicon of all data counted so far to lexicon_file. The lexicon is the same as
+        creating it from all the data sets concatenated. The n-grams of the checkpoint are used, n_grams_file is not
+        read.
+
+        :param checkpoint_file: Checkpoint file, updated with the counts of data_set_file
+        :param jobs: Number of worker processes counting n-grams in the data set, None for one per core
+        :param metrics: BuildMetrics to report progress and throughput to, None for no reporting
+        :param cache_directory: Directory of a CorpusCache of filtered tweets, see create_lexicon
+        """
+        from fjlc.lexicon.lexicon_creator import LexiconCreator
+        from fjlc.lexicon.polarity_checkpoint import PolarityCheckpoint
+        from fjlc.utils.reader.data_set_reader import DataSetReader
+
+        checkpoint = PolarityCheckpoint.load(checkpoint_file)
+        options, canonical_dictionary = load_settings(self.options, self.dictionary)
+        filters = TWEET_FILTERS.with_canonical_dictionary(canonical_dictionary).compile()
+        lexicon_creator = LexiconCreator(options, metrics, get_corpus_cache(cache_directory))
+        lexicon = lexicon_creator.update_lexicon(checkpoint, DataSetReader(self.data_set_file, 1, 0),
+                                                 self.max_error_rate, self.sentiment_value_threshold, filters, jobs)
+        checkpoint.save(checkpoint_file)
         json_utils.to_json_file(self.lexicon_file, map_utils.sort_map_by_value(lexicon), True)
 
     @staticmethod
-    def generate_n_grams(input_file, output_file, n_gram_range, cutoff_frequency, pmi_value_threshold):
-        tweet_n_grams = TweetNGramsPMI()
-        # ProgressBar.track_progress(tweet_n_grams, "Generating tweet n-grams...")
+    def generate_n_grams(input_file, output_file, n_gram_range, cutoff_frequency, pmi_value_threshold, jobs=1,
+                         memory_budget=None, spill_directory=None, metrics=None, cache_directory=None,
+                         prune_interval=None, options=DEFAULT_OPTIONS, dictionary=DEFAULT_DICTIONARY):
+        """
+        Finds frequent n-grams in the tweets of input_file (one per line) and writes them to output_file
+
+        :param jobs: Number of worker processes building n-gram trees over shards of input_file, None for one per core
+        :param memory_budget: Approximate number of bytes of n-gram counts to keep in memory, counts beyond it are
+                              spilled to run files on disk. With several jobs every worker keeps to an equal share of
+                              it. None keeps all counts in memory.
+        :param spill_directory: Directory for the run files, the system temporary directory if None
+        :param metrics: BuildMetrics to report progress and throughput to, e.g.
+                        BuildMetrics(ProgressBar("Generating tweet n-grams...")). None for no reporting.
+        :param cache_directory: Directory of a CorpusCache of filtered tweets, which lets later runs on the same input
+                                file (with other thresholds) skip filtering. None to filter without caching.
+        :param prune_interval: Number of lines between each pruning of infrequent n-grams, which bounds memory at the
+                               cost of missing n-grams that only become frequent late in the input, see
+                               TweetNGramsPMI. None (default) counts exactly.
+        :param options: Path to the options file with the intensifiers and stop words n-grams are filtered by
+        :param dictionary: Path to the canonical dictionary the tweets are corrected with
+        """
+        from fjlc.preprocessing.preprocessors.tweet_n_grams_pmi import TweetNGramsPMI
+        from fjlc.utils.reader.line_reader import LineReader
+
+        options, canonical_dictionary = load_settings(options, dictionary)
+        filters = N_GRAM_FILTERS.with_canonical_dictionary(canonical_dictionary).compile()
+        tweet_n_grams = TweetNGramsPMI(options, prune_interval=prune_interval, memory_budget=memory_budget,
+                                       spill_directory=spill_directory, metrics=metrics,
+                                       corpus_cache=get_corpus_cache(cache_directory))
         ngrams = tweet_n_grams.get_frequent_n_grams(LineReader(input_file), n_gram_range, cutoff_frequency,
-                                                    pmi_value_threshold, N_GRAM_FILTERS)
+                                                    pmi_value_threshold, filters, jobs)
 
         json_utils.to_json_file(output_file, ngrams, True)
 
 
+def load_settings(options=DEFAULT_OPTIONS, dictionary=DEFAULT_DICTIONARY):
+    """
+    :param options: Path to options file
+    :param dictionary: Path to canonical dictionary
+    :return: ClassifierOptions and CanonicalDictionary read from the files, for building n-grams and lexicons with
+    """
+    from fjlc.preprocessing.filters.canonical_form import CanonicalDictionary
+    return classifier_options.ClassifierOptions.from_file(options), \
+        CanonicalDictionary(json_utils.from_json_file(dictionary))
+
+
+def get_corpus_cache(cache_directory):
+    """
+    :return: CorpusCache in cache_directory, None if cache_directory is None
+    """
+    if cache_directory is None:
+        return None
+
+    from fjlc.preprocessing.preprocessors.corpus_cache import CorpusCache
+    return CorpusCache(cache_directory)
+
+
 class LexiconClassifier:
-    def __init__(self,
-                 lexicon=path.join(path.abspath(path.dirname(__file__)), "res/data/lexicon.pmi.json"),
-                 options=path.join(path.abspath(path.dirname(__file__)), "res/data/options.pmi.json"),
-                 dictionary=path.join(path.abspath(path.dirname(__file__)), "res/data/canonical.json")):
-        self.lexicon = lexicon
-        self.options = options
-        self.dictionary = dictionary
+    def __init__(self, lexicon=DEFAULT_LEXICON, options=DEFAULT_OPTIONS, dictionary=DEFAULT_DICTIONARY, cache_size=0,
+                 cache_eviction=LRU, cache_key=TEXT, model=None, share_memory=False):
+        """
+        :param lexicon: Path to sentiment lexicon file
+        :param options: Path to options file
+        :param dictionary: Path to canonical dictionary
+        :param cache_size: Maximum number of cached results (or bytes, with size-aware eviction), 0 disables caching
+        :param cache_eviction: Eviction policy of the result cache, "lru" or "size"
+        :param cache_key: What cached results are keyed by, "text" (raw tweet) or "hash" (digest of raw tweet)
+        :param model: Path to a model compiled with compile_model, which starts up much faster than the lexicon,
+        options and dictionary files it was compiled from. lexicon, options and dictionary are ignored if given.
+        :param share_memory: Read the lexicon and phrase tree in place from a read-only memory map of the model (see
+        model_artifact.map_model), instead of loading them into Python objects. The pages of the model are shared by
+        all processes, so worker processes of the batch methods do not each hold a copy of the lexicon. Without model,
+        the classifier is compiled to a temporary model for the workers when they are started.
+        """
+        self.cache_size = cache_size
+        self.cache_eviction = cache_eviction
+        self.cache_key = cache_key
+        self.share_memory = share_memory
+
+        # The model classifications are made with, replaced as a whole by reload
+        self.active_model = ClassifierModel(lexicon, options, dictionary, model, share_memory)
+
+        self.cache = ResultCache(cache_size, cache_eviction, cache_key) if cache_size > 0 else None
+        self.reload_lock = threading.Lock()
+        self.reload_executor = None
+        self.reload_error = None
+        self.watcher = None
+
+    @property
+    def classifier(self):
+        return self.active_model.classifier
+
+    @property
+    def prior_polarity_lexicon(self):
+        """
+        PriorPolarityLexicon of the active model, a FlatPolarityLexicon if it is mapped from a model with share_memory
+        """
+        return self.active_model.prior_polarity_lexicon
+
+    @property
+    def fingerprint(self):
+        return self.active_model.fingerprint
+
+    @property
+    def words(self):
+        return self.active_model.words
 
-        classifier_options.load_options(self.options)
-        canonical_form.load_dictionary(self.dictionary)
+    @property
+    def lexicon(self):
+        return self.active_model.lexicon
 
-        self.prior_polarity_lexicon = PriorPolarityLexicon(self.lexicon)
-        self.classifier = Classifier(self.prior_polarity_lexicon, lexical_classifier.CLASSIFIER_FILTERS)
+    @property
+    def options(self):
+        return self.active_model.options
+
+    @property
+    def dictionary(self):
+        return self.active_model.dictionary
+
+    @property
+    def model(self):
+        return self.active_model.model
+
+    def get_model_version(self):
+        """
+        :return: Version number of the active model, 1 for the model the classifier was created with, incremented by
+        every reload
+        """
+        return self.active_model.version
+
+    def reload(self, lexicon=None, options=None, dictionary=None, model=None, wait=True):
+        """
+        Creates a new model and swaps it in atomically once it is complete. Classifications and batches that started
+        before the swap finish on the old model, later ones use the new model. If worker processes are running, a new
+        pool of workers is started for the new model before the swap, and the old pool is stopped once its last batch
+        has finished. If creating the new model fails, the old model stays active.
+
+        :param lexicon: Path to sentiment lexicon file, the current one if None
+        :param options: Path to options file, the current one if None
+        :param dictionary: Path to canonical dictionary, the current one if None
+        :param model: Path to a compiled model, the current one if None and neither lexicon, options nor dictionary
+        are given
+        :param wait: Whether to wait for the reload, instead of reloading in a background thread
+        :return: Version of the new model if wait, or else a concurrent.futures.Future of it
+        """
+        if not wait:
+            with self.reload_lock:
+                if self.reload_executor is None:
+                    self.reload_executor = concurrent.futures.ThreadPoolExecutor(1, "fjlc-reload")
+                return self.reload_executor.submit(self.reload, lexicon, options, dictionary, model)
+
+        current = self.active_model
+        if model is None and lexicon is None and options is None and dictionary is None:
+            model = current.model
+        try:
+            new_model = ClassifierModel(current.lexicon if lexicon is None else lexicon,
+                                        current.options if options is None else options,
+                                        current.dictionary if dictionary is None else dictionary,
+                                        model, self.share_memory, current.version + 1)
+
+            pool = current.pool
+            if pool is not None:
+                new_model.get_pool(LexiconClassifier, self.get_cache_arguments(), pool.jobs).wait_until_ready()
+        except Exception as error:
+            self.reload_error = error
+            raise
+
+        with self.reload_lock:
+            old_model = self.active_model
+            # Reloads from the watcher and the API can overlap, the model with the highest version stays active
+            new_model.version = max(new_model.version, old_model.version + 1)
+            self.active_model = new_model
+            self.reload_error = None
+        old_model.retire()
+        return new_model.version
+
+    def watch(self, interval=DEFAULT_INTERVAL):
+        """
+        Reloads the model in a background thread whenever its files (the lexicon, options and dictionary, or the
+        compiled model) change, see reload. Failed reloads keep the old model and are reported by get_reload_error.
+
+        :param interval: Seconds between checks of the files
+        """
+        if self.watcher is None:
+            self.watcher = ModelWatcher(lambda: self.active_model.get_files(), self.reload_from_watcher, interval)
+            self.watcher.start()
+
+    def reload_from_watcher(self):
+        try:
+            self.reload()
+        except Exception:
+            # Kept in reload_error, the watcher retries when the files change again
+            pass
+
+    def get_reload_error(self):
+        """
+        :return: The exception of the last reload if it failed, None if it succeeded
+        """
+        return self.reload_error
+
+    def compile_model(self, file_name):
+        """
+        Writes the lexicon, phrase tree, options and canonical dictionary of this classifier to a binary model file,
+        see model_artifact. LexiconClassifier(model=file_name) gives the same results as this classifier.
+        """
+        self.active_model.compile_model(file_name)
 
     def classify(self, tweets):
         """
@@ -81,10 +327,12 @@ class LexiconClassifier:
         :param tweets: String or array of strings to classify.
         :return: String or array of strings depicting sentiment. Sentiment can be POSITIVE, NEGATIVE or NEUTRAL.
         """
+        model = self.active_model
+        classifier = model.classifier
         if type(tweets) == str:
-            return self.classifier.classify(tweets)
+            return classifier.get_classification(self.get_sentiment(tweets, model))
 
-        return list(map(lambda tweet: self.classifier.classify(tweet), tweets))
+        return list(map(lambda tweet: classifier.get_classification(self.get_sentiment(tweet, model)), tweets))
 
     def calculate_sentiment(self, tweets):
         """
@@ -92,7 +340,112 @@ class LexiconClassifier:
         :param tweets: String or array of strings to classify.
         :return: Float or array of floats depicting sentiment value.
         """
+        model = self.active_model
         if type(tweets) == str:
-            return self.classifier.calculate_sentiment(tweets)
+            return self.get_sentiment(tweets, model)
+
+        return list(map(lambda tweet: self.get_sentiment(tweet, model), tweets))
+
+    def get_sentiment(self, tweet, model=None):
+        """
+        Sentiment value of a single tweet, looked up in and stored to the result cache if caching is enabled
+
+        :param model: ClassifierModel to calculate with, the active model if None
+        """
+        if model is None:
+            model = self.active_model
+        if self.cache is None:
+            return model.classifier.calculate_sentiment(tweet)
+
+        sentiment_value = self.cache.get(model.fingerprint, tweet)
+        if sentiment_value is None:
+            sentiment_value = model.classifier.calculate_sentiment(tweet)
+            self.cache.put(model.fingerprint, tweet, sentiment_value)
+        return sentiment_value
+
+    def get_cache_statistics(self):
+        """
+        :return: Hit/miss statistics of the result cache of this process, None if caching is disabled
+        """
+        return None if self.cache is None else self.cache.get_statistics()
+
+    def classify_batch(self, tweets, jobs=None, chunksize=DEFAULT_CHUNKSIZE):
+        """
+        Classify tweets using several processes
+        :param tweets: Iterable of strings to classify.
+        :param jobs: Number of worker processes, defaults to one per core. With jobs=1 tweets are classified in this
+        process.
+        :param chunksize: Number of tweets sent to a worker process at a time.
+        :return: List of strings depicting sentiment, in the same order as tweets.
+        """
+        return list(self.iterate_batch("classify", tweets, jobs, chunksize))
+
+    def calculate_sentiment_batch(self, tweets, jobs=None, chunksize=DEFAULT_CHUNKSIZE):
+        """
+        Calculate sentiment value of tweets using several processes
+        :param tweets: Iterable of strings to calculate sentiment value for.
+        :param jobs: Number of worker processes, defaults to one per core. With jobs=1 tweets are processed in this
+        process.
+        :param chunksize: Number of tweets sent to a worker process at a time.
+        :return: List of floats depicting sentiment value, in the same order as tweets.
+        """
+        return list(self.iterate_batch("calculate_sentiment", tweets, jobs, chunksize))
+
+    def iterate_batch(self, method, tweets, jobs=None, chunksize=DEFAULT_CHUNKSIZE, model=None):
+        """
+        Lazily applies a LexiconClassifier method to tweets, in worker processes if jobs is not 1. Tweets are consumed
+        as results are yielded, so memory use does not grow with the number of tweets.
+        :param method: Name of method, "classify" or "calculate_sentiment".
+        :param tweets: Iterable of strings.
+        :param jobs: Number of worker processes, defaults to one per core.
+        :param chunksize: Number of tweets sent to a worker process at a time.
+        :param model: ClassifierModel to apply method with, the active model if None. All tweets are processed with
+        the same model, even if the classifier is reloaded meanwhile.
+        :return: Generator of results, in the same order as tweets.
+        """
+        if model is None:
+            model = self.active_model
+        jobs = parallel.get_num_jobs(jobs)
+        if jobs == 1:
+            if method == "classify":
+                get_classification = model.classifier.get_classification
+                return (get_classification(self.get_sentiment(tweet, model)) for tweet in tweets)
+            return (self.get_sentiment(tweet, model) for tweet in tweets)
+
+        batch = model.start_batch(LexiconClassifier, self.get_cache_arguments(), method, tweets, jobs, chunksize)
+        if batch is None:
+            # The model was replaced before the batch started and its workers are stopped, the batch is processed
+            # here instead of starting workers for a model that is no longer active
+            return self.iterate_batch(method, tweets, 1, chunksize, model)
+        return batch
+
+    def get_cache_arguments(self):
+        """
+        Keyword arguments of the result cache, passed to the classifiers of worker processes
+        """
+        return {"cache_size": self.cache_size, "cache_eviction": self.cache_eviction, "cache_key": self.cache_key}
+
+    def get_worker_arguments(self):
+        """
+        Keyword arguments that recreate this classifier in a worker process
+        """
+        return dict(self.get_cache_arguments(), **self.active_model.get_worker_arguments())
+
+    def close(self):
+        """
+        Stops watching the model files and the worker processes started by the batch methods, if any
+        """
+        if self.watcher is not None:
+            self.watcher.stop()
+            self.watcher = None
+        with self.reload_lock:
+            executor, self.reload_executor = self.reload_executor, None
+        if executor is not None:
+            executor.shutdown()
+        self.active_model.close()
+
+    def __enter__(self):
+        return self
 
-        return list(map(lambda tweet: self.classifier.calculate_sentiment(tweet), tweets))
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
@@ -1,60 +1,157 @@
+import functools
+import hashlib
+import json
 import sys
 import fjlc.utils.file_utils as file_utils
 import fjlc.utils.json_utils as json_utils
-from fjlc.preprocessing.filters.filters import Filters
+from fjlc.preprocessing.filters.regex_filters import RegexFilters
+
+# Maximum number of distinct words whose correction is memoized
+DEFAULT_CACHE_SIZE = 2 ** 16
 
 dictionary = {}
 
 
+class CanonicalDictionary:
+    """
+    Corrects words to their canonical form. Dictionary entries with a single candidate are looked up directly, the
+    closest of several candidates is found with a bounded edit distance, and corrections are memoized in an LRU cache.
+    """
+
+    def __init__(self, canonical_dictionary, cache_size=DEFAULT_CACHE_SIZE):
+        """
+        :param canonical_dictionary: Map of canonical form (without repeating characters) to candidate words
+        :param cache_size: Maximum number of memoized corrections, None for unbounded
+        """
+        self.dictionary = canonical_dictionary
+        self.cache_size = cache_size
+        self.fingerprint = None
+        self.single_candidates = {}
+        self.multiple_candidates = {}
+        for canonical, candidates in canonical_dictionary.items():
+            if len(candidates) == 1:
+                self.single_candidates[canonical] = candidates[0]
+            else:
+                self.multiple_candidates[canonical] = candidates
+
+        self.correct_word = functools.lru_cache(maxsize=cache_size)(self.find_correction)
+
+    def find_correction(self, text):
+        """
+        Corrects a word without using the memoization cache, see correct_word
+
+        :param text: Word to correct
+        :return: Closest candidate to text of its canonical form, text if its canonical form is not in the dictionary
+        """
+        canonical = RegexFilters.REPEATING_CHARACTERS.sub("$1", text)
+
+        single_candidate = self.single_candidates.get(canonical)
+        if single_candidate is not None:
+            return single_candidate
+
+        candidates = self.multiple_candidates.get(canonical)
+        if candidates is None:
+            return text
+
+        closest_dist = sys.maxsize
+        closest_string = canonical
+        for candidate in candidates:
+            dist = levenshtein_distance(text, candidate, closest_dist - 1)
+            if dist < closest_dist:
+                closest_dist = dist
+                closest_string = candidate
+
+        return closest_string
+
+    def cache_info(self):
+        """
+        :return: Named tuple with hits, misses, maxsize and currsize of the memoization cache
+        """
+        return self.correct_word.cache_info()
+
+    def __reduce__(self):
+        # The memoized correct_word can not be pickled, worker processes recreate the dictionary from its map instead
+        return CanonicalDictionary, (self.dictionary, self.cache_size)
+
+    def __repr__(self):
+        # Identifies the dictionary by its contents, so that filters correcting with it can be fingerprinted, see
+        # corpus_cache.describe_filter
+        if self.fingerprint is None:
+            contents = json.dumps(self.dictionary, sort_keys=True)
+            self.fingerprint = hashlib.blake2b(contents.encode("utf-8"), digest_size=16).hexdigest()
+        return "CanonicalDictionary(%s)" % self.fingerprint
+
+
+canonical_dictionary = CanonicalDictionary(dictionary)
+
+
 def load_dictionary(file_name):
-    global dictionary
-    dictionary = json_utils.from_json(file_utils.read_entire_file_into_string(file_name))
+    set_dictionary(json_utils.from_json(file_utils.read_entire_file_into_string(file_name)))
+
+
+def set_dictionary(new_dictionary):
+    """
+    Sets the module level dictionary used by correct_word_via_canonical
+
+    :param new_dictionary: Map of canonical form to candidate words, as in the dictionary file
+    """
+    global dictionary, canonical_dictionary
+    dictionary = new_dictionary
+    canonical_dictionary = CanonicalDictionary(dictionary)
 
 
 def correct_word_via_canonical(text):
-    canonical = Filters.remove_repeating_characters(text)
+    return canonical_dictionary.correct_word(text)
 
-    candidates = dictionary.get(canonical, None)
-    if candidates is None:
-        return text
-    elif len(candidates) == 1:
-        return candidates[0]
 
-    closest_dist = sys.maxsize
-    closest_string = canonical
-    for candidate in candidates:
-        dist = levenshtein_distance(text, candidate)
-        if dist < closest_dist:
-            closest_dist = dist
-            closest_string = candidate
+def correct_word(canonical_dictionary, text):
+    """
+    Corrects text with canonical_dictionary. Bound to a dictionary with functools.partial, it is a token filter that
+    can be pickled to worker processes, see Filters.with_canonical_dictionary.
+    """
+    return canonical_dictionary.correct_word(text)
 
-    return closest_string
 
+def cache_info():
+    """
+    :return: Hit/miss statistics of the memoization cache of the loaded dictionary
+    """
+    return canonical_dictionary.cache_info()
 
-def levenshtein_distance(s1, s2):
+
+def levenshtein_distance(s1, s2, max_distance=None):
     """
     Calculates edit distance between two strings without replacement
 
     :param s1: String one
     :param s2: String two
+    :param max_distance: If given, the calculation stops as soon as the distance is known to be larger than
+    max_distance, and max_distance + 1 is returned
     :return: Minimum number of insertions/deletions between the two strings to make them equal
     """
     if len(s1) < len(s2):
-        return levenshtein_distance(s2, s1)
+        return levenshtein_distance(s2, s1, max_distance)
 
     # len(s1) >= len(s2)
+    if max_distance is not None and len(s1) - len(s2) > max_distance:
+        return max_distance + 1
+
     if len(s2) == 0:
         return len(s1)
 
-    previous_row = range(len(s2) + 1)
+    previous_row = list(range(len(s2) + 1))
     for i, c1 in enumerate(s1):
         current_row = [i + 1]
+        left = i + 1
         for j, c2 in enumerate(s2):
-            insertions = previous_row[
-                             j + 1] + 1  # j+1 instead of j since previous_row and current_row are one character longer
-            deletions = current_row[j] + 1  # than s2
-            substitutions = previous_row[j] + (c1 != c2)
-            current_row.append(min(insertions, deletions, substitutions))
+            # j+1 instead of j since previous_row and current_row are one character longer than s2
+            left = min(previous_row[j + 1] + 1, left + 1, previous_row[j] + (c1 != c2))
+            current_row.append(left)
+
+        if max_distance is not None and min(current_row) > max_distance:
+            return max_distance + 1
         previous_row = current_row
 
+    if max_distance is not None and previous_row[-1] > max_distance:
+        return max_distance + 1
     return previous_row[-1]
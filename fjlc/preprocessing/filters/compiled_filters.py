@@ -0,0 +1,166 @@
+import functools
+import html
+import re
+
+from fjlc.preprocessing.filters.filters import Filters
+from fjlc.preprocessing.filters.regex_filters import RegexFilters
+
+# Patterns that always match exactly one character and look at no context. Consecutive substitutions with these
+# patterns are independent per character, so they can be fused into a single alternation without changing the output.
+CHARACTER_CLASS_PATTERNS = {
+    RegexFilters.INNER_WORD_CHAR,
+    RegexFilters.NON_SYNTACTICAL_TEXT,
+    RegexFilters.NON_SYNTACTICAL_TEXT_PLUS,
+    RegexFilters.NON_ALPHANUMERIC_TEXT,
+    RegexFilters.NON_ALPHABETIC_TEXT,
+    RegexFilters.NON_ASCII_CHARACTERS,
+}
+
+
+def emoticon_substitutions(replace):
+    return [(RegexFilters.EMOTICON_POSITIVE, replace), (RegexFilters.EMOTICON_NEGATIVE, replace),
+            (RegexFilters.EMOTICON_CONDITIONAL_LEFT, replace), (RegexFilters.EMOTICON_CONDITIONAL_RIGHT, replace)]
+
+
+# The regex substitutions each of the Filters functions performs, in the order they are performed.
+SUBSTITUTIONS = {
+    Filters.remove_repeated_whitespace: [(RegexFilters.WHITESPACE, " ")],
+    Filters.parse_emoticons: emoticon_substitutions(" ||$1|| "),
+    Filters.remove_emoticons: emoticon_substitutions(""),
+    Filters.remove_username: [(RegexFilters.TWITTER_USERNAME, "")],
+    Filters.placeholder_username: [(RegexFilters.TWITTER_USERNAME, Filters.USERNAME_PLACEHOLDER)],
+    Filters.remove_email: [(RegexFilters.TWITTER_EMAIL, "")],
+    Filters.remove_hashtag: [(RegexFilters.TWITTER_HASHTAG, "")],
+    Filters.placeholder_hashtag: [(RegexFilters.TWITTER_HASHTAG, Filters.HASHTAG_PLACEHOLDER)],
+    Filters.hashtag_to_word: [(RegexFilters.TWITTER_HASHTAG, "$1")],
+    Filters.protect_hashtag: [(RegexFilters.TWITTER_HASHTAG, " ||#$1|| ")],
+    Filters.remove_rt_tag: [(RegexFilters.TWITTER_RT_TAG, "")],
+    Filters.placeholder_rt_tag: [(RegexFilters.TWITTER_RT_TAG, Filters.RTTAG_PLACEHOLDER)],
+    Filters.remove_url: [(RegexFilters.TWITTER_URL, "")],
+    Filters.placeholder_url: [(RegexFilters.TWITTER_URL, Filters.URL_PLACEHOLDER)],
+    Filters.remove_inner_word_characters: [(RegexFilters.INNER_WORD_CHAR, "")],
+    Filters.remove_non_syntactical_text: [(RegexFilters.NON_SYNTACTICAL_TEXT, " ")],
+    Filters.remove_non_syntactical_text_plus: [(RegexFilters.NON_SYNTACTICAL_TEXT_PLUS, " ")],
+    Filters.remove_non_alphanumerical_text: [(RegexFilters.NON_ALPHANUMERIC_TEXT, " ")],
+    Filters.remove_non_alphabetic_text: [(RegexFilters.NON_ALPHABETIC_TEXT, "")],
+    Filters.remove_free_digits: [(RegexFilters.FREE_DIGITS, " ")],
+    Filters.remove_repeating_characters: [(RegexFilters.REPEATING_CHARACTERS, "$1")],
+}
+
+# Filters functions that are thin wrappers around another callable.
+ALIASES = {
+    Filters.html_unescape: html.unescape,
+}
+
+
+class CompiledFilters:
+    """
+    Precompiled, single-pass equivalent of a Filters instance. The output of apply() is identical to Filters.apply()
+    for the same string and token filters.
+    """
+
+    def __init__(self, string_filters, token_filters):
+        self.string_filters = None if string_filters is None else compile_chain(string_filters)
+        self.token_filters = None if token_filters is None else compile_chain(token_filters)
+
+    def apply(self, text):
+        if self.string_filters is not None:
+            for string_filter in self.string_filters:
+                text = string_filter(text)
+
+        if self.token_filters is None:
+            return text.strip()
+
+        token_filters = self.token_filters
+        tokens = RegexFilters.WHITESPACE.split(text)
+        for i, token in enumerate(tokens):
+            # Same test as classifier_options.is_special_class_word, inlined as it runs for every token
+            if token.startswith("||") and token.endswith("||"):
+                continue
+
+            for token_filter in token_filters:
+                token = token_filter(token)
+            tokens[i] = token
+
+        return " ".join(tokens).strip()
+
+
+def compile_chain(filters):
+    """
+    Compiles a sequence of filter functions into a sequence of callables that produces the same result. Known regex
+    filters are replaced by their precompiled substitutions and adjacent character class substitutions are fused into
+    a single alternation.
+
+    :param filters: Sequence of filter functions (str -> str)
+    :return: List of callables (str -> str)
+    """
+    steps = []
+    for filter_function in filters:
+        if filter_function in SUBSTITUTIONS:
+            steps.extend(SUBSTITUTIONS[filter_function])
+        else:
+            steps.append(ALIASES.get(filter_function, filter_function))
+
+    compiled = []
+    fusable = []
+    for step in steps:
+        if is_fusable(step):
+            fusable.append(step)
+            continue
+
+        if len(fusable) > 0:
+            compiled.append(fuse_character_classes(fusable))
+            fusable = []
+        compiled.append(step if callable(step) else functools.partial(step[0].sub, step[1]))
+
+    if len(fusable) > 0:
+        compiled.append(fuse_character_classes(fusable))
+
+    return compiled
+
+
+def is_fusable(step):
+    if callable(step):
+        return False
+
+    pattern, replace = step
+    return pattern in CHARACTER_CLASS_PATTERNS and "\\" not in replace and \
+        pattern.flags & ~(re.UNICODE | re.IGNORECASE) == 0
+
+
+def fuse_character_classes(substitutions):
+    """
+    Fuses consecutive character class substitutions into a single substitution. Since every pattern matches a single
+    character without context, the result of the chain for a character is decided by the first pattern that matches
+    it: its replacement, passed through the remaining substitutions of the chain.
+
+    :param substitutions: List of (pattern, replacement) tuples, all patterns in CHARACTER_CLASS_PATTERNS
+    :return: Callable (str -> str) equivalent to applying the substitutions one after another
+    """
+    if len(substitutions) == 1:
+        pattern, replace = substitutions[0]
+        return functools.partial(pattern.sub, replace)
+
+    replacements = []
+    for i, (pattern, replace) in enumerate(substitutions):
+        for later_pattern, later_replace in substitutions[i + 1:]:
+            replace = later_pattern.sub(later_replace, replace)
+        replacements.append(replace)
+
+    def scoped(pattern):
+        return "(?i:" + pattern.pattern + ")" if pattern.flags & re.IGNORECASE else pattern.pattern
+
+    if len(set(replacements)) == 1:
+        fused = re.compile("|".join(scoped(pattern) for pattern, _ in substitutions))
+        return functools.partial(fused.sub, replacements[0])
+
+    fused = re.compile("|".join("(" + scoped(pattern) + ")" for pattern, _ in substitutions))
+    return functools.partial(fused.sub, functools.partial(select_replacement, tuple(replacements)))
+
+
+def select_replacement(replacements, match):
+    """
+    Replacement of a match of a fused alternation: the replacement of the alternative (group) that matched. A module
+    level function (instead of a lambda) so that compiled filters can be pickled and sent to worker processes.
+    """
+    return replacements[match.lastindex - 1]
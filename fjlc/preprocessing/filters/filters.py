@@ -1,10 +1,21 @@
+import functools
 import html
 import re
 import fjlc.classifier.classifier_options as classifier_options
+import fjlc.preprocessing.filters.canonical_form as canonical_form
 from fjlc.preprocessing.filters.regex_filters import RegexFilters
-from normalizr import Normalizr
 
-normalizr = Normalizr(language="en")
+
+@functools.lru_cache(maxsize=None)
+def get_normalizr():
+    """
+    Creates the Normalizr used by normalize_form and remove_unicode_emoticons on first use, importing normalizr and
+    loading its language resources is only paid for by processes that apply these filters
+
+    :return: Normalizr for English
+    """
+    from normalizr import Normalizr
+    return Normalizr(language="en")
 
 
 class Filters:
@@ -21,6 +32,30 @@ class Filters:
         text = self.string_chain(text, self.string_filters)
         return self.token_chain(text, self.token_filters).strip()
 
+    def compile(self):
+        """
+        Compiles the filter chains into a single precompiled normalizer that gives the same output as apply(), but
+        with fewer passes over the text
+
+        :return: CompiledFilters instance with the same apply() interface
+        """
+        from fjlc.preprocessing.filters.compiled_filters import CompiledFilters
+        return CompiledFilters(self.string_filters, self.token_filters)
+
+    def with_canonical_dictionary(self, canonical_dictionary):
+        """
+        :param canonical_dictionary: CanonicalDictionary to correct words with
+        :return: Filters like these, correcting words with canonical_dictionary instead of the module level dictionary
+                 of canonical_form. The filters can be pickled to worker processes.
+        """
+        if self.token_filters is None:
+            return self
+
+        correct_word = functools.partial(canonical_form.correct_word, canonical_dictionary)
+        token_filters = [correct_word if token_filter is canonical_form.correct_word_via_canonical else token_filter
+                         for token_filter in self.token_filters]
+        return Filters(self.string_filters, token_filters)
+
     @staticmethod
     def string_chain(text, filters):
         """
@@ -50,14 +85,14 @@ class Filters:
         if filters is None:
             return text
 
-        sb = ""
+        tokens = []
         for token in RegexFilters.WHITESPACE.split(text):
             if not classifier_options.is_special_class_word(token):
                 token = Filters.string_chain(token, filters)
 
-            sb += token + " "
+            tokens.append(token)
 
-        return sb
+        return " ".join(tokens) + " "
 
     @staticmethod
     def html_unescape(text):
@@ -77,7 +112,7 @@ class Filters:
         :param text: String to format (f.ex. "A strîng wìth fúnny chäracters")
         :return: The formatted String (f.ex. "A string with funny characters")
         """
-        return normalizr.remove_accent_marks(text)
+        return get_normalizr().remove_accent_marks(text)
 
     @staticmethod
     def remove_repeated_whitespace(text):
@@ -103,7 +138,7 @@ class Filters:
 
     @staticmethod
     def remove_unicode_emoticons(text):
-        return normalizr.replace_emojis(text)
+        return get_normalizr().replace_emojis(text)
 
     @staticmethod
     def parse_emoticons(text):
@@ -31,7 +31,7 @@ class RegexFilters:
 
     NON_ALPHANUMERIC_TEXT = re.compile("[^a-zA-Z0-9 ]")
     NON_ALPHABETIC_TEXT = re.compile("[^a-zA-Z ]")
-    NON_ASCII_CHARACTERS = re.compile("[^\\p{ASCII}]")
+    NON_ASCII_CHARACTERS = re.compile("[^\\x00-\\x7F]")
     FREE_DIGITS = re.compile("([^\\w]|^)[0-9]+([^\\w]+[0-9]+)*([^\\w]|$)")
     REPEATING_CHARACTERS = re.compile("(.)\\1+")
 
@@ -0,0 +1,395 @@
+import bisect
+import functools
+import hashlib
+import json
+import marshal
+import multiprocessing
+import os
+import struct
+import sys
+import zlib
+from array import array
+
+from fjlc.preprocessing.filters.regex_filters import RegexFilters
+from fjlc.utils.reader.byte_range_reader import split_into_byte_ranges
+from fjlc.utils.reader.data_set_reader import Classification, DataSetReader
+from fjlc.utils.reader.line_reader import LineReader
+from fjlc.utils.tools import parallel
+import fjlc.preprocessing.filters.canonical_form as canonical_form
+
+# Version of the corpus file format, files of another version are refused and never looked up in a cache
+FORMAT_VERSION = 1
+MAGIC = b"FJLCCORP"
+
+# File header (magic, version), block header (number of records, size of the compressed payload) and payload header
+# (number of tokens, size of the token table) of a corpus file. All integers are little endian.
+FILE_HEADER = struct.Struct("<8sI")
+BLOCK_HEADER = struct.Struct("<II")
+TABLE_HEADER = struct.Struct("<II")
+
+# Number of records per block
+BLOCK_SIZE = 4096
+
+# Shards of the input file per worker process building a corpus file
+SHARDS_PER_JOB = 4
+
+# Classification of a record by label, label 0 is a record without classification (a line of a plain tweets file)
+CLASSIFICATIONS = [None] + sorted(Classification, key=lambda classification: classification.value)
+
+# Filters of the current worker process, set once by init_corpus_worker
+worker_filters = None
+
+
+class CorpusCache:
+    """
+    On-disk cache of filtered and tokenized corpora, so that n-gram mining and lexicon creation can be rerun (with
+    other thresholds, for instance) without filtering the tweets again. A corpus file is keyed by a fingerprint of the
+    input file, the columns read from it, the filter chain (including the code of its functions and the versions of
+    fjlc and normalizr) and the canonical dictionary the filters correct words with, so a corpus is never used with any
+    other input or filters.
+
+    The input file is identified by its size, modification time and inode rather than a digest of its contents, so a
+    lookup does not read the input. A file rewritten in place with the same size and modification time is not
+    detected, a cache directory should not outlive such rewrites.
+    """
+
+    def __init__(self, directory):
+        """
+        :param directory: Directory of the corpus files, created if it does not exist
+        """
+        self.directory = directory
+        os.makedirs(directory, exist_ok=True)
+
+    def get_file_name(self, file_name, filters, tweet_index=None, class_index=None):
+        """
+        :return: Name of the corpus file of file_name filtered with filters, see get_corpus_fingerprint
+        """
+        fingerprint = get_corpus_fingerprint(file_name, filters, tweet_index, class_index)
+        return os.path.join(self.directory, fingerprint + ".corpus")
+
+    def get_corpus(self, file_name, filters, tweet_index=None, class_index=None, jobs=1):
+        """
+        Looks up the corpus of file_name filtered with filters, building it with build_corpus if it is not cached
+
+        :param jobs: Number of worker processes building the corpus, None for one per core
+        :return: Name of the corpus file
+        """
+        corpus_file = self.get_file_name(file_name, filters, tweet_index, class_index)
+        if not os.path.exists(corpus_file):
+            build_corpus(file_name, corpus_file, filters, tweet_index, class_index, jobs)
+        return corpus_file
+
+
+class CorpusReader:
+
+    def __init__(self, file_name, start=None, end=None):
+        """
+        Reads the records of a corpus file written by build_corpus. A record is a (classification, tokens) tuple of a
+        tweet, with the tokens of the filtered tweet and its Classification (None for a plain tweets file).
+
+        :param file_name: Corpus file
+        :param start: Byte offset of the first block to read, None for the first block of the file
+        :param end: Byte offset to stop reading at, None for the end of the file. Both must be block boundaries, see
+                    split_into_block_ranges.
+        """
+        self.file_name = file_name
+        with open(file_name, "rb") as f:
+            header_size = read_file_header(f)
+        self.start = header_size if start is None else start
+        self.end = os.path.getsize(file_name) if end is None else end
+        self.bytes_read = 0
+
+    def __iter__(self):
+        with open(self.file_name, "rb") as f:
+            f.seek(self.start)
+            position = self.start
+            while position < self.end:
+                num_records, size = BLOCK_HEADER.unpack(f.read(BLOCK_HEADER.size))
+                payload = zlib.decompress(f.read(size))
+                position += BLOCK_HEADER.size + size
+                self.bytes_read = position - self.start
+                yield from decode_block(num_records, payload)
+
+    def get_tweets(self):
+        """
+        :return: Generator of the filtered tweets, equal to the output of the filters up to repeated whitespace
+        """
+        for classification, tokens in self:
+            yield " ".join(tokens)
+
+    def get_progress(self):
+        size = self.end - self.start
+        return 100.0 * self.bytes_read / size if size else 100.0
+
+    def get_bytes_read(self):
+        return self.bytes_read
+
+    def is_splittable(self):
+        return True
+
+
+def get_corpus_fingerprint(file_name, filters, tweet_index=None, class_index=None):
+    """
+    :param file_name: Input file, a tweets file with one tweet per line if tweet_index is None, otherwise a tab
+                      separated dataset file
+    :param filters: Filters (or CompiledFilters) applied to the tweets
+    :param tweet_index: Column of the tweets in a dataset file
+    :param class_index: Column of the classifications in a dataset file
+    :return: Hex digest identifying the corpus of file_name filtered with filters
+    """
+    key = json.dumps([FORMAT_VERSION, get_file_signature(file_name), tweet_index, class_index,
+                      describe_filters(filters.string_filters), describe_filters(filters.token_filters),
+                      get_package_versions()], sort_keys=True)
+    return hashlib.blake2b(key.encode("utf-8"), digest_size=16).hexdigest()
+
+
+def get_file_signature(file_name):
+    """
+    :return: Size, modification time in nanoseconds, inode and device of a file, which change whenever the file is
+             written or replaced without reading its contents
+    """
+    stat = os.stat(file_name)
+    return [stat.st_size, stat.st_mtime_ns, stat.st_ino, stat.st_dev]
+
+
+@functools.lru_cache(maxsize=None)
+def get_package_versions():
+    """
+    :return: Installed versions of fjlc and of normalizr, which the filters call into. None for a package that is not
+             installed, f.ex. fjlc run from a source checkout.
+    """
+    try:
+        from importlib import metadata
+    except ImportError:
+        # Python < 3.8, the code digests of describe_filter still tell fjlc versions apart
+        return {"fjlc": None, "normalizr": None}
+
+    versions = {}
+    for package in ["fjlc", "normalizr"]:
+        try:
+            versions[package] = metadata.version(package)
+        except metadata.PackageNotFoundError:
+            versions[package] = None
+    return versions
+
+
+def describe_filters(filters):
+    """
+    :return: JSON serializable description of a filter chain, the names and a digest of the code of the filter
+             functions, or the patterns and replacements of precompiled regex substitutions
+    """
+    if filters is None:
+        return None
+    return [describe_filter(filter_function) for filter_function in filters]
+
+
+def describe_filter(filter_function):
+    if filter_function is canonical_form.correct_word_via_canonical:
+        # Corrects words with the module level dictionary, described like a filter bound to the dictionary
+        return describe_filter(functools.partial(canonical_form.correct_word, canonical_form.canonical_dictionary))
+    if isinstance(filter_function, functools.partial):
+        return [describe_filter(filter_function.func), describe_filter(filter_function.args)]
+    if isinstance(filter_function, (tuple, list)):
+        return [describe_filter(argument) for argument in filter_function]
+    if not callable(filter_function):
+        return repr(filter_function)
+
+    pattern = getattr(filter_function, "__self__", None)
+    if hasattr(pattern, "pattern") and hasattr(pattern, "flags"):
+        return [pattern.pattern, pattern.flags, filter_function.__name__]
+
+    description = [getattr(filter_function, "__module__", None) or "",
+                   getattr(filter_function, "__qualname__", repr(filter_function))]
+    # A changed function body changes the description, also between versions of fjlc
+    code = getattr(filter_function, "__code__", None)
+    if code is not None:
+        description.append(hashlib.blake2b(marshal.dumps(code), digest_size=8).hexdigest())
+    return description
+
+
+def build_corpus(file_name, corpus_file, filters, tweet_index=None, class_index=None, jobs=1):
+    """
+    Filters and tokenizes the tweets of file_name and writes them to corpus_file, in input order. The corpus file is
+    a header followed by zlib compressed blocks of BLOCK_SIZE records. Every block holds its own token table, so
+    blocks can be written and read independently. The file is replaced atomically, so a corpus file is always
+    complete.
+
+    :param jobs: Number of worker processes, None for one per core. Compressed input files are filtered serially.
+    """
+    with LineReader(file_name) as reader:
+        splittable = reader.is_splittable()
+    jobs = parallel.get_num_jobs(jobs) if splittable else 1
+
+    temporary_file = "%s.%d.tmp" % (corpus_file, os.getpid())
+    try:
+        with open(temporary_file, "wb") as f:
+            f.write(FILE_HEADER.pack(MAGIC, FORMAT_VERSION))
+            if jobs == 1:
+                for block in encode_records(filter_records(file_name, filters, tweet_index, class_index)):
+                    f.write(block)
+            else:
+                write_blocks_in_parallel(f, file_name, filters, tweet_index, class_index, jobs)
+        os.replace(temporary_file, corpus_file)
+    finally:
+        if os.path.exists(temporary_file):
+            os.remove(temporary_file)
+
+
+def write_blocks_in_parallel(f, file_name, filters, tweet_index, class_index, jobs):
+    """
+    Filters byte range shards of file_name in worker processes, and writes their blocks to f in file order
+    """
+    shards = [(file_name, tweet_index, class_index, start, end)
+              for start, end in split_into_byte_ranges(file_name, jobs * SHARDS_PER_JOB)]
+    pool = multiprocessing.Pool(jobs, init_corpus_worker, (filters, canonical_form.dictionary))
+    try:
+        for blocks in pool.imap(encode_shard, shards):
+            for block in blocks:
+                f.write(block)
+    finally:
+        pool.terminate()
+        pool.join()
+
+
+def filter_records(file_name, filters, tweet_index=None, class_index=None, start=0, end=None):
+    """
+    :return: Generator of the (label, tokens) records of the filtered tweets in the byte range [start, end)
+    """
+    split = RegexFilters.WHITESPACE.split
+    if tweet_index is None:
+        with LineReader(file_name, start, end) as lines:
+            for line in lines:
+                yield 0, split(filters.apply(line))
+    else:
+        for entry in DataSetReader(file_name, tweet_index, class_index, start, end):
+            classification = entry.get_classification()
+            label = 0 if classification is None else classification.value + 1
+            yield label, split(filters.apply(entry.get_tweet()))
+
+
+def encode_records(records):
+    """
+    :return: Generator of the encoded blocks of the (label, tokens) records
+    """
+    for block_records in parallel.chunks(records, BLOCK_SIZE):
+        yield encode_block(block_records)
+
+
+def encode_block(records):
+    """
+    Encodes records as a block: a token table of the distinct tokens of the block, followed by the labels, the number
+    of tokens and the token table indices of the records
+
+    :param records: List of (label, tokens) tuples
+    :return: Block header and compressed payload
+    """
+    table = {}
+    labels = bytearray()
+    lengths = array("I")
+    ids = array("I")
+    for label, tokens in records:
+        labels.append(label)
+        lengths.append(len(tokens))
+        ids.extend([table.setdefault(token, len(table)) for token in tokens])
+
+    if sys.byteorder == "big":
+        lengths.byteswap()
+        ids.byteswap()
+
+    # Tokens are whitespace split, so they never contain a newline
+    token_table = "\n".join(table).encode("utf-8")
+    payload = zlib.compress(TABLE_HEADER.pack(len(table), len(token_table)) + token_table + bytes(labels) +
+                            lengths.tobytes() + ids.tobytes())
+    return BLOCK_HEADER.pack(len(records), len(payload)) + payload
+
+
+def decode_block(num_records, payload):
+    """
+    :return: Generator of the (classification, tokens) records of a decompressed block payload
+    """
+    num_tokens, table_size = TABLE_HEADER.unpack_from(payload)
+    offset = TABLE_HEADER.size
+    table = payload[offset:offset + table_size].decode("utf-8").split("\n") if num_tokens > 0 else []
+    offset += table_size
+    labels = payload[offset:offset + num_records]
+    offset += num_records
+    lengths = array("I")
+    lengths.frombytes(payload[offset:offset + num_records * lengths.itemsize])
+    offset += num_records * lengths.itemsize
+    ids = array("I")
+    ids.frombytes(payload[offset:])
+    if sys.byteorder == "big":
+        lengths.byteswap()
+        ids.byteswap()
+
+    get_token = table.__getitem__
+    position = 0
+    for label, length in zip(labels, lengths):
+        yield CLASSIFICATIONS[label], list(map(get_token, ids[position:position + length]))
+        position += length
+
+
+def read_file_header(f):
+    """
+    Checks the header of the corpus file f
+
+    :return: Size of the header
+    """
+    header = f.read(FILE_HEADER.size)
+    if len(header) < FILE_HEADER.size:
+        raise ValueError("Not a corpus file: " + f.name)
+    magic, version = FILE_HEADER.unpack(header)
+    if magic != MAGIC:
+        raise ValueError("Not a corpus file: " + f.name)
+    if version != FORMAT_VERSION:
+        raise ValueError("Unsupported corpus version: " + str(version))
+    return FILE_HEADER.size
+
+
+def split_into_block_ranges(file_name, num_ranges):
+    """
+    Splits a corpus file into contiguous ranges of whole blocks of about equal size, see split_into_byte_ranges
+
+    :return: List of (start, end) byte offsets, end exclusive
+    """
+    size = os.path.getsize(file_name)
+    offsets = []
+    with open(file_name, "rb") as f:
+        position = read_file_header(f)
+        while position < size:
+            offsets.append(position)
+            num_records, block_size = BLOCK_HEADER.unpack(f.read(BLOCK_HEADER.size))
+            position += BLOCK_HEADER.size + block_size
+            f.seek(position)
+
+    if len(offsets) == 0:
+        return []
+
+    first = offsets[0]
+    boundaries = [first]
+    for i in range(1, num_ranges):
+        index = bisect.bisect_left(offsets, first + (size - first) * i // num_ranges)
+        if index < len(offsets) and offsets[index] > boundaries[-1]:
+            boundaries.append(offsets[index])
+    boundaries.append(size)
+
+    return [(boundaries[i], boundaries[i + 1]) for i in range(len(boundaries) - 1)]
+
+
+def init_corpus_worker(filters, dictionary):
+    """
+    Restores the filters of the parent process in a worker process, and the module level canonical dictionary for
+    filters that correct words with it
+    """
+    global worker_filters
+    canonical_form.set_dictionary(dictionary)
+    worker_filters = filters
+
+
+def encode_shard(shard):
+    """
+    :param shard: (file name, tweet index, class index, start byte, end byte) tuple
+    :return: List of the encoded blocks of the filtered tweets in the byte range
+    """
+    file_name, tweet_index, class_index, start, end = shard
+    return list(encode_records(filter_records(file_name, worker_filters, tweet_index, class_index, start, end)))
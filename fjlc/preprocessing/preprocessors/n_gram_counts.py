@@ -0,0 +1,203 @@
+import math
+import sys
+
+from fjlc.lexicon.container.vocabulary import Vocabulary
+from fjlc.preprocessing.filters.regex_filters import RegexFilters
+
+# Number of bits of a token id in a packed n-gram key
+TOKEN_BITS = 32
+TOKEN_MASK = (1 << TOKEN_BITS) - 1
+
+# Python shares the int objects of small values, counts up to this value cost no memory of their own
+LARGEST_SHARED_INT = 256
+
+# Typical number of bytes of a packed key and of an interned token, used to estimate memory usage in constant time
+ESTIMATED_KEY_SIZE = 36
+ESTIMATED_TOKEN_SIZE = 56
+
+
+class NGramCounts:
+    """
+    Memory-compact store of n-gram counts, equivalent to TweetNGramsPMI.NGramTree. Tokens are interned to integer ids
+    and every n-gram is a single int key that packs the ids of its tokens, TOKEN_BITS bits per token with the first
+    token in the most significant bits. The prefix of an n-gram is key >> TOKEN_BITS, so the tree is stored as one
+    flat dict of key to count instead of a node object (with its own children dict) per n-gram.
+
+    Children of a prefix are kept in insertion order like in NGramTree, so get_n_grams gives the same n-grams in the
+    same order.
+    """
+
+    def __init__(self):
+        self.vocabulary = Vocabulary()
+        self.counts = {}
+        # Number of n-grams incremented, the count of the root of the tree
+        self.total = 0
+
+    def increment_n_gram(self, n_gram):
+        """
+        Increments the count of every prefix of n_gram, including n_gram itself
+
+        :param n_gram: List of tokens
+        """
+        self.total += 1
+        counts = self.counts
+        add = self.vocabulary.add
+        key = 0
+        for word in n_gram:
+            key = key << TOKEN_BITS | add(word)
+            counts[key] = counts.get(key, 0) + 1
+
+    def set_count(self, n_gram, count):
+        """
+        Sets the count of n_gram, without changing the counts of its prefixes or the total
+
+        :param n_gram: List of tokens
+        """
+        add = self.vocabulary.add
+        key = 0
+        for word in n_gram:
+            key = key << TOKEN_BITS | add(word)
+        self.counts[key] = count
+
+    def get_key(self, words):
+        """
+        :return: Packed key of the n-gram words, None if one of the words was never counted
+        """
+        key = 0
+        for word in words:
+            token_id = self.vocabulary.get_id(word)
+            if token_id is None:
+                return None
+            key = key << TOKEN_BITS | token_id
+        return key
+
+    def get_count(self, phrase):
+        """
+        :param phrase: Space separated n-gram
+        :return: Number of occurrences of phrase, None if it is not in the store
+        """
+        key = self.get_key(RegexFilters.WHITESPACE.split(phrase))
+        return None if key is None else self.counts.get(key)
+
+    def get_phrase_counts(self):
+        """
+        :return: Generator of (space separated n-gram, count) tuples of all n-grams in the store, in insertion order
+        """
+        get_token = self.vocabulary.get_token
+        for key, count in self.counts.items():
+            yield " ".join([get_token(token_id) for token_id in self.unpack(key)]), count
+
+    def unpack(self, key):
+        """
+        :return: List of token ids of a packed key
+        """
+        token_ids = []
+        while key:
+            token_ids.append(key & TOKEN_MASK)
+            key >>= TOKEN_BITS
+        token_ids.reverse()
+        return token_ids
+
+    def prune_infrequent(self, limit):
+        """
+        Removes all n-grams that occurred fewer than limit times, and the tokens that no longer occur in any n-gram.
+        Since an n-gram never occurs more often than its prefix, this removes the same n-grams as pruning the
+        subtrees of infrequent nodes of an NGramTree. The store is rebuilt, so the memory is actually freed.
+        """
+        self.rebuild({key: count for key, count in self.counts.items() if count >= limit}, self.vocabulary)
+
+    def merge(self, other):
+        """
+        Adds the counts of other to this store. N-grams new to this store are added in the order of other, so merging
+        the stores of consecutive shards gives the same store as counting all shards at once.
+        """
+        counts = self.counts
+        translate = self.translator(other.vocabulary)
+        for key, count in other.counts.items():
+            key = translate(key)
+            counts[key] = counts.get(key, 0) + count
+        self.total += other.total
+
+    def rebuild(self, counts, vocabulary):
+        """
+        Replaces the store by counts, whose keys are packed with the ids of vocabulary, re-interning only the tokens
+        that are used
+        """
+        self.vocabulary = Vocabulary()
+        translate = self.translator(vocabulary)
+        self.counts = {translate(key): count for key, count in counts.items()}
+
+    def translator(self, vocabulary):
+        """
+        :return: Function that translates keys packed with the ids of vocabulary to keys packed with the ids of this
+        store, adding tokens to this store's vocabulary as needed
+        """
+        token_ids = {}
+        add = self.vocabulary.add
+        get_token = vocabulary.get_token
+
+        def translate(key):
+            translated = 0
+            for token_id in self.unpack(key):
+                new_id = token_ids.get(token_id)
+                if new_id is None:
+                    new_id = token_ids[token_id] = add(get_token(token_id))
+                translated = translated << TOKEN_BITS | new_id
+            return translated
+
+        return translate
+
+    def get_frequent_phrases(self, limit):
+        """
+        Finds all n-grams (n > 1) that, like their prefix and their last word, occurred at least limit times
+
+        :return: Map of n-gram to its PMI value, in the order of a depth first traversal of NGramTree
+        """
+        counts = self.counts
+        children = {}
+        for key, count in counts.items():
+            if count >= limit:
+                children.setdefault(key >> TOKEN_BITS, []).append(key)
+
+        log = math.log
+        get_token = self.vocabulary.get_token
+        root_log_score = log(self.total) if self.total > 0 else 0.0
+        all_n_grams = {}
+
+        def add_frequent_phrases(prefix_key, prefix):
+            prefix_log_score = log(counts[prefix_key])
+            for key in children.get(prefix_key, ()):
+                last_word_count = counts.get(key & TOKEN_MASK)
+                if last_word_count is None or last_word_count < limit:
+                    continue
+
+                candidate = prefix + " " + get_token(key & TOKEN_MASK)
+                all_n_grams[candidate] = root_log_score + log(counts[key]) - prefix_log_score - log(last_word_count)
+                add_frequent_phrases(key, candidate)
+
+        for key in children.get(0, ()):
+            add_frequent_phrases(key, get_token(key))
+
+        return all_n_grams
+
+    def __len__(self):
+        return len(self.counts)
+
+    def get_memory_usage(self):
+        """
+        :return: Approximate number of bytes used by the store: the dict, its keys and values and the vocabulary
+        """
+        size = sys.getsizeof(self.counts) + self.vocabulary.get_memory_usage()
+        for key, count in self.counts.items():
+            size += sys.getsizeof(key)
+            if count > LARGEST_SHARED_INT:
+                size += sys.getsizeof(count)
+        return size
+
+    def estimate_memory_usage(self):
+        """
+        :return: Estimate of get_memory_usage in constant time, from the number of n-grams and tokens
+        """
+        vocabulary = self.vocabulary
+        return sys.getsizeof(self.counts) + len(self.counts) * ESTIMATED_KEY_SIZE + sys.getsizeof(vocabulary.ids) + \
+            sys.getsizeof(vocabulary.tokens) + len(vocabulary) * ESTIMATED_TOKEN_SIZE
@@ -0,0 +1,91 @@
+import heapq
+
+from fjlc.preprocessing.filters.regex_filters import RegexFilters
+from fjlc.preprocessing.preprocessors.n_gram_counts import NGramCounts
+
+# Number of bits of the position of an n-gram within its run in an order number, the run index takes the rest
+POSITION_BITS = 40
+
+
+def write_run(n_gram_counts, file_name, run_index):
+    """
+    Writes the counts of an NGramCounts to a run file, one "n-gram<TAB>count<TAB>order" line per n-gram, sorted by
+    n-gram. The order number is the run index followed by the insertion position of the n-gram in n_gram_counts, so
+    the smallest order number of an n-gram over all runs tells when it first occurred in the input.
+
+    :param n_gram_counts: NGramCounts to write
+    :param file_name: File to write the run to
+    :param run_index: Index of the run, runs must be written in input order
+    """
+    order = run_index << POSITION_BITS
+    entries = [(phrase, count, order + position)
+               for position, (phrase, count) in enumerate(n_gram_counts.get_phrase_counts())]
+    entries.sort()
+
+    with open(file_name, "w", encoding="utf-8") as f:
+        for entry in entries:
+            f.write("%s\t%d\t%d\n" % entry)
+
+
+def read_run(file_name):
+    """
+    :return: Generator of the (n-gram, count, order) tuples of a run file, sorted by n-gram
+    """
+    with open(file_name, encoding="utf-8") as f:
+        for line in f:
+            phrase, count, order = line.rstrip("\n").split("\t")
+            yield phrase, int(count), int(order)
+
+
+def merge_runs(file_names, limit):
+    """
+    Merges run files with a streaming k-way merge, keeping only the n-grams that occurred at least limit times in
+    total. The frequent n-grams are added to the returned store in order of first occurrence, so it has the same
+    frequent phrases as an NGramCounts that counted the whole input in memory (see NGramCounts.get_frequent_phrases,
+    which only looks at n-grams that occurred at least limit times).
+
+    :param file_names: Run files, in the order they were written
+    :param limit: Minimum total count of an n-gram to keep
+    :return: NGramCounts of the frequent n-grams, without total
+    """
+    frequent = [(order, phrase, count) for phrase, count, order in merge_run_entries(file_names, limit)]
+    frequent.sort()
+    n_gram_counts = NGramCounts()
+    for _, phrase, count in frequent:
+        n_gram_counts.set_count(RegexFilters.WHITESPACE.split(phrase), count)
+    return n_gram_counts
+
+
+def compact_runs(file_names, limit, file_name):
+    """
+    Merges run files into a single run file of the n-grams that occurred at least limit times in total, like pruning
+    the n-grams of an NGramCounts that counted all the runs in memory. N-grams keep the order number of their first
+    occurrence, so later runs can still be merged with the compacted run.
+
+    :param file_names: Run files, in the order they were written
+    :param limit: Minimum total count of an n-gram to keep
+    :param file_name: File to write the compacted run to, must not be one of file_names
+    """
+    with open(file_name, "w", encoding="utf-8") as f:
+        for entry in merge_run_entries(file_names, limit):
+            f.write("%s\t%d\t%d\n" % entry)
+
+
+def merge_run_entries(file_names, limit):
+    """
+    :return: Generator of the (n-gram, total count, smallest order) tuples of the n-grams of the run files that
+    occurred at least limit times in total, sorted by n-gram
+    """
+    current_phrase, current_count, current_order = None, 0, 0
+    for phrase, count, order in heapq.merge(*[read_run(file_name) for file_name in file_names]):
+        if phrase == current_phrase:
+            current_count += count
+            current_order = min(current_order, order)
+            continue
+
+        if current_phrase is not None and current_count >= limit:
+            yield current_phrase, current_count, current_order
+        current_phrase, current_count, current_order = phrase, count, order
+
+    if current_phrase is not None and current_count >= limit:
+        yield current_phrase, current_count, current_order
@@ -1,15 +1,72 @@
+import contextlib
 import math
+import multiprocessing
+import os
+import shutil
+import tempfile
+import time
 
-from fjlc.classifier import classifier_options
 from fjlc.preprocessing.filters.regex_filters import RegexFilters
+from fjlc.preprocessing.preprocessors.corpus_cache import CorpusReader, split_into_block_ranges
+from fjlc.preprocessing.preprocessors.n_gram_counts import NGramCounts
+from fjlc.preprocessing.preprocessors.n_gram_runs import compact_runs, write_run, merge_runs
+from fjlc.utils.progressbar.build_metrics import BuildMetrics, UPDATE_INTERVAL
+from fjlc.utils.reader.byte_range_reader import split_into_byte_ranges
+from fjlc.utils.reader.line_reader import LineReader
+from fjlc.utils.tools import parallel
+import fjlc.preprocessing.filters.canonical_form as canonical_form
 
+# Number of byte range shards per worker process
+SHARDS_PER_JOB = 4
 
-class TweetNGramsPMI:
+# Number of lines between each check of the memory usage against the memory budget
+SPILL_CHECK_INTERVAL = 1000
+
+# Number of bits of the index of a run within its shard in the run index of a run spilled by a worker process, the
+# shard index takes the rest, so the run indices of all shards are in input order
+SHARD_RUN_BITS = 20
+
+# Stages of counting a tweet, timed by the counting loops
+COUNTING_STAGES = ("reading", "filtering", "counting")
 
-    tweet_reader = None
-    n_gram_tree = None
+# State of the current worker process, set once by init_mining_worker
+worker_n = None
+worker_filters = None
 
-    def get_frequent_n_grams(self, input_reader, n, min_frequency, min_pmi, filters):
+
+class TweetNGramsPMI:
+
+    def __init__(self, options, prune_interval=None, memory_budget=None, spill_directory=None, metrics=None,
+                 corpus_cache=None):
+        """
+        :param options: ClassifierOptions with the intensifiers and stop words that frequent n-grams are filtered by
+        :param prune_interval: Number of lines between each pruning of the n-grams that occurred fewer than half the
+        minimum frequency times the number of lines so far, in a serial run. Pruning bounds the memory of the counts,
+        but is lossy: an n-gram that only becomes frequent late in the input can be pruned before it does, and is then
+        missed or undercounted. None (default) counts every n-gram exactly.
+        :param memory_budget: Approximate number of bytes the n-gram counts may use, None for no limit. When the counts
+        exceed the budget they are written to a sorted run file on disk, and all runs are merged when the frequent
+        n-grams are extracted. Pruning, if prune_interval is set, compacts the runs into one and gives the same
+        n-grams as pruning in memory.
+        :param spill_directory: Directory for run files, a temporary directory if None. Run files are deleted after use.
+        :param metrics: BuildMetrics to report progress, throughput and stage times to, None for no reporting
+        :param corpus_cache: CorpusCache to look up the filtered tweets of input files in, so that they are only
+        filtered the first time a file is mined. None to filter every time.
+        """
+        self.options = options
+        self.prune_interval = prune_interval
+        self.memory_budget = memory_budget
+        self.spill_directory = spill_directory
+        self.tweet_reader = None
+        self.n_gram_counts = None
+        self.run_directory = None
+        self.run_files = []
+        # Number of runs written so far, runs are indexed in input order also after they were compacted
+        self.num_runs = 0
+        self.metrics = BuildMetrics() if metrics is None else metrics
+        self.corpus_cache = corpus_cache
+
+    def get_frequent_n_grams(self, input_reader, n, min_frequency, min_pmi, filters, jobs=1):
         """
         Finds all frequent (and meaningful) n-grams in a file, treating each new line as a new document.
         
@@ -18,34 +75,205 @@ class TweetNGramsPMI:
         :param min_frequency:   Smallest required frequency to include n-gram
         :param min_pmi:         Minimum PMI value for n-gram to be included
         :param filters:         List of filters to apply to document before generating n-grams
+        :param jobs:            Number of worker processes, None for one per core. Other than 1 requires a LineReader,
+                                whose file is split into byte range shards. Compressed files, and any file when
+                                prune_interval is set, are counted serially, so the result never depends on jobs.
         :return:                Map of n-grams as key and number of occurrences as value
         """
-        line_counter = 0
-        TweetNGramsPMI.tweet_reader = input_reader
-        TweetNGramsPMI.n_gram_tree = self.NGramTree()
+        if self.corpus_cache is not None:
+            with self.metrics.stage("caching"):
+                corpus_file = self.corpus_cache.get_corpus(input_reader.file_name, filters, jobs=jobs)
+            input_reader.close()
+            input_reader = CorpusReader(corpus_file)
+
+        self.tweet_reader = input_reader
+        try:
+            # Pruning depends on the counts of all lines before, so a pruned run is counted serially
+            if parallel.get_num_jobs(jobs) == 1 or self.prune_interval is not None or \
+                    not input_reader.is_splittable():
+                line_counter = self.count_n_grams(input_reader, n, min_frequency, filters)
+            else:
+                # The workers read the shards of the file themselves, only its name is used
+                if isinstance(input_reader, LineReader):
+                    input_reader.close()
+                line_counter = self.count_n_grams_in_parallel(input_reader.file_name, n, filters, jobs,
+                                                              isinstance(input_reader, CorpusReader))
+
+            limit = int(min_frequency * line_counter)
+            if len(self.run_files) > 0:
+                with self.metrics.stage("merging"):
+                    self.merge_spilled_runs(limit)
+        finally:
+            self.remove_runs()
+
+        with self.metrics.stage("pmi"):
+            n_grams = filter_n_grams(self.n_gram_counts.get_frequent_phrases(limit), min_pmi, self.options)
+        self.metrics.finish()
+        return n_grams
+
+    def count_n_grams(self, tweets, n, min_frequency, filters):
+        """
+        Counts the n-grams of tweets, pruning infrequent n-grams every prune_interval lines if it is set, and spilling
+        the counts to disk whenever they exceed the memory budget
 
-        # Todo: Parallelize
-        for tweet in self.tweet_reader:
+        :param tweets: Iterable of tweets, or a CorpusReader of already filtered tweets
+        :return: Number of tweets
+        """
+        if isinstance(tweets, (LineReader, CorpusReader)):
+            self.metrics.start(os.path.getsize(tweets.file_name), tweets.get_bytes_read)
+        else:
+            self.metrics.start()
+        if isinstance(tweets, CorpusReader):
+            tweets, filters = tweets.get_tweets(), None
+
+        perf_counter = time.perf_counter
+        line_counter = 0
+        stage_times = [0.0] * len(COUNTING_STAGES)
+        self.n_gram_counts = NGramCounts()
+        end = perf_counter()
+        for tweet in tweets:
+            read = perf_counter()
             line_counter += 1
-            if line_counter % 200000 == 0:
-                TweetNGramsPMI.n_gram_tree.prune_infrequent(math.ceil(min_frequency * line_counter / 2.))
+            # Timed as stages of their own, which are not part of the stage times of this tweet
+            if self.prune_interval is not None and line_counter % self.prune_interval == 0:
+                with self.metrics.stage("pruning"):
+                    self.prune_infrequent(math.ceil(min_frequency * line_counter / 2.))
+            if self.memory_budget is not None and line_counter % SPILL_CHECK_INTERVAL == 0:
+                self.spill_if_over_budget()
+
+            start = perf_counter()
+            if filters is not None:
+                tweet = filters.apply(tweet)
+            filtered = perf_counter()
+            add_tweet(self.n_gram_counts, tweet, n)
+            counted = perf_counter()
+            stage_times[0] += read - end
+            stage_times[1] += filtered - start
+            stage_times[2] += counted - filtered
+            end = counted
+
+            if line_counter % UPDATE_INTERVAL == 0:
+                add_counting_metrics(self.metrics, UPDATE_INTERVAL, stage_times, self.n_gram_counts)
+                stage_times = [0.0] * len(COUNTING_STAGES)
+
+        add_counting_metrics(self.metrics, line_counter % UPDATE_INTERVAL, stage_times, self.n_gram_counts)
+        return line_counter
+
+    def count_n_grams_in_parallel(self, file_name, n, filters, jobs, cached=False):
+        """
+        Counts the n-grams of the lines in file_name in worker processes. Every worker counts a byte range shard, and
+        the counts are merged in file order, which gives the same counts (including the order of n-grams) as a serial
+        run. Shards are never pruned, see get_frequent_n_grams.
 
-            tweet = filters.apply(tweet)
-            for sentence in RegexFilters.SENTENCE_END_PUNCTUATION.split(tweet):
-                tokens = RegexFilters.WHITESPACE.split(sentence.strip())
-                if len(tokens) == 1:
-                    continue
+        With a memory budget, every worker gets an equal share of it and spills the counts of its shard to run files
+        itself, so no process holds more than its share. The runs are indexed in shard order and merged when the
+        frequent n-grams are extracted.
 
-                for i in range(len(tokens)):
-                    self.n_gram_tree.increment_n_gram(tokens[i:min(i + n, len(tokens))])
+        :param cached: Whether file_name is a corpus file of already filtered tweets, split into block range shards
+        :return: Number of tweets
+        """
+        jobs = parallel.get_num_jobs(jobs)
+        split = split_into_block_ranges if cached else split_into_byte_ranges
+        shards = split(file_name, jobs * SHARDS_PER_JOB)
+
+        self.metrics.start(os.path.getsize(file_name))
 
-        return self.n_gram_tree.get_n_grams(int(min_frequency * line_counter), min_pmi)
+        worker_budget = None
+        if self.memory_budget is not None:
+            worker_budget = self.memory_budget // jobs
+            self.run_directory = tempfile.mkdtemp(prefix="fjlc-n-grams-", dir=self.spill_directory)
+
+        line_counter = 0
+        self.n_gram_counts = NGramCounts()
+        pool = multiprocessing.Pool(jobs, init_mining_worker, (n, filters, canonical_form.dictionary))
+        try:
+            shard_arguments = [(file_name, start, end, cached, shard_index, worker_budget, self.run_directory)
+                               for shard_index, (start, end) in enumerate(shards)]
+            for shard_lines, shard_counts, shard_metrics, run_files in pool.imap(count_shard, shard_arguments):
+                line_counter += shard_lines
+                # Empty but for the total if the worker spilled its counts
+                self.n_gram_counts.merge(shard_counts)
+                self.run_files.extend(run_files)
+                record_n_gram_sizes(self.metrics, self.n_gram_counts)
+                self.metrics.merge(shard_metrics)
+        finally:
+            pool.terminate()
+            pool.join()
+
+        return line_counter
+
+    def spill_if_over_budget(self):
+        """
+        Spills the counts to disk if they exceed the memory budget. The check is timed as part of the spilling stage.
+        """
+        with self.metrics.stage("spilling"):
+            if self.memory_budget is not None and self.n_gram_counts.estimate_memory_usage() > self.memory_budget:
+                self.spill()
 
-    @staticmethod
-    def get_progress():
-        return 0 if TweetNGramsPMI.tweet_reader is None else TweetNGramsPMI.tweet_reader.get_progress()
+    def spill(self):
+        """
+        Writes the current counts to a new run file and continues counting in an empty store
+        """
+        if self.run_directory is None:
+            self.run_directory = tempfile.mkdtemp(prefix="fjlc-n-grams-", dir=self.spill_directory)
+        run_file = os.path.join(self.run_directory, "run%d.tsv" % self.num_runs)
+        write_run(self.n_gram_counts, run_file, self.num_runs)
+        self.run_files.append(run_file)
+        self.num_runs += 1
+
+        total = self.n_gram_counts.total
+        self.n_gram_counts = NGramCounts()
+        self.n_gram_counts.total = total
+
+    def prune_infrequent(self, limit):
+        """
+        Removes the n-grams that occurred fewer than limit times so far. Once counts were spilled, the remaining counts
+        are spilled too and all runs are compacted into one run of the n-grams that are left, which are the same as if
+        everything had been counted and pruned in memory.
+        """
+        if len(self.run_files) == 0:
+            self.n_gram_counts.prune_infrequent(limit)
+            return
+
+        self.spill()
+        run_file = os.path.join(self.run_directory, "run%d.tsv" % self.num_runs)
+        compact_runs(self.run_files, limit, run_file)
+        for spilled_file in self.run_files:
+            os.remove(spilled_file)
+        self.run_files = [run_file]
+        self.num_runs += 1
+
+    def merge_spilled_runs(self, limit):
+        """
+        Spills the remaining counts and replaces them by the merged counts of all runs that occurred at least limit
+        times, which give the same frequent phrases as counting everything in memory
+        """
+        self.spill()
+        total = self.n_gram_counts.total
+        self.n_gram_counts = merge_runs(self.run_files, limit)
+        self.n_gram_counts.total = total
+
+    def remove_runs(self):
+        if self.run_directory is not None:
+            shutil.rmtree(self.run_directory, ignore_errors=True)
+        self.run_directory = None
+        self.run_files = []
+        self.num_runs = 0
+
+    def get_progress(self):
+        return 0 if self.tweet_reader is None else self.tweet_reader.get_progress()
+
+    def get_memory_usage(self):
+        """
+        :return: Approximate number of bytes used by the n-gram counts
+        """
+        return 0 if self.n_gram_counts is None else self.n_gram_counts.get_memory_usage()
 
     class NGramTree:
+        """
+        Tree of n-gram counts with a node per n-gram. Superseded by the far more compact NGramCounts, and kept as the
+        reference implementation it is tested against.
+        """
 
         def __init__(self):
             self.root = TweetNGramsPMI.Node("")
@@ -73,20 +301,19 @@ class TweetNGramsPMI:
         def prune_infrequent(self, limit):
             self.root.prune_infrequent(limit)
 
-        def get_n_grams(self, limit, inclusion_threshold):
+        def merge(self, other):
+            """
+            Adds the n-gram counts of other to this tree. N-grams new to this tree are added in the order of other.
+            """
+            self.root.merge(other.root)
+
+        def get_n_grams(self, limit, inclusion_threshold, options):
             all_n_grams = {}
 
             for child in self.root.children.values():
-                child.add_frequent_phrases(all_n_grams, limit, child.phrase)
-
-            filtered_n_grams = []
-            for next_key, next_value in all_n_grams.items():
-                n_gram_tokens = RegexFilters.WHITESPACE.split(next_key)
+                child.add_frequent_phrases(self, all_n_grams, limit, child.phrase)
 
-                if next_value >= inclusion_threshold and not classifier_options.contains_intensifier(n_gram_tokens) and not classifier_options.is_stop_word(n_gram_tokens[-1]):
-                    filtered_n_grams.append(next_key)
-
-            return filtered_n_grams
+            return filter_n_grams(all_n_grams, inclusion_threshold, options)
 
     class Node:
         def __init__(self, phrase):
@@ -110,19 +337,146 @@ class TweetNGramsPMI:
             return self.log_score
 
         def prune_infrequent(self, limit):
-            self.children = [child for child in self.children if child.get_value().num_occurrences >= limit]
-            for child in self.children:
-                child.get_value().prune_infrequent(limit)
+            self.children = {word: child for word, child in self.children.items() if child.num_occurrences >= limit}
+            for child in self.children.values():
+                child.prune_infrequent(limit)
 
-        def add_frequent_phrases(self, dictionary, limit, prefix):
+        def merge(self, other):
+            self.num_occurrences += other.num_occurrences
+            self.log_score = 0.0
+            for word, other_child in other.children.items():
+                child = self.children.get(word)
+                if child is None:
+                    self.children[word] = other_child
+                else:
+                    child.merge(other_child)
+
+        def add_frequent_phrases(self, tree, dictionary, limit, prefix):
             for child in self.children.values():
                 if child.num_occurrences < limit:
                     continue
-                last_word = TweetNGramsPMI.n_gram_tree.get_node(child.phrase)
+                last_word = tree.get_node(child.phrase)
 
                 if last_word is not None and last_word.num_occurrences >= limit:
-                    temp = TweetNGramsPMI.n_gram_tree.root.get_log_score() + child.get_log_score() - self.get_log_score() - last_word.get_log_score()
+                    temp = tree.root.get_log_score() + child.get_log_score() - self.get_log_score() - \
+                        last_word.get_log_score()
 
                     candidate = prefix + " " + child.phrase
                     dictionary[candidate] = temp
-                    child.add_frequent_phrases(dictionary, limit, candidate)
+                    child.add_frequent_phrases(tree, dictionary, limit, candidate)
+
+
+def filter_n_grams(all_n_grams, inclusion_threshold, options):
+    """
+    :param all_n_grams: Map of frequent n-gram to PMI value
+    :param inclusion_threshold: Minimum PMI value
+    :param options: ClassifierOptions with the intensifiers and stop words
+    :return: List of the n-grams with high enough PMI value that contain no intensifier and do not end in a stop word
+    """
+    filtered_n_grams = []
+    for next_key, next_value in all_n_grams.items():
+        n_gram_tokens = RegexFilters.WHITESPACE.split(next_key)
+
+        if next_value >= inclusion_threshold and not options.contains_intensifier(n_gram_tokens) and \
+                not options.is_stop_word(n_gram_tokens[-1]):
+            filtered_n_grams.append(next_key)
+
+    return filtered_n_grams
+
+
+def add_tweet(n_gram_counts, tweet, n):
+    """
+    Counts the n-grams of every sentence of an already filtered tweet in n_gram_counts (NGramCounts or NGramTree)
+    """
+    for sentence in RegexFilters.SENTENCE_END_PUNCTUATION.split(tweet):
+        tokens = RegexFilters.WHITESPACE.split(sentence.strip())
+        if len(tokens) == 1:
+            continue
+
+        for i in range(len(tokens)):
+            n_gram_counts.increment_n_gram(tokens[i:min(i + n, len(tokens))])
+
+
+def add_counting_metrics(metrics, lines, stage_times, n_gram_counts):
+    record_n_gram_sizes(metrics, n_gram_counts)
+    metrics.add(lines, stage_times=dict(zip(COUNTING_STAGES, stage_times)))
+
+
+def record_n_gram_sizes(metrics, n_gram_counts):
+    metrics.record_size("n_grams", len(n_gram_counts))
+    metrics.record_size("n_gram_bytes", n_gram_counts.estimate_memory_usage())
+
+
+def init_mining_worker(n, filters, dictionary):
+    """
+    Restores the n-gram length, filters and canonical dictionary of the parent process in a worker process
+    """
+    global worker_n, worker_filters
+    canonical_form.set_dictionary(dictionary)
+    worker_n = n
+    worker_filters = filters
+
+
+def count_shard(shard):
+    """
+    :param shard: (file name, start byte, end byte, whether the file is a corpus file of filtered tweets, index of the
+    shard, memory budget of the worker or None, run directory) tuple
+    :return: (number of lines, NGramCounts, BuildMetrics, run files) of the lines in the byte range. With a memory
+    budget all counts are spilled to the run files, and the NGramCounts only holds the total.
+    """
+    file_name, start_byte, end_byte, cached, shard_index, memory_budget, run_directory = shard
+    perf_counter = time.perf_counter
+    line_counter = 0
+    stage_times = [0.0] * len(COUNTING_STAGES)
+    n_gram_counts = NGramCounts()
+    run_files = []
+    metrics = BuildMetrics()
+    metrics.add(num_bytes=end_byte - start_byte)
+    if cached:
+        tweets, filters = CorpusReader(file_name, start_byte, end_byte).get_tweets(), None
+    else:
+        tweets, filters = LineReader(file_name, start_byte, end_byte), worker_filters
+    with contextlib.closing(tweets):
+        end = perf_counter()
+        for tweet in tweets:
+            start = perf_counter()
+            line_counter += 1
+            if filters is not None:
+                tweet = filters.apply(tweet)
+            filtered = perf_counter()
+            add_tweet(n_gram_counts, tweet, worker_n)
+            counted = perf_counter()
+            stage_times[0] += start - end
+            stage_times[1] += filtered - start
+            stage_times[2] += counted - filtered
+            end = counted
+
+            if memory_budget is not None and line_counter % SPILL_CHECK_INTERVAL == 0 and \
+                    n_gram_counts.estimate_memory_usage() > memory_budget:
+                record_n_gram_sizes(metrics, n_gram_counts)
+                with metrics.stage("spilling"):
+                    n_gram_counts = spill_shard_counts(n_gram_counts, run_directory, shard_index, run_files)
+                end = perf_counter()
+
+    add_counting_metrics(metrics, line_counter, stage_times, n_gram_counts)
+    if memory_budget is not None:
+        with metrics.stage("spilling"):
+            n_gram_counts = spill_shard_counts(n_gram_counts, run_directory, shard_index, run_files)
+    return line_counter, n_gram_counts, metrics, run_files
+
+
+def spill_shard_counts(n_gram_counts, run_directory, shard_index, run_files):
+    """
+    Writes the counts of a shard to a new run file, see TweetNGramsPMI.spill
+
+    :param run_files: Run files of the shard so far, the new run file is appended
+    :return: Empty NGramCounts with the total of n_gram_counts, to continue counting in
+    """
+    run_file = os.path.join(run_directory, "shard%d-run%d.tsv" % (shard_index, len(run_files)))
+    write_run(n_gram_counts, run_file, (shard_index << SHARD_RUN_BITS) + len(run_files))
+    run_files.append(run_file)
+
+    total = n_gram_counts.total
+    n_gram_counts = NGramCounts()
+    n_gram_counts.total = total
+    return n_gram_counts
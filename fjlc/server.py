@@ -0,0 +1,340 @@
+"""
+Local HTTP scoring service. Concurrent requests are collected into micro-batches, which are scored together, in worker
+processes if jobs is not 1. Only the standard library is used.
+
+Endpoints:
+    POST /classify  {"tweet": "..."} or {"tweets": ["...", ...]}, answers {"classification": ..., "sentiment": ...}
+                    or a list of those, in request order
+    GET /health     {"status": "ok"}
+    GET /stats      Request and batch counters, queue depth, batch size histogram and model version
+    POST /reload    Reloads the lexicon, options and dictionary (or compiled model) from their files in the background,
+                    answers {"version": ...} of the new model once it is active
+
+Usage: fjlc-serve [--host 127.0.0.1] [--port 8080] [--max-batch-size 64] [--max-wait 0.005] [--jobs 1] [--watch]
+"""
+import argparse
+import asyncio
+import concurrent.futures
+import json
+import time
+
+from fjlc.classifier.model_watcher import DEFAULT_INTERVAL
+from fjlc.main import LexiconClassifier, DEFAULT_LEXICON, DEFAULT_OPTIONS, DEFAULT_DICTIONARY
+from fjlc.utils.tools import parallel
+
+DEFAULT_HOST = "127.0.0.1"
+DEFAULT_PORT = 8080
+DEFAULT_MAX_BATCH_SIZE = 64
+DEFAULT_MAX_WAIT = 0.005
+MAX_BODY_SIZE = 1 << 20
+
+REASONS = {200: "OK", 400: "Bad Request", 404: "Not Found", 405: "Method Not Allowed", 413: "Payload Too Large",
+           500: "Internal Server Error"}
+
+
+class HttpError(Exception):
+    def __init__(self, status, message):
+        super(HttpError, self).__init__(message)
+        self.status = status
+
+
+class SentimentService:
+    """
+    Scores tweets of concurrent requests in micro-batches. A batch is closed when it holds max_batch_size tweets or
+    max_wait seconds have passed since its first tweet arrived, whichever comes first. Batches are scored one at a
+    time off the event loop, so tweets arriving while a batch is scored are collected into the next one.
+    """
+
+    def __init__(self, classifier, max_batch_size=DEFAULT_MAX_BATCH_SIZE, max_wait=DEFAULT_MAX_WAIT, jobs=1):
+        """
+        :param classifier: LexiconClassifier to score with
+        :param max_batch_size: Maximum number of tweets scored together
+        :param max_wait: Maximum number of seconds the first tweet of a batch waits for more tweets
+        :param jobs: Number of worker processes a batch is scored on, 1 scores in this process, None for one per core
+        """
+        self.classifier = classifier
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait
+        self.jobs = parallel.get_num_jobs(jobs)
+        self.queue = None
+        self.server = None
+        self.batcher = None
+        self.executor = concurrent.futures.ThreadPoolExecutor(max_workers=1)
+
+        self.started = None
+        self.requests = 0
+        self.tweets = 0
+        self.batches = 0
+        self.errors = 0
+        self.max_queue_depth = 0
+        self.histogram_bounds = get_histogram_bounds(max_batch_size)
+        self.batch_size_histogram = [0] * len(self.histogram_bounds)
+
+    async def start(self, host=DEFAULT_HOST, port=DEFAULT_PORT):
+        """
+        Starts listening and batching. Must be called from within the event loop that serves the requests.
+
+        :return: (host, port) the service listens on, port is chosen by the OS if 0 is given
+        """
+        self.queue = asyncio.Queue()
+        self.started = time.time()
+        self.batcher = asyncio.ensure_future(self.run_batches())
+        self.server = await asyncio.start_server(self.handle_connection, host, port)
+        return self.server.sockets[0].getsockname()[:2]
+
+    async def close(self):
+        if self.server is not None:
+            self.server.close()
+            await self.server.wait_closed()
+        if self.batcher is not None:
+            self.batcher.cancel()
+            try:
+                await self.batcher
+            except asyncio.CancelledError:
+                pass
+        self.executor.shutdown()
+
+    async def score(self, tweet):
+        """
+        :param tweet: Raw tweet
+        :return: (classification, sentiment value) of tweet, once the batch it was put into has been scored
+        """
+        future = asyncio.get_event_loop().create_future()
+        self.queue.put_nowait((tweet, future))
+        self.max_queue_depth = max(self.max_queue_depth, self.queue.qsize())
+        return await future
+
+    async def run_batches(self):
+        loop = asyncio.get_event_loop()
+        while True:
+            batch = [await self.queue.get()]
+            deadline = loop.time() + self.max_wait
+            while len(batch) < self.max_batch_size:
+                if self.queue.empty():
+                    timeout = deadline - loop.time()
+                    if timeout <= 0:
+                        break
+                    try:
+                        batch.append(await asyncio.wait_for(self.queue.get(), timeout))
+                    except asyncio.TimeoutError:
+                        break
+                else:
+                    batch.append(self.queue.get_nowait())
+
+            self.record_batch(len(batch))
+            tweets = [tweet for tweet, _ in batch]
+            try:
+                results = await loop.run_in_executor(self.executor, self.score_batch, tweets)
+            except Exception as error:
+                self.errors += 1
+                for _, future in batch:
+                    if not future.done():
+                        future.set_exception(error)
+                continue
+
+            for (_, future), result in zip(batch, results):
+                if not future.done():
+                    future.set_result(result)
+
+    def score_batch(self, tweets):
+        chunksize = max(1, -(-len(tweets) // self.jobs))
+        # The whole batch is scored and classified with one model, even if the classifier is reloaded meanwhile
+        model = self.classifier.active_model
+        sentiment_values = self.classifier.iterate_batch("calculate_sentiment", tweets, self.jobs, chunksize, model)
+        get_classification = model.classifier.get_classification
+        return [(get_classification(sentiment_value), sentiment_value) for sentiment_value in sentiment_values]
+
+    def record_batch(self, size):
+        self.batches += 1
+        self.tweets += size
+        for i, bound in enumerate(self.histogram_bounds):
+            if size <= bound:
+                self.batch_size_histogram[i] += 1
+                break
+
+    def get_stats(self):
+        return {
+            "uptime": time.time() - self.started,
+            "requests": self.requests,
+            "tweets": self.tweets,
+            "batches": self.batches,
+            "errors": self.errors,
+            "mean_batch_size": self.tweets / float(self.batches) if self.batches > 0 else 0.0,
+            "queue_depth": self.queue.qsize(),
+            "max_queue_depth": self.max_queue_depth,
+            "max_batch_size": self.max_batch_size,
+            "max_wait": self.max_wait,
+            "jobs": self.jobs,
+            "batch_size_histogram": {str(bound): count for bound, count in
+                                     zip(self.histogram_bounds, self.batch_size_histogram)},
+            "cache": self.classifier.get_cache_statistics(),
+            "model_version": self.classifier.get_model_version(),
+            "reload_error": None if self.classifier.get_reload_error() is None else
+            repr(self.classifier.get_reload_error()),
+        }
+
+    async def handle_connection(self, reader, writer):
+        try:
+            while True:
+                request = await read_request(reader)
+                if request is None:
+                    break
+
+                method, target, headers, body = request
+                try:
+                    status, response = 200, await self.route(method, target, body)
+                except HttpError as error:
+                    status, response = error.status, {"error": str(error)}
+                except Exception as error:
+                    status, response = 500, {"error": repr(error)}
+
+                keep_alive = headers.get("connection", "").lower() != "close"
+                write_response(writer, status, response, keep_alive)
+                await writer.drain()
+                if not keep_alive:
+                    break
+        except HttpError as error:
+            write_response(writer, error.status, {"error": str(error)}, False)
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            writer.close()
+
+    async def route(self, method, target, body):
+        path = target.split("?", 1)[0]
+        if path == "/health":
+            require_method(method, "GET")
+            return {"status": "ok"}
+        if path == "/stats":
+            require_method(method, "GET")
+            return self.get_stats()
+        if path == "/classify":
+            require_method(method, "POST")
+            return await self.classify_request(body)
+        if path == "/reload":
+            require_method(method, "POST")
+            return {"version": await asyncio.wrap_future(self.classifier.reload(wait=False))}
+        raise HttpError(404, "Unknown path: " + path)
+
+    async def classify_request(self, body):
+        try:
+            value = json.loads(body.decode("utf-8"))
+        except ValueError as error:
+            raise HttpError(400, "Invalid JSON: " + str(error))
+
+        if isinstance(value, dict) and isinstance(value.get("tweet"), str):
+            tweets, single = [value["tweet"]], True
+        elif isinstance(value, dict) and isinstance(value.get("tweets"), list) and \
+                all(isinstance(tweet, str) for tweet in value["tweets"]):
+            tweets, single = value["tweets"], False
+        else:
+            raise HttpError(400, "Expected {\"tweet\": string} or {\"tweets\": [string, ...]}")
+
+        self.requests += 1
+        results = await asyncio.gather(*[self.score(tweet) for tweet in tweets])
+        results = [{"classification": classification, "sentiment": sentiment} for classification, sentiment in results]
+        return results[0] if single else results
+
+
+def get_histogram_bounds(max_batch_size):
+    """
+    :return: Upper bounds of the batch size histogram buckets: powers of two below max_batch_size, and max_batch_size
+    """
+    bounds = []
+    bound = 1
+    while bound < max_batch_size:
+        bounds.append(bound)
+        bound *= 2
+    bounds.append(max_batch_size)
+    return bounds
+
+
+def require_method(method, expected):
+    if method != expected:
+        raise HttpError(405, "Expected " + expected + ", got " + method)
+
+
+async def read_request(reader):
+    """
+    Reads one HTTP/1.1 request
+
+    :return: (method, target, headers, body), header names in lower case, None if the connection was closed
+    """
+    request_line = await reader.readline()
+    if not request_line.strip():
+        return None
+
+    try:
+        method, target, _ = request_line.decode("latin-1").split(" ", 2)
+    except ValueError:
+        raise HttpError(400, "Malformed request line")
+
+    headers = {}
+    while True:
+        line = await reader.readline()
+        if line in (b"\r\n", b"\n", b""):
+            break
+        name, _, value = line.decode("latin-1").partition(":")
+        headers[name.strip().lower()] = value.strip()
+
+    try:
+        content_length = int(headers.get("content-length", 0))
+    except ValueError:
+        raise HttpError(400, "Invalid Content-Length")
+    if content_length > MAX_BODY_SIZE:
+        raise HttpError(413, "Request body larger than " + str(MAX_BODY_SIZE) + " bytes")
+
+    body = await reader.readexactly(content_length) if content_length > 0 else b""
+    return method, target, headers, body
+
+
+def write_response(writer, status, response, keep_alive):
+    body = json.dumps(response).encode("utf-8")
+    head = "HTTP/1.1 {} {}\r\nContent-Type: application/json\r\nContent-Length: {}\r\nConnection: {}\r\n\r\n".format(
+        status, REASONS[status], len(body), "keep-alive" if keep_alive else "close")
+    writer.write(head.encode("latin-1") + body)
+
+
+async def serve(service, host, port):
+    host, port = await service.start(host, port)
+    print("Listening on http://{}:{}".format(host, port))
+    try:
+        await service.server.serve_forever()
+    finally:
+        await service.close()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Serve sentiment classification over HTTP on a local port")
+    parser.add_argument("--host", default=DEFAULT_HOST, help="Address to listen on")
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT, help="Port to listen on")
+    parser.add_argument("--max-batch-size", type=int, default=DEFAULT_MAX_BATCH_SIZE,
+                        help="Maximum number of tweets scored together")
+    parser.add_argument("--max-wait", type=float, default=DEFAULT_MAX_WAIT,
+                        help="Maximum seconds a tweet waits for its batch to fill up")
+    parser.add_argument("--jobs", type=int, default=1, help="Number of worker processes, 0 for one per core")
+    parser.add_argument("--lexicon", default=DEFAULT_LEXICON, help="Path to sentiment lexicon file")
+    parser.add_argument("--options", default=DEFAULT_OPTIONS, help="Path to options file")
+    parser.add_argument("--dictionary", default=DEFAULT_DICTIONARY, help="Path to canonical dictionary")
+    parser.add_argument("--model", help="Compiled model file, used instead of lexicon, options and dictionary")
+    parser.add_argument("--share-memory", action="store_true",
+                        help="Workers share a read-only memory map of the model instead of each loading a copy")
+    parser.add_argument("--cache-size", type=int, default=0, help="Cached results per process, 0 disables caching")
+    parser.add_argument("--watch", action="store_true", help="Reload the model in the background when its files change")
+    parser.add_argument("--watch-interval", type=float, default=DEFAULT_INTERVAL,
+                        help="Seconds between checks of the model files")
+    args = parser.parse_args(argv)
+
+    with LexiconClassifier(args.lexicon, args.options, args.dictionary, args.cache_size,
+                           model=args.model, share_memory=args.share_memory) as classifier:
+        if args.watch:
+            classifier.watch(args.watch_interval)
+        service = SentimentService(classifier, args.max_batch_size, args.max_wait, args.jobs)
+        try:
+            asyncio.run(serve(service, args.host, args.port))
+        except KeyboardInterrupt:
+            pass
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,159 @@
+"""
+Streaming classification of large tweet dumps. Tweets are read, classified and written one line at a time, so memory
+use stays constant regardless of input size, also when classifying in several worker processes.
+
+Usage: fjlc-classify [input] [-o output] [--format tsv|jsonl] [--tweet-index 0] [--tweet-field text] [--jobs 1]
+       [--cache-size 0] [--skip-invalid]
+"""
+import argparse
+import collections
+import json
+import sys
+
+from fjlc.main import LexiconClassifier, DEFAULT_CHUNKSIZE, DEFAULT_LEXICON, DEFAULT_OPTIONS, DEFAULT_DICTIONARY
+from fjlc.utils.reader.data_set_reader import TAB_REGEX
+
+FORMATS = ["tsv", "jsonl"]
+
+# Output line of a blank or skipped input line, an empty label and sentiment, so output lines stay aligned with input
+SKIPPED_LINE = "\t\n"
+
+
+def read_tweets(lines, input_format="tsv", tweet_index=0, tweet_field="text", on_invalid=None):
+    """
+    Extracts the tweet from every line of input. For TSV input the tweet is the tweet_index-th tab separated column,
+    as in DataSetReader. For JSON Lines input the tweet is the tweet_field value of objects, the tweet_index-th
+    element of arrays or the value itself if it is a string. Blank lines have no tweet.
+
+    :param lines: Iterable of lines, f.ex. an open file
+    :param input_format: "tsv" or "jsonl"
+    :param tweet_index: Column or array index of the tweet
+    :param tweet_field: Object key of the tweet in JSON Lines input
+    :param on_invalid: Called with the line number and error message of every line without a string tweet, which is
+    then skipped. None raises a ValueError instead.
+    :return: Generator of tweets, one per line, None for blank and skipped lines
+    """
+    for line_number, line in enumerate(lines, 1):
+        line = line.rstrip("\r\n")
+        if not line.strip():
+            yield None
+            continue
+
+        try:
+            tweet = read_tweet(line, input_format, tweet_index, tweet_field)
+        except (IndexError, KeyError, TypeError, ValueError) as error:
+            message = "Could not read tweet from line {}: {!r}".format(line_number, error)
+            if on_invalid is None:
+                raise ValueError(message)
+            on_invalid(line_number, message)
+            tweet = None
+        yield tweet
+
+
+def read_tweet(line, input_format, tweet_index, tweet_field):
+    """
+    :return: Tweet of a non-blank line, see read_tweets
+    """
+    if input_format == "tsv":
+        return TAB_REGEX.split(line)[tweet_index]
+
+    value = json.loads(line)
+    if isinstance(value, dict):
+        value = value[tweet_field]
+    elif isinstance(value, list):
+        value = value[tweet_index]
+    if not isinstance(value, str):
+        raise TypeError("Tweet is not a string: " + json.dumps(value))
+    return value
+
+
+def classify_stream(classifier, tweets, output, jobs=1, chunksize=DEFAULT_CHUNKSIZE):
+    """
+    Writes classification and sentiment value of every tweet as a tab separated line to output, in input order. A
+    None tweet (see read_tweets) is written as SKIPPED_LINE, so output line k always belongs to input line k.
+
+    :param classifier: LexiconClassifier to classify with
+    :param tweets: Iterable of tweets, consumed lazily
+    :param output: File-like object to write to
+    :param jobs: Number of worker processes, 1 classifies in this process
+    :param chunksize: Number of tweets sent to a worker process at a time
+    :return: Number of tweets classified
+    """
+    # Whether every line read so far, but not yet written, is a tweet. Lines are read ahead of the results, so the
+    # skipped lines before the tweet of a result are written first.
+    pending = collections.deque()
+
+    def read_ahead():
+        for tweet in tweets:
+            pending.append(tweet is not None)
+            if tweet is not None:
+                yield tweet
+
+    count = 0
+    for sentiment_value in classifier.iterate_batch("calculate_sentiment", read_ahead(), jobs, chunksize):
+        while not pending.popleft():
+            output.write(SKIPPED_LINE)
+        output.write(classifier.classifier.get_classification(sentiment_value) + "\t" + repr(sentiment_value) + "\n")
+        count += 1
+    output.write(SKIPPED_LINE * len(pending))
+    return count
+
+
+def guess_format(file_name):
+    return "jsonl" if file_name.endswith(".jsonl") or file_name.endswith(".json") else "tsv"
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Classify tweets line by line, writing '<label>\\t<sentiment>' for "
+                                                 "every input line, or an empty label and sentiment for blank and "
+                                                 "skipped lines")
+    parser.add_argument("input", nargs="?", default="-", help="Input file, - for stdin (default)")
+    parser.add_argument("-o", "--output", default="-", help="Output file, - for stdout (default)")
+    parser.add_argument("--format", choices=FORMATS, help="Input format, guessed from file extension if omitted")
+    parser.add_argument("--tweet-index", type=int, default=0, help="Column (TSV) or array index (JSON) of tweet")
+    parser.add_argument("--tweet-field", default="text", help="Object key of tweet in JSON Lines input")
+    parser.add_argument("--jobs", type=int, default=1, help="Number of worker processes, 0 for one per core")
+    parser.add_argument("--chunksize", type=int, default=DEFAULT_CHUNKSIZE, help="Tweets sent to a worker at a time")
+    parser.add_argument("--lexicon", default=DEFAULT_LEXICON, help="Path to sentiment lexicon file")
+    parser.add_argument("--options", default=DEFAULT_OPTIONS, help="Path to options file")
+    parser.add_argument("--dictionary", default=DEFAULT_DICTIONARY, help="Path to canonical dictionary")
+    parser.add_argument("--model", help="Compiled model file, used instead of lexicon, options and dictionary")
+    parser.add_argument("--share-memory", action="store_true",
+                        help="Workers share a read-only memory map of the model instead of each loading a copy")
+    parser.add_argument("--cache-size", type=int, default=0, help="Cached results per process, 0 disables caching")
+    parser.add_argument("--skip-invalid", action="store_true",
+                        help="Write an empty label and sentiment for lines without a string tweet and report their "
+                             "number, instead of failing")
+    args = parser.parse_args(argv)
+
+    input_format = args.format or guess_format(args.input)
+    input_file = sys.stdin if args.input == "-" else open(args.input)
+    output_file = sys.stdout if args.output == "-" else open(args.output, "w")
+
+    try:
+        with LexiconClassifier(args.lexicon, args.options, args.dictionary, args.cache_size,
+                               model=args.model, share_memory=args.share_memory) as classifier:
+            invalid_lines = [0]
+
+            def skip_invalid(line_number, message):
+                # Only the first invalid line is reported in full, the rest are counted
+                if invalid_lines[0] == 0:
+                    sys.stderr.write(message + "\n")
+                invalid_lines[0] += 1
+
+            tweets = read_tweets(input_file, input_format, args.tweet_index, args.tweet_field,
+                                 skip_invalid if args.skip_invalid else None)
+            classify_stream(classifier, tweets, output_file, args.jobs, args.chunksize)
+            if invalid_lines[0] > 0:
+                sys.stderr.write("Skipped {} invalid lines\n".format(invalid_lines[0]))
+    finally:
+        if input_file is not sys.stdin:
+            input_file.close()
+        if output_file is not sys.stdout:
+            output_file.close()
+        else:
+            output_file.flush()
+
+
+if __name__ == '__main__':
+    main()
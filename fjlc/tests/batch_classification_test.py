@@ -0,0 +1,48 @@
+import itertools
+import unittest
+from multiprocessing.pool import ThreadPool
+
+from fjlc.main import LexiconClassifier
+from fjlc.utils.tools import parallel
+
+
+class BatchClassificationTest(unittest.TestCase):
+
+    def setUp(self):
+        self.tweets = ["you have a great day", "a very bad bitch!", "not very good?", "", "I am happy!"] * 20
+
+    def test_chunks(self):
+        self.assertEqual([[0, 1, 2], [3, 4, 5], [6]], list(parallel.chunks(iter(range(7)), 3)))
+        self.assertEqual([], list(parallel.chunks([], 3)))
+
+    def test_ordered_imap_consumes_input_lazily(self):
+        consumed = []
+
+        def tweets():
+            for i in itertools.count():
+                consumed.append(i)
+                yield i
+
+        with ThreadPool(2) as pool:
+            results = parallel.ordered_imap(pool, lambda chunk: [i * 2 for i in chunk], tweets(), 5, 3)
+            self.assertEqual(list(range(0, 40, 2)), list(itertools.islice(results, 20)))
+        # At most max_pending_chunks chunks are read ahead of the yielded results
+        self.assertLessEqual(len(consumed), 20 + 3 * 5)
+
+    def test_batch_keeps_input_order(self):
+        with LexiconClassifier() as classifier:
+            expected = classifier.calculate_sentiment(self.tweets)
+            for jobs, chunksize in [(1, 7), (2, 1), (2, 7), (3, 1000)]:
+                self.assertEqual(expected, classifier.calculate_sentiment_batch(iter(self.tweets), jobs, chunksize))
+            self.assertEqual(classifier.classify(self.tweets), classifier.classify_batch(self.tweets, 2, 7))
+            self.assertEqual([], classifier.calculate_sentiment_batch([], 2))
+
+    def test_iterate_batch_of_endless_input(self):
+        with LexiconClassifier() as classifier:
+            expected = classifier.calculate_sentiment(self.tweets)
+            results = classifier.iterate_batch("calculate_sentiment", itertools.cycle(self.tweets), 2, 7)
+            self.assertEqual(expected, list(itertools.islice(results, len(self.tweets))))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,40 @@
+import unittest
+
+from fjlc.benchmarks.suite import BenchmarkSuite, compare_results, percentile
+
+
+class BenchmarkSuiteTest(unittest.TestCase):
+
+    def test_all_stages(self):
+        results = BenchmarkSuite(100, repeat=1).run()
+        self.assertEqual({"filters", "compiled_filters", "lexical_parser", "tokenization", "scoring", "classify",
+                          "lexicon_creator", "tweet_n_grams"}, set(results["stages"].keys()))
+        for stage, result in results["stages"].items():
+            self.assertGreater(result["throughput"], 0, stage)
+            self.assertLessEqual(result["latency"]["p50"], result["latency"]["p99"], stage)
+            self.assertLessEqual(result["latency"]["p99"], result["latency"]["max"], stage)
+
+    def test_lexicon_creation(self):
+        lexicon = BenchmarkSuite(300, repeat=1).create_lexicon()
+        self.assertGreater(len(lexicon), 0)
+        self.assertEqual(5.0, max(lexicon.values()))
+        self.assertEqual(-5.0, min(lexicon.values()))
+
+    def test_compare_results(self):
+        def result(throughput, p50):
+            return {"stages": {"scoring": {"throughput": throughput, "latency": {"p50": p50}}}}
+
+        regressions = [comparison[1] for comparison in compare_results(result(100, 1.0), result(80, 1.2), 0.1)
+                       if comparison[-1]]
+        self.assertEqual(["throughput", "latency_p50"], regressions)
+        self.assertFalse(any(comparison[-1] for comparison in compare_results(result(100, 1.0), result(95, 0.5))))
+
+    def test_percentile(self):
+        values = list(range(1, 101))
+        self.assertEqual(50, percentile(values, 50))
+        self.assertEqual(99, percentile(values, 99))
+        self.assertEqual(7, percentile([7], 90))
+
+
+if __name__ == '__main__':
+    unittest.main()
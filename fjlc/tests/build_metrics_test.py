@@ -0,0 +1,108 @@
+import io
+import os
+import shutil
+import tempfile
+import time
+import unittest
+from unittest import mock
+
+import fjlc.main as main
+from fjlc.benchmarks.synthetic_corpus import SyntheticCorpus
+from fjlc.lexicon.lexicon_creator import LexiconCreator
+from fjlc.preprocessing.preprocessors.n_gram_counts import NGramCounts
+from fjlc.preprocessing.preprocessors.tweet_n_grams_pmi import TweetNGramsPMI
+from fjlc.utils.progressbar.build_metrics import BuildMetrics, format_report
+from fjlc.utils.progressbar.progress_bar import ProgressBar, get_progress_bar
+from fjlc.utils.reader.data_set_reader import DataSetReader
+from fjlc.utils.reader.line_reader import LineReader
+
+
+class BuildMetricsTest(unittest.TestCase):
+
+    def setUp(self):
+        self.options, canonical_dictionary = main.load_settings()
+        self.tweet_filters = main.TWEET_FILTERS.with_canonical_dictionary(canonical_dictionary).compile()
+        self.n_gram_filters = main.N_GRAM_FILTERS.with_canonical_dictionary(canonical_dictionary).compile()
+        corpus = SyntheticCorpus(seed=5)
+        self.n_grams = [phrase for phrase in corpus.phrases if " " in phrase]
+        self.directory = tempfile.mkdtemp()
+        self.data_set_file = os.path.join(self.directory, "data_set.tsv")
+        with open(self.data_set_file, "w") as f:
+            for label, tweet in corpus.generate_labeled_tweets(2500):
+                f.write(label + "\t" + tweet + "\n")
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def create_lexicon(self, jobs):
+        reports = []
+        metrics = BuildMetrics(reports.append, report_interval=0)
+        LexiconCreator(self.options, metrics).create_lexicon(DataSetReader(self.data_set_file, 1, 0), self.n_grams, 10,
+                                                             0.5, self.tweet_filters, jobs)
+        return reports
+
+    def test_lexicon_creation_reports(self):
+        for jobs in [1, 2]:
+            reports = self.create_lexicon(jobs)
+            self.assertGreater(len(reports), 1)
+            final = reports[-1]
+            self.assertTrue(final["finished"])
+            self.assertEqual(2500, final["lines"])
+            self.assertEqual(os.path.getsize(self.data_set_file), final["bytes"])
+            self.assertEqual(100.0, final["progress"])
+            self.assertEqual({"reading", "filtering", "tokenizing", "counting", "normalization"},
+                             set(final["stage_times"]))
+            self.assertGreater(final["peak_sizes"]["n_grams"], 0)
+
+            progress = [report["progress"] for report in reports]
+            self.assertEqual(sorted(progress), progress)
+
+    def test_n_gram_mining_reports(self):
+        tweets_file = os.path.join(self.directory, "tweets.txt")
+        with open(tweets_file, "w") as f:
+            f.writelines(tweet + "\n" for tweet in SyntheticCorpus(seed=6).generate_tweets(2500))
+
+        log = io.StringIO()
+        metrics = BuildMetrics(log_file=log, report_interval=0)
+        TweetNGramsPMI(self.options, metrics=metrics).get_frequent_n_grams(LineReader(tweets_file), 3, 0.002, 0.5,
+                                                                           self.n_gram_filters)
+        final = metrics.get_report()
+        self.assertEqual(2500, final["lines"])
+        self.assertEqual(os.path.getsize(tweets_file), final["bytes"])
+        self.assertEqual({"reading", "filtering", "counting", "pmi"}, set(final["stage_times"]))
+        self.assertEqual(format_report(final), log.getvalue().splitlines()[-1])
+
+    def test_stage_times_are_not_double_counted(self):
+        tweets_file = os.path.join(self.directory, "tweets.txt")
+        with open(tweets_file, "w") as f:
+            f.writelines(tweet + "\n" for tweet in SyntheticCorpus(seed=6).generate_tweets(2500))
+
+        prune_infrequent = NGramCounts.prune_infrequent
+
+        def slow_prune_infrequent(counts, limit):
+            time.sleep(0.2)
+            prune_infrequent(counts, limit)
+
+        metrics = BuildMetrics()
+        with mock.patch.object(NGramCounts, "prune_infrequent", slow_prune_infrequent):
+            start = time.perf_counter()
+            TweetNGramsPMI(self.options, prune_interval=500, metrics=metrics).get_frequent_n_grams(
+                LineReader(tweets_file), 3, 0.002, 0.5, self.n_gram_filters)
+            elapsed = time.perf_counter() - start
+
+        stage_times = metrics.get_report()["stage_times"]
+        self.assertGreaterEqual(stage_times["pruning"], 1.0)
+        self.assertLessEqual(sum(stage_times.values()), elapsed)
+
+    def test_progress_bar(self):
+        stream = io.StringIO()
+        metrics = BuildMetrics(ProgressBar("Counting...", stream), report_interval=0)
+        metrics.start(total_bytes=200)
+        metrics.add(lines=10, num_bytes=50)
+        metrics.finish()
+        self.assertTrue(stream.getvalue().startswith("Counting...\n\r[" + "|" * 25 + "-" * 21 + " 25.00% "))
+        self.assertIn(get_progress_bar(100.0), stream.getvalue())
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -1,5 +1,11 @@
 import unittest
+from os import path
 
+import fjlc.classifier.classifier_options as classifier_options
+from fjlc.benchmarks.scoring_benchmark import score_lexical_tokens
+from fjlc.benchmarks.synthetic_corpus import SyntheticCorpus
+from fjlc.classifier.result_cache import ResultCache, SIZE_AWARE, HASH
+from fjlc.classifier.sentence.lexical_parser import lexically_parse_tweet
 from fjlc.main import LexiconClassifier
 
 
@@ -34,5 +40,70 @@ class ClassificationTest(unittest.TestCase):
         intensified_with_exclamation = self.classifier.calculate_sentiment(self.most_positive_intensified + "!")
         self.assertGreater(intensified_with_exclamation, intensified_normal)
 
+    def test_scoring_engine_matches_lexical_tokens(self):
+        classifier = self.classifier.classifier
+        # lexical_parser and LexicalToken read the module level options
+        classifier_options.set_options(self.classifier.words)
+        for tweet in SyntheticCorpus(seed=3).generate_tweets(2000):
+            tweet = classifier.filters.apply(tweet)
+            lexical_tokens = lexically_parse_tweet(tweet, classifier.phrase_tree)
+            self.assertEqual(score_lexical_tokens(classifier.lexicon, lexical_tokens, classifier.options),
+                             classifier.scoring_engine.calculate_sentiment(tweet), tweet)
+
+    def test_classifiers_with_different_options(self):
+        data = path.join(path.abspath(path.dirname(__file__)), "../res/data/")
+        tweets = [self.most_positive, self.most_negative_intensified + "!", "not very good?"]
+        afinn = LexiconClassifier(data + "lexicon.afinn.json", data + "options.afinn.json")
+        afinn_sentiment = afinn.calculate_sentiment(tweets)
+
+        pmi = LexiconClassifier()
+        self.assertEqual(self.classifier.calculate_sentiment(tweets), pmi.calculate_sentiment(tweets))
+        self.assertEqual(afinn_sentiment, afinn.calculate_sentiment(tweets))
+
+    def test_batch_matches_single(self):
+        tweets = [self.most_positive, self.most_negative, self.most_positive_intensified + "!", "", "no way?"] * 20
+        expected = self.classifier.calculate_sentiment(tweets)
+
+        self.assertEqual(expected, self.classifier.calculate_sentiment_batch(tweets, jobs=1))
+        with self.classifier:
+            self.assertEqual(expected, self.classifier.calculate_sentiment_batch(iter(tweets), jobs=2, chunksize=7))
+            self.assertEqual(self.classifier.classify(tweets), self.classifier.classify_batch(tweets, jobs=2))
+
+    def test_cached_results_match_uncached(self):
+        tweets = list(SyntheticCorpus(seed=5).generate_tweets(200)) * 3
+        expected = self.classifier.calculate_sentiment(tweets)
+
+        cached = LexiconClassifier(cache_size=100)
+        self.assertEqual(expected, cached.calculate_sentiment(tweets))
+        self.assertEqual(self.classifier.classify(tweets), cached.classify(tweets))
+        statistics = cached.get_cache_statistics()
+        self.assertEqual(100, statistics["entries"])
+        self.assertGreater(statistics["evictions"], 0)
+        self.assertIsNone(self.classifier.get_cache_statistics())
+
+        hashed = LexiconClassifier(cache_size=1 << 20, cache_eviction=SIZE_AWARE, cache_key=HASH)
+        self.assertEqual(expected, hashed.calculate_sentiment(tweets))
+        self.assertEqual(expected, hashed.calculate_sentiment(tweets))
+        self.assertGreaterEqual(hashed.get_cache_statistics()["hit_rate"], 4 / 6.0)
+
+    def test_result_cache(self):
+        cache = ResultCache(2)
+        cache.put("model", "a", 1.0)
+        cache.put("model", "b", 2.0)
+        self.assertEqual(1.0, cache.get("model", "a"))
+        cache.put("model", "c", 3.0)
+        self.assertIsNone(cache.get("model", "b"))
+        self.assertEqual(3.0, cache.get("model", "c"))
+        self.assertIsNone(cache.get("other model", "a"))
+        self.assertEqual(0, cache.get_statistics()["entries"])
+        self.assertEqual({"hits": 2, "misses": 2, "evictions": 1, "entries": 0},
+                         {key: cache.get_statistics()[key] for key in ["hits", "misses", "evictions", "entries"]})
+
+        cache = ResultCache(1000, SIZE_AWARE)
+        for i in range(100):
+            cache.put("model", str(i) * 10, float(i))
+        self.assertLessEqual(cache.get_statistics()["size"], 1000)
+        self.assertEqual(99.0, cache.get("model", "99" * 10))
+
 if __name__ == '__main__':
     unittest.main()
@@ -0,0 +1,128 @@
+import os
+import pickle
+import shutil
+import tempfile
+import unittest
+
+import fjlc.main as main
+import fjlc.preprocessing.preprocessors.corpus_cache as corpus_cache
+from fjlc.benchmarks.synthetic_corpus import SyntheticCorpus
+from fjlc.lexicon.lexicon_creator import LexiconCreator
+from fjlc.preprocessing.filters.canonical_form import CanonicalDictionary
+from fjlc.preprocessing.filters.regex_filters import RegexFilters
+from fjlc.preprocessing.preprocessors.corpus_cache import CorpusCache, CorpusReader, get_corpus_fingerprint
+from fjlc.preprocessing.preprocessors.tweet_n_grams_pmi import TweetNGramsPMI
+from fjlc.utils.reader.data_set_reader import Classification, DataSetReader
+from fjlc.utils.reader.line_reader import LineReader
+
+
+class CorpusCacheTest(unittest.TestCase):
+
+    def setUp(self):
+        self.options, canonical_dictionary = main.load_settings()
+        self.tweet_filters = main.TWEET_FILTERS.with_canonical_dictionary(canonical_dictionary).compile()
+        self.n_gram_filters = main.N_GRAM_FILTERS.with_canonical_dictionary(canonical_dictionary).compile()
+        corpus = SyntheticCorpus(seed=12)
+        self.n_grams = [phrase for phrase in corpus.phrases if " " in phrase]
+        self.directory = tempfile.mkdtemp()
+        self.cache_directory = os.path.join(self.directory, "cache")
+
+        self.data_set_file = os.path.join(self.directory, "data_set.tsv")
+        with open(self.data_set_file, "w") as f:
+            for label, tweet in corpus.generate_labeled_tweets(1500):
+                f.write(label + "\t" + tweet + "\n")
+
+        self.tweets_file = os.path.join(self.directory, "tweets.txt")
+        with open(self.tweets_file, "w") as f:
+            f.writelines(tweet + "\n" for tweet in corpus.generate_tweets(1500))
+
+        self.block_size = corpus_cache.BLOCK_SIZE
+        corpus_cache.BLOCK_SIZE = 100
+
+    def tearDown(self):
+        corpus_cache.BLOCK_SIZE = self.block_size
+        shutil.rmtree(self.directory)
+
+    def create_lexicon(self, jobs, cache=None):
+        return LexiconCreator(self.options, corpus_cache=cache).create_lexicon(
+            DataSetReader(self.data_set_file, 1, 0), self.n_grams, 10, 0.5, self.tweet_filters, jobs)
+
+    def get_frequent_n_grams(self, jobs, cache=None):
+        return TweetNGramsPMI(self.options, corpus_cache=cache).get_frequent_n_grams(
+            LineReader(self.tweets_file), 3, 0.002, 0.5, self.n_gram_filters, jobs)
+
+    def test_records_round_trip(self):
+        filters = self.tweet_filters
+        corpus_file = os.path.join(self.directory, "data_set.corpus")
+        corpus_cache.build_corpus(self.data_set_file, corpus_file, filters, 1, 0)
+
+        expected = [(entry.get_classification(), RegexFilters.WHITESPACE.split(filters.apply(entry.get_tweet())))
+                    for entry in DataSetReader(self.data_set_file, 1, 0)]
+        self.assertEqual(expected, list(CorpusReader(corpus_file)))
+        self.assertIn(Classification.NEGATIVE, [classification for classification, tokens in expected])
+
+        for num_ranges in [1, 2, 7, 1000]:
+            records = []
+            for start, end in corpus_cache.split_into_block_ranges(corpus_file, num_ranges):
+                records.extend(CorpusReader(corpus_file, start, end))
+            self.assertEqual(expected, records)
+
+    def test_empty_and_unicode_tokens(self):
+        records = [(0, [""]), (1, ["smørbrød", "||:)||"]), (0, []), (3, ["a", "a", ""])]
+        payload = corpus_cache.encode_block(records)[corpus_cache.BLOCK_HEADER.size:]
+        decoded = list(corpus_cache.decode_block(len(records), corpus_cache.zlib.decompress(payload)))
+        self.assertEqual([(corpus_cache.CLASSIFICATIONS[label], tokens) for label, tokens in records], decoded)
+
+    def test_cached_lexicon_matches_uncached(self):
+        expected = self.create_lexicon(1)
+        cache = CorpusCache(self.cache_directory)
+        for jobs in [1, 2, 1]:
+            self.assertEqual(list(expected.items()), list(self.create_lexicon(jobs, cache).items()))
+        self.assertEqual(1, len(os.listdir(self.cache_directory)))
+
+    def test_cached_n_grams_match_uncached(self):
+        expected = self.get_frequent_n_grams(1)
+        self.assertGreater(len(expected), 0)
+        cache = CorpusCache(self.cache_directory)
+        for jobs in [2, 1, 2]:
+            self.assertEqual(expected, self.get_frequent_n_grams(jobs, cache))
+        self.assertEqual(1, len(os.listdir(self.cache_directory)))
+
+    def test_fingerprint(self):
+        fingerprint = get_corpus_fingerprint(self.tweets_file, main.N_GRAM_FILTERS.compile())
+        self.assertEqual(fingerprint, get_corpus_fingerprint(self.tweets_file, main.N_GRAM_FILTERS.compile()))
+        self.assertNotEqual(fingerprint, get_corpus_fingerprint(self.tweets_file, main.TWEET_FILTERS.compile()))
+        self.assertNotEqual(fingerprint, get_corpus_fingerprint(self.tweets_file, main.N_GRAM_FILTERS))
+        self.assertNotEqual(fingerprint, get_corpus_fingerprint(self.tweets_file, main.N_GRAM_FILTERS.compile(), 1, 0))
+
+        with open(self.tweets_file, "a") as f:
+            f.write("one more tweet\n")
+        self.assertNotEqual(fingerprint, get_corpus_fingerprint(self.tweets_file, main.N_GRAM_FILTERS.compile()))
+
+        fingerprint = get_corpus_fingerprint(self.tweets_file, main.N_GRAM_FILTERS.compile())
+        stat = os.stat(self.tweets_file)
+        os.utime(self.tweets_file, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10 ** 9))
+        self.assertNotEqual(fingerprint, get_corpus_fingerprint(self.tweets_file, main.N_GRAM_FILTERS.compile()))
+
+    def test_filter_code_changes_fingerprint(self):
+        def filter_function(tweet):
+            return tweet.lower()
+
+        description = corpus_cache.describe_filter(filter_function)
+        self.assertEqual(description, corpus_cache.describe_filter(filter_function))
+
+        # Same module and name, but another body, like a filter changed by an upgrade
+        filter_function.__code__ = (lambda tweet: tweet.upper()).__code__
+        self.assertNotEqual(description, corpus_cache.describe_filter(filter_function))
+
+    def test_dictionary_changes_fingerprint(self):
+        fingerprint = get_corpus_fingerprint(self.tweets_file, self.n_gram_filters)
+        self.assertEqual(fingerprint, get_corpus_fingerprint(self.tweets_file,
+                                                             pickle.loads(pickle.dumps(self.n_gram_filters))))
+        other_dictionary = CanonicalDictionary({"cool": ["cool", "col"]})
+        other_filters = main.N_GRAM_FILTERS.with_canonical_dictionary(other_dictionary).compile()
+        self.assertNotEqual(fingerprint, get_corpus_fingerprint(self.tweets_file, other_filters))
+
+
+if __name__ == '__main__':
+    unittest.main()
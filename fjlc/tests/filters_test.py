@@ -0,0 +1,57 @@
+import unittest
+from os import path
+
+import fjlc.lexical_classifier as lexical_classifier
+import fjlc.main as main
+import fjlc.preprocessing.filters.canonical_form as canonical_form
+from fjlc.benchmarks.synthetic_corpus import SyntheticCorpus
+from fjlc.preprocessing.filters.filters import Filters
+
+
+class CompiledFiltersTest(unittest.TestCase):
+
+    def setUp(self):
+        canonical_form.load_dictionary(path.join(path.abspath(path.dirname(__file__)), "../res/data/canonical.json"))
+        self.tweets = SyntheticCorpus(seed=7).generate_tweets(2000)
+
+    def assert_same_output(self, filters):
+        compiled = filters.compile()
+        for tweet in self.tweets:
+            self.assertEqual(filters.apply(tweet), compiled.apply(tweet), tweet)
+
+    def test_classifier_filters(self):
+        self.assert_same_output(lexical_classifier.CLASSIFIER_FILTERS)
+
+    def test_lexicon_filters(self):
+        self.assert_same_output(main.N_GRAM_FILTERS)
+        self.assert_same_output(main.TWEET_FILTERS)
+
+    def test_fused_character_classes(self):
+        self.assert_same_output(Filters([Filters.remove_inner_word_characters, Filters.remove_non_alphabetic_text,
+                                         Filters.remove_non_syntactical_text, str.lower], []))
+        self.assert_same_output(Filters(None, None))
+
+
+class CanonicalFormTest(unittest.TestCase):
+
+    def test_canonical_correction(self):
+        dictionary = canonical_form.CanonicalDictionary({"god": ["good", "god"], "wo": ["woo", "wo"], "as": ["ass"]})
+        self.assertEqual("good", dictionary.correct_word("good"))
+        self.assertEqual("god", dictionary.correct_word("god"))
+        self.assertEqual("woo", dictionary.correct_word("woo"))
+        self.assertEqual("ass", dictionary.correct_word("as"))
+        self.assertEqual("sad", dictionary.correct_word("sad"))
+        self.assertEqual("sad", dictionary.correct_word("sad"))
+
+        cache_info = dictionary.cache_info()
+        self.assertEqual((1, 5), (cache_info.hits, cache_info.misses))
+
+    def test_bounded_levenshtein_distance(self):
+        self.assertEqual(3, canonical_form.levenshtein_distance("kitten", "sitting"))
+        self.assertEqual(3, canonical_form.levenshtein_distance("kitten", "sitting", 3))
+        self.assertEqual(2, canonical_form.levenshtein_distance("kitten", "sitting", 1))
+        self.assertEqual(1, canonical_form.levenshtein_distance("abcdef", "", 0))
+
+
+if __name__ == '__main__':
+    unittest.main()
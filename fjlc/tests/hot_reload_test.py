@@ -0,0 +1,159 @@
+import json
+import os
+import shutil
+import tempfile
+import time
+import unittest
+
+import fjlc.classifier.classifier_options as classifier_options
+import fjlc.main as main
+import fjlc.preprocessing.filters.canonical_form as canonical_form
+from fjlc.classifier.model_watcher import ModelWatcher
+from fjlc.main import LexiconClassifier
+from fjlc.utils import json_utils
+
+
+class HotReloadTest(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.lexicon_file = os.path.join(self.directory, "lexicon.json")
+        self.dictionary_file = os.path.join(self.directory, "canonical.json")
+        self.lexicon = json_utils.from_json_file(main.DEFAULT_LEXICON)
+        self.write_json(self.lexicon_file, self.lexicon)
+        self.write_json(self.dictionary_file, {})
+        self.tweets = ["you have a great day", "a very bad bitch!", "not very good?", "", "I am happy!"] * 20
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def write_json(self, file_name, value):
+        # Written to another file and moved in place, like a lexicon build would, so the watcher never sees half a file
+        temporary_file = file_name + ".tmp"
+        with open(temporary_file, "w") as f:
+            json.dump(value, f)
+        os.replace(temporary_file, file_name)
+
+    def write_negated_lexicon(self):
+        self.write_json(self.lexicon_file, {phrase: -value for phrase, value in self.lexicon.items()})
+
+    def create_classifier(self, **arguments):
+        return LexiconClassifier(self.lexicon_file, dictionary=self.dictionary_file, **arguments)
+
+    def test_reload(self):
+        with self.create_classifier(cache_size=100) as classifier:
+            expected = classifier.calculate_sentiment(self.tweets)
+            self.assertEqual(1, classifier.get_model_version())
+            self.assertEqual(5.0, classifier.calculate_sentiment("you have a great day"))
+
+            self.write_negated_lexicon()
+            self.assertEqual(2, classifier.reload())
+            self.assertEqual(2, classifier.get_model_version())
+            self.assertEqual([-value for value in expected], classifier.calculate_sentiment(self.tweets))
+
+            self.assertEqual(3, classifier.reload(lexicon=main.DEFAULT_LEXICON, wait=False).result())
+            self.assertEqual(expected, classifier.calculate_sentiment(self.tweets))
+            self.assertEqual(main.DEFAULT_LEXICON, classifier.lexicon)
+
+    def test_failed_reload_keeps_model(self):
+        with self.create_classifier() as classifier:
+            expected = classifier.calculate_sentiment(self.tweets)
+            with open(self.lexicon_file, "w") as f:
+                f.write("{\"truncated")
+            with self.assertRaises(ValueError):
+                classifier.reload()
+
+            self.assertIsInstance(classifier.get_reload_error(), ValueError)
+            self.assertEqual(1, classifier.get_model_version())
+            self.assertEqual(expected, classifier.calculate_sentiment(self.tweets))
+
+    def test_batches_finish_on_old_model(self):
+        for jobs in [1, 2]:
+            with self.create_classifier() as classifier:
+                expected = classifier.calculate_sentiment(self.tweets)
+                batch = classifier.iterate_batch("calculate_sentiment", self.tweets, jobs, 10)
+                results = [next(batch)]
+                old_model = classifier.active_model
+
+                self.write_negated_lexicon()
+                classifier.reload()
+                results.extend(batch)
+                self.assertEqual(expected, results)
+                self.assertEqual([-value for value in expected],
+                                 classifier.calculate_sentiment_batch(self.tweets, jobs, 10))
+
+                # The pool of the replaced model is stopped once its last batch has finished
+                self.assertIsNone(old_model.pool)
+                self.write_json(self.lexicon_file, self.lexicon)
+
+    def test_reload_before_batch_is_consumed(self):
+        with self.create_classifier() as classifier:
+            expected = classifier.calculate_sentiment(self.tweets)
+            batch = classifier.iterate_batch("calculate_sentiment", self.tweets, 2, 10)
+            old_model = classifier.active_model
+
+            self.write_negated_lexicon()
+            classifier.reload()
+            self.assertIsNotNone(old_model.pool)
+            self.assertEqual(expected, list(batch))
+            self.assertIsNone(old_model.pool)
+
+            # A batch of a model that was replaced before the batch started is processed without starting workers
+            self.assertEqual(expected, list(classifier.iterate_batch("calculate_sentiment", self.tweets, 2, 10,
+                                                                     old_model)))
+            self.assertIsNone(old_model.pool)
+
+    def test_watch(self):
+        with self.create_classifier() as classifier:
+            expected = classifier.calculate_sentiment(self.tweets)
+            classifier.watch(interval=0.01)
+
+            self.write_negated_lexicon()
+            deadline = time.time() + 30
+            while classifier.get_model_version() < 2 and time.time() < deadline:
+                time.sleep(0.01)
+            self.assertEqual(2, classifier.get_model_version())
+            self.assertEqual([-value for value in expected], classifier.calculate_sentiment(self.tweets))
+
+    def test_model_watcher(self):
+        changes = []
+        watcher = ModelWatcher(lambda: [self.lexicon_file, self.dictionary_file], lambda: changes.append(1))
+        self.assertFalse(watcher.check())
+
+        os.utime(self.lexicon_file, ns=(0, 0))
+        # A change is only reported once the files are unchanged for one more check
+        self.assertFalse(watcher.check())
+        self.assertTrue(watcher.check())
+        self.assertFalse(watcher.check())
+        self.assertEqual(1, len(changes))
+
+        os.remove(self.dictionary_file)
+        self.assertFalse(watcher.check())
+        self.assertTrue(watcher.check())
+        self.assertEqual(2, len(changes))
+
+    def test_dictionary_per_model(self):
+        tweet = "you have a grate day"
+        uncorrected = self.create_classifier()
+        self.write_json(self.dictionary_file, {"grate": ["great"]})
+        with self.create_classifier() as classifier:
+            self.assertEqual(5.0, classifier.calculate_sentiment(tweet))
+            # Every model corrects words with its own dictionary
+            self.assertNotEqual(5.0, uncorrected.calculate_sentiment(tweet))
+            self.assertEqual(5.0, classifier.calculate_sentiment(tweet))
+
+    def test_reload_keeps_module_level_settings(self):
+        loaded_words, dictionary = classifier_options.get_loaded_words(), canonical_form.dictionary
+        options_file = os.path.join(os.path.dirname(main.DEFAULT_OPTIONS), "options.afinn.json")
+        with self.create_classifier() as classifier:
+            self.write_json(self.dictionary_file, {"grate": ["great"]})
+            self.assertEqual(2, classifier.reload(options=options_file, dictionary=self.dictionary_file))
+            self.assertEqual(5.0, classifier.calculate_sentiment("you have a grate day"))
+            # Lexicon creation and the module level filters are not affected by the settings of a classifier
+            self.assertEqual(loaded_words, classifier_options.get_loaded_words())
+            self.assertIs(dictionary, canonical_form.dictionary)
+            self.assertEqual("grate", canonical_form.correct_word_via_canonical("grate"))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,62 @@
+import json
+import subprocess
+import sys
+import unittest
+
+# Recorded budgets in seconds, a few times what a laptop measures (about 0.05s to import fjlc.main and 0.02s to create
+# the default classifier and classify a first tweet), so that only regressions such as an eager import of NumPy or of
+# the lexicon creation modules exceed them
+IMPORT_BUDGET = 0.15
+FIRST_CLASSIFY_BUDGET = 0.5
+
+# Modules that only lexicon creation or worker pools need
+LAZY_MODULES = [
+    "fjlc.lexicon.lexicon_creator", "fjlc.preprocessing.preprocessors.tweet_n_grams_pmi",
+    "fjlc.preprocessing.preprocessors.corpus_cache", "fjlc.classifier.classifier_pool", "multiprocessing", "numpy"
+]
+
+CLASSIFY_SCRIPT = """
+import json, time
+start = time.perf_counter()
+import fjlc
+classifier = fjlc.LexiconClassifier()
+classifier.classify("I am happy!")
+print(json.dumps({"first_classify": time.perf_counter() - start}))
+"""
+
+
+def run_with_import_time(script):
+    """
+    Runs script in a fresh interpreter with -X importtime
+
+    :return: Standard output, and map of imported module name to cumulative import time in seconds
+    """
+    process = subprocess.run([sys.executable, "-X", "importtime", "-c", script], stdout=subprocess.PIPE,
+                             stderr=subprocess.PIPE, universal_newlines=True, check=True)
+    import_times = {}
+    for line in process.stderr.splitlines():
+        if line.startswith("import time:") and "|" in line:
+            self_time, cumulative, name = line[len("import time:"):].split("|")
+            if cumulative.strip().isdigit():
+                import_times[name.strip()] = int(cumulative) / 1e6
+    return process.stdout, import_times
+
+
+class ImportTimeTest(unittest.TestCase):
+
+    def test_import_fjlc_is_lazy(self):
+        output, import_times = run_with_import_time("import fjlc")
+        self.assertIn("fjlc", import_times)
+        self.assertNotIn("fjlc.main", import_times)
+
+    def test_first_classify_within_budget(self):
+        output, import_times = run_with_import_time(CLASSIFY_SCRIPT)
+        for module in LAZY_MODULES:
+            self.assertNotIn(module, import_times)
+
+        self.assertLess(import_times["fjlc.main"], IMPORT_BUDGET)
+        self.assertLess(json.loads(output.splitlines()[-1])["first_classify"], FIRST_CLASSIFY_BUDGET)
+
+
+if __name__ == '__main__':
+    unittest.main()
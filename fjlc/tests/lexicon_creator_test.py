@@ -0,0 +1,168 @@
+import os
+import shutil
+import tempfile
+import unittest
+
+import fjlc.classifier.classifier_options as classifier_options
+import fjlc.main as main
+import fjlc.preprocessing.filters.canonical_form as canonical_form
+from fjlc.benchmarks.synthetic_corpus import SyntheticCorpus
+from fjlc.classifier.classifier_options import ClassifierOptions
+from fjlc.lexicon.lexicon_creator import LexiconCreator
+from fjlc.lexicon.polarity_checkpoint import PolarityCheckpoint, get_settings_fingerprint
+from fjlc.preprocessing.filters.canonical_form import CanonicalDictionary
+from fjlc.utils import array_utils, json_utils
+from fjlc.utils.reader.byte_range_reader import split_into_byte_ranges
+from fjlc.utils.reader.data_set_reader import DataSetReader
+from fjlc.utils.reader.line_reader import LineReader
+
+
+class LexiconCreatorTest(unittest.TestCase):
+
+    def setUp(self):
+        self.options, canonical_dictionary = main.load_settings()
+        self.filters = main.TWEET_FILTERS.with_canonical_dictionary(canonical_dictionary).compile()
+        corpus = SyntheticCorpus(seed=11)
+        self.n_grams = [phrase for phrase in corpus.phrases if " " in phrase]
+
+        self.directory = tempfile.mkdtemp()
+        self.data_set_file = os.path.join(self.directory, "data_set.tsv")
+        with open(self.data_set_file, "w", newline="") as f:
+            for i, (label, tweet) in enumerate(corpus.generate_labeled_tweets(1500)):
+                f.write(label + "\t" + tweet + ("\r\n" if i % 3 == 0 else "\n"))
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def create_lexicon(self, jobs):
+        return LexiconCreator(self.options).create_lexicon(DataSetReader(self.data_set_file, 1, 0), self.n_grams, 10,
+                                                           0.5, self.filters, jobs)
+
+    def test_parallel_lexicon_matches_serial(self):
+        serial = self.create_lexicon(1)
+        self.assertGreater(len(serial), 0)
+        for jobs in [2, 3]:
+            self.assertEqual(list(serial.items()), list(self.create_lexicon(jobs).items()))
+
+    def test_classifiers_do_not_change_lexicon_creation(self):
+        expected = self.create_lexicon(1)
+        loaded_words, dictionary = classifier_options.get_loaded_words(), canonical_form.dictionary
+        data = os.path.join(os.path.abspath(os.path.dirname(__file__)), "../res/data/")
+        main.LexiconClassifier(data + "lexicon.afinn.json", data + "options.afinn.json")
+        self.assertEqual(loaded_words, classifier_options.get_loaded_words())
+        self.assertIs(dictionary, canonical_form.dictionary)
+        self.assertEqual(list(expected.items()), list(self.create_lexicon(1).items()))
+
+    def test_byte_ranges_cover_file(self):
+        with open(self.data_set_file) as f:
+            expected = f.readlines()
+        for num_ranges in [1, 2, 7, 100000]:
+            ranges = split_into_byte_ranges(self.data_set_file, num_ranges)
+            lines = []
+            for start, end in ranges:
+                with LineReader(self.data_set_file, start, end) as f:
+                    lines.extend(f)
+            self.assertEqual(expected, lines)
+            self.assertLessEqual(len(ranges), min(num_ranges, len(expected)))
+
+    def test_counter_merge(self):
+        counter, other = LexiconCreator.Counter(), LexiconCreator.Counter()
+        counter.num_positive += 3
+        other.num_positive += 2
+        other.num_negative += 1
+        counter.merge(other)
+        self.assertEqual((4 + 5, 4 + 1), (counter.num_positive, counter.num_negative))
+
+    @unittest.skipIf(array_utils.get_numpy() is None, "NumPy is not installed")
+    def test_vectorized_lexicon_matches_python(self):
+        try:
+            array_utils.set_use_numpy(False)
+            python = self.create_lexicon(1)
+            array_utils.set_use_numpy(True)
+            vectorized = self.create_lexicon(1)
+        finally:
+            array_utils.set_use_numpy(True)
+
+        self.assertGreater(len(python), 0)
+        self.assertEqual(list(python), list(vectorized))
+        for key, value in python.items():
+            self.assertAlmostEqual(value, vectorized[key], places=12)
+            self.assertIs(float, type(vectorized[key]))
+
+    def test_lexicon_file(self):
+        n_grams_file = os.path.join(self.directory, "n_grams.json")
+        lexicon_file = os.path.join(self.directory, "lexicon.json")
+        json_utils.to_json_file(n_grams_file, self.n_grams, False)
+
+        main.Lexicon(n_grams_file, self.data_set_file, lexicon_file, 10, 0.5).create_lexicon(jobs=2)
+        self.assertEqual(self.create_lexicon(1), json_utils.from_json_file(lexicon_file))
+
+    def test_incremental_update_matches_full_rebuild(self):
+        with open(self.data_set_file) as f:
+            lines = f.readlines()
+        n_grams_file = os.path.join(self.directory, "n_grams.json")
+        checkpoint_file = os.path.join(self.directory, "counts.ckpt")
+        lexicon_file = os.path.join(self.directory, "lexicon.json")
+        json_utils.to_json_file(n_grams_file, self.n_grams, False)
+
+        parts = [lines[:400], lines[400:1100], lines[1100:]]
+        for i, part in enumerate(parts):
+            part_file = os.path.join(self.directory, "part%d.tsv" % i)
+            with open(part_file, "w", newline="") as f:
+                f.writelines(part)
+            lexicon = main.Lexicon(n_grams_file, part_file, lexicon_file, 10, 0.5)
+            if i == 0:
+                lexicon.create_lexicon(checkpoint_file=checkpoint_file)
+            else:
+                lexicon.update_lexicon(checkpoint_file, jobs=i)
+
+        self.assertEqual(self.create_lexicon(1), json_utils.from_json_file(lexicon_file))
+
+        full = LexiconCreator(self.options).count_n_grams(DataSetReader(self.data_set_file, 1, 0), self.n_grams,
+                                                          self.filters)
+
+        checkpoint = PolarityCheckpoint(self.n_grams, get_settings_fingerprint(self.options, self.filters))
+        checkpoint.check_compatible(self.options, self.filters)
+        data = os.path.join(os.path.abspath(os.path.dirname(__file__)), "../res/data/")
+        with self.assertRaises(ValueError):
+            checkpoint.check_compatible(ClassifierOptions.from_file(data + "options.afinn.json"), self.filters)
+        with self.assertRaises(ValueError):
+            checkpoint.check_compatible(self.options, main.TWEET_FILTERS.with_canonical_dictionary(
+                CanonicalDictionary({"grate": ["great"]})).compile())
+        checkpoint = PolarityCheckpoint.load(checkpoint_file)
+        self.assertEqual([(n_gram, counter.num_positive, counter.num_negative) for n_gram, counter in full.items()],
+                         [(n_gram, counter.num_positive, counter.num_negative)
+                          for n_gram, counter in checkpoint.counter.items()])
+
+    def test_failed_checkpoint_save_keeps_checkpoint(self):
+        checkpoint_file = os.path.join(self.directory, "counts.ckpt")
+        checkpoint = PolarityCheckpoint(self.n_grams, get_settings_fingerprint(self.options, self.filters),
+                                        LexiconCreator(self.options).count_n_grams(
+                                            DataSetReader(self.data_set_file, 1, 0), self.n_grams, self.filters))
+        checkpoint.save(checkpoint_file)
+
+        # A phrase that can not be written to JSON fails the save halfway
+        broken = PolarityCheckpoint(self.n_grams, checkpoint.settings, {object(): LexiconCreator.Counter()})
+        with self.assertRaises(TypeError):
+            broken.save(checkpoint_file)
+        self.assertEqual(list(checkpoint.counter), list(PolarityCheckpoint.load(checkpoint_file).counter))
+        self.assertEqual(["counts.ckpt"], [name for name in os.listdir(self.directory) if name.startswith("counts")])
+
+    def test_checkpoint_rejects_other_settings(self):
+        checkpoint = PolarityCheckpoint(self.n_grams, "other")
+        with self.assertRaises(ValueError):
+            LexiconCreator(self.options).update_lexicon(checkpoint, DataSetReader(self.data_set_file, 1, 0), 10, 0.5,
+                                                        self.filters)
+
+        checkpoint = PolarityCheckpoint(self.n_grams, get_settings_fingerprint(self.options, self.filters))
+        checkpoint.check_compatible(self.options, self.filters)
+        data = os.path.join(os.path.abspath(os.path.dirname(__file__)), "../res/data/")
+        with self.assertRaises(ValueError):
+            checkpoint.check_compatible(ClassifierOptions.from_file(data + "options.afinn.json"), self.filters)
+        with self.assertRaises(ValueError):
+            checkpoint.check_compatible(self.options, main.TWEET_FILTERS.with_canonical_dictionary(
+                CanonicalDictionary({"grate": ["great"]})).compile())
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,84 @@
+import bz2
+import gzip
+import lzma
+import os
+import shutil
+import tempfile
+import unittest
+
+from fjlc.benchmarks.synthetic_corpus import SyntheticCorpus
+from fjlc.utils.reader.byte_range_reader import split_into_byte_ranges
+from fjlc.utils.reader.data_set_reader import DataSetReader
+from fjlc.utils.reader.line_reader import LineReader
+
+
+class LineReaderTest(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.file_name = os.path.join(self.directory, "tweets.tsv")
+        with open(self.file_name, "w", newline="") as f:
+            for i, tweet in enumerate(SyntheticCorpus(seed=8).generate_tweets(3000)):
+                f.write("positive\t" + tweet + ("\r\n" if i % 5 == 0 else "\n"))
+            f.write("negative\tno newline at the end")
+        with open(self.file_name) as f:
+            self.lines = f.readlines()
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def test_reads_lines_like_open(self):
+        for use_mmap in [False, True]:
+            self.assertEqual(self.lines, list(LineReader(self.file_name, use_mmap=use_mmap)))
+
+    def test_progress_by_bytes(self):
+        reader = LineReader(self.file_name)
+        progress = []
+        for _ in reader:
+            progress.append(reader.get_progress())
+        self.assertEqual(sorted(progress), progress)
+        self.assertEqual(100.0, progress[-1])
+        self.assertEqual(os.path.getsize(self.file_name), reader.get_bytes_read())
+
+    def test_compressed_files(self):
+        with open(self.file_name, "rb") as f:
+            data = f.read()
+        for extension, compress in [(".gz", gzip.compress), (".bz2", bz2.compress), (".xz", lzma.compress)]:
+            compressed_file = self.file_name + extension
+            with open(compressed_file, "wb") as f:
+                f.write(compress(data))
+
+            reader = LineReader(compressed_file)
+            self.assertFalse(reader.is_splittable())
+            self.assertEqual(self.lines, list(reader))
+            self.assertEqual(100.0, reader.get_progress())
+            with self.assertRaises(ValueError):
+                LineReader(compressed_file, 10, 20)
+
+    def test_byte_ranges_partition_lines(self):
+        size = os.path.getsize(self.file_name)
+        for num_ranges in [1, 3, 17]:
+            # Unaligned offsets are moved to the next line start
+            offsets = [size * i // num_ranges for i in range(num_ranges)] + [None]
+            for use_mmap in [False, True]:
+                lines = []
+                for start, end in zip(offsets, offsets[1:]):
+                    lines.extend(LineReader(self.file_name, start, end, use_mmap))
+                self.assertEqual(self.lines, lines)
+
+        entries = []
+        for start, end in split_into_byte_ranges(self.file_name, 4):
+            entries.extend(entry.get_tweet() for entry in DataSetReader(self.file_name, 1, 0, start, end))
+        self.assertEqual([entry.get_tweet() for entry in DataSetReader(self.file_name, 1, 0)], entries)
+
+    def test_empty_file(self):
+        empty_file = os.path.join(self.directory, "empty.txt")
+        open(empty_file, "w").close()
+        reader = LineReader(empty_file, use_mmap=True)
+        self.assertFalse(reader.has_next())
+        self.assertEqual([], list(reader))
+        self.assertEqual(100.0, reader.get_progress())
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,108 @@
+import os
+import shutil
+import tempfile
+import unittest
+
+import fjlc.classifier.model_artifact as model_artifact
+from fjlc.benchmarks.synthetic_corpus import SyntheticCorpus
+from fjlc.lexicon.container.vocabulary import FlatVocabulary, build_hash_table
+from fjlc.main import LexiconClassifier
+
+
+class ModelArtifactTest(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.model_file = os.path.join(self.directory, "model.fjlc")
+        self.classifier = LexiconClassifier()
+        self.classifier.compile_model(self.model_file)
+        self.tweets = list(SyntheticCorpus(seed=5).generate_tweets(1000))
+        self.tweets.extend(["you have a very great day!", "a very bad bitch", "not very good?", ""])
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def test_model_matches_json_files(self):
+        with LexiconClassifier(model=self.model_file) as compiled:
+            self.assertEqual(self.classifier.fingerprint, compiled.fingerprint)
+            self.assertEqual(list(self.classifier.prior_polarity_lexicon.get_subjective_words()),
+                             list(compiled.prior_polarity_lexicon.get_subjective_words()))
+            self.assertEqual(self.classifier.classifier.phrase_tree.flatten(),
+                             compiled.classifier.phrase_tree.flatten())
+
+            expected = self.classifier.calculate_sentiment(self.tweets)
+            self.assertEqual(expected, compiled.calculate_sentiment(self.tweets))
+            self.assertEqual(expected, compiled.calculate_sentiment_batch(self.tweets, jobs=2, chunksize=100))
+
+    def test_mapped_model_matches_loaded_model(self):
+        expected = self.classifier.calculate_sentiment(self.tweets)
+        with LexiconClassifier(model=self.model_file, share_memory=True) as mapped:
+            self.assertEqual(self.classifier.fingerprint, mapped.fingerprint)
+            self.assertEqual(expected, mapped.calculate_sentiment(self.tweets))
+            self.assertEqual(expected, mapped.calculate_sentiment_batch(self.tweets, jobs=2, chunksize=100))
+
+            # The lexicon of a mapped model is read from its vocabulary and phrase values
+            lexicon = self.classifier.prior_polarity_lexicon
+            mapped_lexicon = mapped.prior_polarity_lexicon
+            self.assertEqual(dict(lexicon.get_lexicon()), dict(mapped_lexicon.get_lexicon()))
+            self.assertEqual(len(list(lexicon.get_subjective_words())), len(mapped_lexicon))
+            self.assertIn("birthday", mapped.classifier.phrase_tree.vocabulary)
+            self.assertFalse(mapped_lexicon.has_token("birthday"))
+
+            vocabulary = self.classifier.classifier.phrase_tree.vocabulary
+            mapped_vocabulary = mapped.classifier.phrase_tree.vocabulary
+            self.assertEqual(vocabulary.get_token_list(), mapped_vocabulary.get_token_list())
+            for token in vocabulary.get_token_list():
+                self.assertEqual(vocabulary.get_id(token), mapped_vocabulary.get_id(token))
+            self.assertIsNone(mapped_vocabulary.get_id("not a phrase of the lexicon"))
+
+    def test_shared_workers_without_model(self):
+        expected = self.classifier.calculate_sentiment(self.tweets)
+        with LexiconClassifier(share_memory=True) as classifier:
+            self.assertEqual(expected, classifier.calculate_sentiment_batch(self.tweets, jobs=2, chunksize=100))
+            worker_model = classifier.active_model.worker_model
+            self.assertTrue(os.path.exists(worker_model))
+        self.assertFalse(os.path.exists(worker_model))
+
+    def test_flat_vocabulary(self):
+        tokens = ["", "a", "smørbrød", "||:)||", "a b", "ab"] + ["token%d" % i for i in range(100)]
+        encoded_tokens = [token.encode("utf-8") for token in tokens]
+        token_offsets = [0]
+        for data in encoded_tokens:
+            token_offsets.append(token_offsets[-1] + len(data) + 1)
+
+        for cache_size in [0, 10]:
+            vocabulary = FlatVocabulary(b"".join(data + b"\n" for data in encoded_tokens), token_offsets,
+                                        build_hash_table(encoded_tokens), cache_size)
+            self.assertEqual(len(tokens), len(vocabulary))
+            self.assertEqual(tokens, vocabulary.get_token_list())
+            for token_id, token in enumerate(tokens, 1):
+                self.assertEqual(token_id, vocabulary.get_id(token))
+                self.assertIn(token, vocabulary)
+            self.assertEqual(0, vocabulary.ids.get("b", 0))
+            self.assertNotIn("smorbrod", vocabulary)
+
+    def test_corrupt_model(self):
+        with open(self.model_file, "rb") as f:
+            content = bytearray(f.read())
+
+        corrupt = bytearray(content)
+        corrupt[-1] ^= 0xff
+        self.assert_not_loadable(corrupt, "checksum")
+
+        wrong_version = bytearray(content)
+        wrong_version[len(model_artifact.MAGIC)] += 1
+        self.assert_not_loadable(wrong_version, "version")
+
+        self.assert_not_loadable(b"{}" + content[2:], "Not a model")
+        self.assert_not_loadable(content[:10], "Not a model")
+
+    def assert_not_loadable(self, content, message):
+        with open(self.model_file, "wb") as f:
+            f.write(content)
+        with self.assertRaisesRegex(ValueError, message):
+            model_artifact.load_model(self.model_file)
+
+
+if __name__ == '__main__':
+    unittest.main()
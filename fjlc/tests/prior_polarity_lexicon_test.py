@@ -0,0 +1,65 @@
+import unittest
+
+import fjlc.main as main
+from fjlc.lexicon.container.prior_polarity_lexicon import FlatPolarityLexicon, PriorPolarityLexicon
+from fjlc.utils import json_utils
+
+
+class PriorPolarityLexiconTest(unittest.TestCase):
+
+    def setUp(self):
+        self.lexicon = json_utils.from_json_file(main.DEFAULT_LEXICON)
+        self.lexicon.update({"smørbrød": 1.5, "||:)||": 0.25, "a b": -3.0, "": 2.0})
+        self.prior_polarity_lexicon = PriorPolarityLexicon(dict(self.lexicon))
+
+    def test_flat_lexicon_matches_dict(self):
+        for cache_size in [0, 10]:
+            flat_lexicon = FlatPolarityLexicon.from_lexicon(self.lexicon, cache_size=cache_size)
+            self.assertEqual(len(self.lexicon), len(flat_lexicon))
+            self.assertEqual(list(self.prior_polarity_lexicon.get_subjective_words()),
+                             list(flat_lexicon.get_subjective_words()))
+            self.assertEqual(list(self.prior_polarity_lexicon.get_polarities()), list(flat_lexicon.get_polarities()))
+
+            for phrase, value in self.lexicon.items():
+                self.assertTrue(flat_lexicon.has_token(phrase))
+                self.assertEqual(value, flat_lexicon.get_token_polarity(phrase))
+            for phrase in ["smorbrod", "a", "b a", "not in the lexicon"]:
+                self.assertFalse(flat_lexicon.has_token(phrase))
+                with self.assertRaises(KeyError):
+                    flat_lexicon.get_token_polarity(phrase)
+
+    def test_views(self):
+        flat_lexicon = FlatPolarityLexicon.from_lexicon(self.lexicon)
+        for lexicon in [self.prior_polarity_lexicon, flat_lexicon]:
+            view = lexicon.get_lexicon()
+            self.assertEqual(self.lexicon, dict(view))
+            self.assertEqual(-3.0, view["a b"])
+            self.assertIn("smørbrød", view)
+            with self.assertRaises(TypeError):
+                view["a b"] = 1.0
+
+        # The view of a dict lexicon follows changes of the lexicon, it is not a copy
+        view = self.prior_polarity_lexicon.get_lexicon()
+        self.prior_polarity_lexicon.polarity_lexicon["new phrase"] = 1.0
+        self.assertEqual(1.0, view["new phrase"])
+
+    def test_single_precision(self):
+        flat_lexicon = FlatPolarityLexicon.from_lexicon({"good": 0.1, "bad": -2.5}, typecode="f")
+        self.assertAlmostEqual(0.1, flat_lexicon.get_token_polarity("good"), places=6)
+        self.assertEqual(-2.5, flat_lexicon.get_token_polarity("bad"))
+        self.assertLess(flat_lexicon.get_memory_usage(), FlatPolarityLexicon.from_lexicon(
+            {"good": 0.1, "bad": -2.5}).get_memory_usage())
+
+    def test_empty_lexicon(self):
+        flat_lexicon = FlatPolarityLexicon.from_lexicon({})
+        self.assertEqual(0, len(flat_lexicon))
+        self.assertEqual([], list(flat_lexicon.get_subjective_words()))
+        self.assertFalse(flat_lexicon.has_token("good"))
+
+    def test_memory_usage(self):
+        flat_lexicon = FlatPolarityLexicon.from_lexicon(self.lexicon)
+        self.assertLess(flat_lexicon.get_memory_usage(), self.prior_polarity_lexicon.get_memory_usage() / 2)
+
+
+if __name__ == '__main__':
+    unittest.main()
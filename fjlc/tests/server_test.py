@@ -0,0 +1,81 @@
+import asyncio
+import json
+import unittest
+
+from fjlc.main import LexiconClassifier
+from fjlc.server import SentimentService
+
+
+async def request(host, port, method, path, value=None):
+    reader, writer = await asyncio.open_connection(host, port)
+    body = b"" if value is None else json.dumps(value).encode("utf-8")
+    writer.write("{} {} HTTP/1.1\r\nHost: {}\r\nContent-Length: {}\r\nConnection: close\r\n\r\n".format(
+        method, path, host, len(body)).encode("latin-1") + body)
+    response = await reader.read()
+    writer.close()
+
+    head, _, body = response.partition(b"\r\n\r\n")
+    return int(head.split(b" ")[1]), json.loads(body.decode("utf-8"))
+
+
+class SentimentServiceTest(unittest.TestCase):
+
+    def setUp(self):
+        self.classifier = LexiconClassifier()
+        self.tweets = ["you have a great day", "a very bad bitch!", "not very good?", "", "I am happy!"] * 8
+
+    def test_concurrent_requests_are_batched(self):
+        async def scenario():
+            service = SentimentService(self.classifier, max_batch_size=16, max_wait=0.05)
+            host, port = await service.start("127.0.0.1", 0)
+            try:
+                responses = await asyncio.gather(*[request(host, port, "POST", "/classify", {"tweet": tweet})
+                                                   for tweet in self.tweets])
+                many = await request(host, port, "POST", "/classify", {"tweets": self.tweets[:3]})
+                health = await request(host, port, "GET", "/health")
+                stats = await request(host, port, "GET", "/stats")
+                errors = [await request(host, port, "POST", "/classify", {"text": "no tweet"}),
+                          await request(host, port, "GET", "/classify"),
+                          await request(host, port, "GET", "/unknown")]
+            finally:
+                await service.close()
+            return responses, many, health, stats, errors
+
+        responses, many, health, stats, errors = asyncio.run(scenario())
+
+        expected = [{"classification": self.classifier.classify(tweet),
+                     "sentiment": self.classifier.calculate_sentiment(tweet)} for tweet in self.tweets]
+        self.assertEqual([(200, result) for result in expected], responses)
+        self.assertEqual((200, expected[:3]), many)
+        self.assertEqual((200, {"status": "ok"}), health)
+        self.assertEqual([400, 405, 404], [status for status, _ in errors])
+
+        status, stats = stats
+        self.assertEqual(len(self.tweets) + 3, stats["tweets"])
+        self.assertLess(stats["batches"], len(self.tweets))
+        self.assertEqual(stats["batches"], sum(stats["batch_size_histogram"].values()))
+        self.assertEqual(["1", "2", "4", "8", "16"], list(stats["batch_size_histogram"].keys()))
+        self.assertEqual(0, stats["queue_depth"])
+        self.assertEqual(1, stats["model_version"])
+        self.assertIsNone(stats["reload_error"])
+
+    def test_reload(self):
+        async def scenario():
+            service = SentimentService(self.classifier, max_batch_size=16, max_wait=0.05)
+            host, port = await service.start("127.0.0.1", 0)
+            try:
+                reload = await request(host, port, "POST", "/reload")
+                stats = await request(host, port, "GET", "/stats")
+                classified = await request(host, port, "POST", "/classify", {"tweet": self.tweets[0]})
+            finally:
+                await service.close()
+            return reload, stats, classified
+
+        reload, (_, stats), classified = asyncio.run(scenario())
+        self.assertEqual((200, {"version": 2}), reload)
+        self.assertEqual(2, stats["model_version"])
+        self.assertEqual(200, classified[0])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,103 @@
+import io
+import json
+import os
+import shutil
+import sys
+import tempfile
+import unittest
+from unittest import mock
+
+from fjlc import stream_classifier
+from fjlc.main import LexiconClassifier
+from fjlc.stream_classifier import classify_stream, read_tweets
+
+
+class StreamClassifierTest(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.output_file = os.path.join(self.directory, "classified.tsv")
+        self.tweets = ["you have a great day", "a very bad bitch!", "not very good?", "", "I am happy!"] * 20
+        with LexiconClassifier() as classifier:
+            self.expected = ["%s\t%r" % (classifier.classify(tweet), classifier.calculate_sentiment(tweet))
+                             for tweet in self.tweets]
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def write_input(self, file_name, lines):
+        input_file = os.path.join(self.directory, file_name)
+        with open(input_file, "w") as f:
+            f.writelines(line + "\n" for line in lines)
+        return input_file
+
+    def read_output(self):
+        with open(self.output_file) as f:
+            return f.read().splitlines()
+
+    def test_tsv(self):
+        input_file = self.write_input("tweets.tsv", ["%d\t%s" % (i, tweet) for i, tweet in enumerate(self.tweets)])
+        stream_classifier.main([input_file, "-o", self.output_file, "--tweet-index", "1"])
+        self.assertEqual(self.expected, self.read_output())
+
+    def test_jsonl(self):
+        lines = []
+        for i, tweet in enumerate(self.tweets):
+            value = [{"text": tweet}, [i, tweet], tweet][i % 3]
+            lines.append(json.dumps(value))
+        input_file = self.write_input("tweets.jsonl", lines)
+        stream_classifier.main([input_file, "-o", self.output_file, "--tweet-index", "1"])
+        self.assertEqual(self.expected, self.read_output())
+
+    def test_stdin(self):
+        stdin = io.StringIO("".join(tweet + "\n" for tweet in self.tweets if tweet))
+        with mock.patch.object(sys, "stdin", stdin), mock.patch.object(sys, "stdout", io.StringIO()) as stdout:
+            stream_classifier.main([])
+        self.assertEqual([line for tweet, line in zip(self.tweets, self.expected) if tweet],
+                         stdout.getvalue().splitlines())
+
+    def test_order_with_jobs(self):
+        output = io.StringIO()
+        with LexiconClassifier() as classifier:
+            self.assertEqual(len(self.tweets), classify_stream(classifier, iter(self.tweets), output, jobs=2,
+                                                               chunksize=7))
+        self.assertEqual(self.expected, output.getvalue().splitlines())
+
+    def test_blank_lines(self):
+        lines = ["", '{"text": "good"}', "  ", "\r", '"bad"']
+        self.assertEqual([None, "good", None, None, "bad"], list(read_tweets([line + "\n" for line in lines], "jsonl")))
+        self.assertEqual([None, "good", None], list(read_tweets(["\n", "1\tgood\n", "\n"], "tsv", 1)))
+
+    def test_output_lines_match_input_lines(self):
+        lines = ["\t".join([str(i), tweet]) if i % 7 else "" for i, tweet in enumerate(self.tweets)]
+        expected = [line if i % 7 else "\t" for i, line in enumerate(self.expected)]
+        input_file = self.write_input("tweets.tsv", lines)
+        for jobs in ["1", "2"]:
+            stream_classifier.main([input_file, "-o", self.output_file, "--tweet-index", "1", "--jobs", jobs,
+                                    "--chunksize", "3"])
+            self.assertEqual(expected, self.read_output())
+
+    def test_malformed_lines(self):
+        lines = ['{"text": "good"}', "null", "42", '{"text": null}', '{"id": 1}', "[1]", "{truncated", '"bad"']
+        with self.assertRaisesRegex(ValueError, "line 2"):
+            list(read_tweets(lines, "jsonl"))
+
+        invalid = []
+        tweets = read_tweets(lines, "jsonl", 1, on_invalid=lambda line_number, message: invalid.append(line_number))
+        self.assertEqual(["good", None, None, None, None, None, None, "bad"], list(tweets))
+        self.assertEqual([2, 3, 4, 5, 6, 7], invalid)
+
+        input_file = self.write_input("tweets.jsonl", lines)
+        with mock.patch.object(sys, "stderr", io.StringIO()) as stderr:
+            stream_classifier.main([input_file, "-o", self.output_file, "--skip-invalid"])
+        output = self.read_output()
+        self.assertEqual(["\t"] * 6, output[1:7])
+        self.assertEqual(["POSITIVE", "NEGATIVE"], [output[0].split("\t")[0], output[7].split("\t")[0]])
+        self.assertIn("Skipped 6 invalid lines", stderr.getvalue())
+
+        with self.assertRaisesRegex(ValueError, "line 2"):
+            stream_classifier.main([input_file, "-o", self.output_file])
+
+
+if __name__ == '__main__':
+    unittest.main()
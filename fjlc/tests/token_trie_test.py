@@ -1,3 +1,4 @@
+import random
 import unittest
 
 from fjlc.lexicon.container.prior_polarity_lexicon import PriorPolarityLexicon
@@ -5,11 +6,53 @@ from fjlc.lexicon.container.token_trie import TokenTrie
 from os import path
 
 
+def reference_optimal_tokenization(trie, tokens):
+    """
+    The original quadratic phrase search and overlap removal, kept as a reference for the current implementation
+    """
+    token_ranges = []
+    for i in range(len(tokens)):
+        for j in range(i + 1, len(tokens) + 1):
+            status = trie.has_tokens(tokens[i:j])
+            if status is True:
+                token_ranges.append(TokenTrie.Token(tokens[i:j], i, j - 1))
+            elif status is False:
+                break
+
+    token_ranges.sort()
+    for offset in range(1, len(token_ranges)):
+        to_be_removed = []
+        for candidate in token_ranges[offset:]:
+            for i in range(offset):
+                if token_ranges[i].overlaps_with(candidate):
+                    to_be_removed.append(candidate)
+                    break
+
+        token_ranges = [token for token in token_ranges if token not in to_be_removed]
+    token_ranges.sort(key=lambda token: token.get_start_index())
+
+    tokenized_sentence = []
+    set_index = 0
+    for token in token_ranges:
+        while set_index < token.get_start_index():
+            tokenized_sentence.append(tokens[set_index])
+            set_index += 1
+        tokenized_sentence.append(" ".join(token.get_token_sequence()))
+        set_index = token.get_end_index() + 1
+
+    while set_index < len(tokens):
+        tokenized_sentence.append(tokens[set_index])
+        set_index += 1
+
+    return tokenized_sentence
+
+
 class TokenTest(unittest.TestCase):
 
     def setUp(self):
         lexicon = path.join(path.abspath(path.dirname(__file__)), "../res/data/lexicon.pmi.json")
         prior_polarity_lexicon = PriorPolarityLexicon(lexicon)
+        self.phrases = sorted(prior_polarity_lexicon.get_subjective_words())
         self.phrase_tree = TokenTrie(prior_polarity_lexicon.get_subjective_words())
         self.tweet = "you have a great day"
 
@@ -29,6 +72,45 @@ class TokenTest(unittest.TestCase):
         optimal = self.phrase_tree.find_optimal_allocation(self.tweet.split(" "))
         self.assertEqual([self.tweet.split(" ")], list(map(lambda token: token.token_sequence, optimal)))
 
+    def test_optimal_tokenization_matches_reference(self):
+        rand = random.Random(42)
+        vocabulary = ["a", "b", "c", "d", "e", "f", "||x||", "||#y||"]
+        phrases = {" ".join(rand.choice(vocabulary) for _ in range(rand.randint(1, 5))) for _ in range(60)}
+        trie = TokenTrie(phrases)
+
+        for _ in range(20000):
+            tokens = [rand.choice(vocabulary + ["g", ""]) for _ in range(rand.randint(0, 30))]
+            self.assertEqual(reference_optimal_tokenization(trie, tokens), trie.find_optimal_tokenization(tokens))
+
+    def test_optimal_tokenization_matches_reference_on_lexicon(self):
+        rand = random.Random(1337)
+        for _ in range(5000):
+            tokens = []
+            for _ in range(rand.randint(0, 10)):
+                words = rand.choice(self.phrases).split(" ")
+                tokens.extend(words[rand.randint(0, len(words) - 1):])
+            self.assertEqual(reference_optimal_tokenization(self.phrase_tree, tokens),
+                             self.phrase_tree.find_optimal_tokenization(tokens))
+
+    def test_optimal_phrase_ids_match_tokenization(self):
+        rand = random.Random(7)
+        vocabulary = ["a", "b", "c", "d", "e", "f"]
+        phrases = {" ".join(rand.choice(vocabulary) for _ in range(rand.randint(1, 4))) for _ in range(40)}
+        trie = TokenTrie(phrases)
+
+        for _ in range(5000):
+            tokens = [rand.choice(vocabulary + ["g"]) for _ in range(rand.randint(0, 20))]
+            phrase_ids = trie.find_optimal_phrase_ids(trie.get_token_ids(tokens, add=True))
+            self.assertEqual(trie.find_optimal_tokenization(tokens),
+                             [trie.vocabulary.get_token(phrase_id) for phrase_id in phrase_ids])
+
+    def test_unknown_tokens_map_to_zero(self):
+        trie = TokenTrie(["state of the art"])
+        self.assertEqual([trie.vocabulary.get_id("state"), 0], trie.get_token_ids(["state", "unknown"]))
+        self.assertNotIn("unknown", trie.vocabulary)
+        self.assertEqual([trie.vocabulary.get_id("state of the art"), 0],
+                         trie.find_optimal_phrase_ids(trie.get_token_ids(["state", "of", "the", "art", "unknown"])))
+
 
 if __name__ == '__main__':
     unittest.main()
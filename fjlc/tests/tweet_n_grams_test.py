@@ -0,0 +1,135 @@
+import math
+import os
+import shutil
+import tempfile
+import unittest
+
+import fjlc.main as main
+from fjlc.benchmarks.synthetic_corpus import SyntheticCorpus
+from fjlc.preprocessing.preprocessors.n_gram_counts import NGramCounts
+from fjlc.preprocessing.preprocessors.tweet_n_grams_pmi import TweetNGramsPMI, add_tweet, filter_n_grams
+from fjlc.utils import json_utils
+from fjlc.utils.reader.line_reader import LineReader
+
+
+class TweetNGramsPMITest(unittest.TestCase):
+
+    def setUp(self):
+        self.options, canonical_dictionary = main.load_settings()
+        self.filters = main.N_GRAM_FILTERS.with_canonical_dictionary(canonical_dictionary).compile()
+        self.directory = tempfile.mkdtemp()
+        self.tweets_file = os.path.join(self.directory, "tweets.txt")
+        with open(self.tweets_file, "w") as f:
+            for tweet in SyntheticCorpus(seed=4).generate_tweets(2000):
+                f.write(tweet + "\n")
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def get_frequent_n_grams(self, jobs):
+        return TweetNGramsPMI(self.options).get_frequent_n_grams(LineReader(self.tweets_file), 3, 0.002, 0.5,
+                                                                 self.filters, jobs)
+
+    def get_pruned_n_grams(self, tweets, prune_interval):
+        return TweetNGramsPMI(self.options, prune_interval=prune_interval).get_frequent_n_grams(tweets, 3, 0.3, 0,
+                                                                                                self.filters)
+
+    def test_parallel_n_grams_match_serial(self):
+        serial = self.get_frequent_n_grams(1)
+        self.assertGreater(len(serial), 0)
+        for jobs in [2, 3]:
+            self.assertEqual(serial, self.get_frequent_n_grams(jobs))
+
+    def test_pruned_n_grams_do_not_depend_on_jobs(self):
+        late_file = os.path.join(self.directory, "late.txt")
+        with open(late_file, "w") as f:
+            f.writelines(["filler words\n"] * 1400 + ["late bloomer phrase\n"] * 600)
+
+        for file_name, min_frequency in [(self.tweets_file, 0.002), (late_file, 0.3)]:
+            serial = TweetNGramsPMI(self.options, prune_interval=100).get_frequent_n_grams(
+                LineReader(file_name), 3, min_frequency, 0.5, self.filters)
+            self.assertGreater(len(serial), 0)
+            for jobs in [2, 3]:
+                self.assertEqual(serial, TweetNGramsPMI(self.options, prune_interval=100).get_frequent_n_grams(
+                    LineReader(file_name), 3, min_frequency, 0.5, self.filters, jobs))
+
+    def test_spilled_n_grams_match_in_memory(self):
+        spill_directory = os.path.join(self.directory, "runs")
+        os.mkdir(spill_directory)
+        for prune_interval in [None, 100]:
+            in_memory = TweetNGramsPMI(self.options, prune_interval=prune_interval).get_frequent_n_grams(
+                LineReader(self.tweets_file), 3, 0.002, 0.5, self.filters)
+            for memory_budget, jobs in [(100000, 1), (1, 1), (100000, 2), (1, 2)]:
+                tweet_n_grams = TweetNGramsPMI(self.options, prune_interval=prune_interval,
+                                               memory_budget=memory_budget, spill_directory=spill_directory)
+                self.assertEqual(in_memory, tweet_n_grams.get_frequent_n_grams(LineReader(self.tweets_file), 3, 0.002,
+                                                                               0.5, self.filters, jobs))
+                self.assertEqual([], os.listdir(spill_directory))
+
+    def test_parallel_workers_spill(self):
+        tweet_n_grams = TweetNGramsPMI(self.options, memory_budget=1, spill_directory=self.directory)
+        try:
+            line_counter = tweet_n_grams.count_n_grams_in_parallel(self.tweets_file, 3, self.filters, 2)
+            # The workers spilled every count of their shards, the parent only holds the total
+            self.assertEqual(2000, line_counter)
+            self.assertEqual(0, len(tweet_n_grams.n_gram_counts))
+            self.assertGreater(tweet_n_grams.n_gram_counts.total, 0)
+            self.assertGreaterEqual(len(tweet_n_grams.run_files), 2)
+            for run_file in tweet_n_grams.run_files:
+                self.assertTrue(os.path.exists(run_file))
+        finally:
+            tweet_n_grams.remove_runs()
+
+    def test_pruning_misses_late_n_grams(self):
+        tweets = ["filler words"] * 1400 + ["late bloomer phrase"] * 600
+        exact = ["filler words", "late bloomer", "late bloomer phrase", "bloomer phrase"]
+        self.assertEqual(exact, self.get_pruned_n_grams(tweets, None))
+        self.assertEqual(exact, self.get_pruned_n_grams(tweets, 1000))
+        # Pruned at line 1500 with 99 of the 225 occurrences needed by then, it never reaches the minimum frequency
+        self.assertEqual(["filler words"], self.get_pruned_n_grams(tweets, 100))
+
+    def test_instances_are_independent(self):
+        first, second = TweetNGramsPMI(self.options), TweetNGramsPMI(self.options)
+        first.get_frequent_n_grams(["good day today", "bad day"], 2, 0, 0, self.filters)
+        second.get_frequent_n_grams(["a b c"], 2, 0, 0, self.filters)
+        self.assertEqual(1, first.n_gram_counts.get_count("good day"))
+        self.assertIsNone(second.n_gram_counts.get_count("good day"))
+
+    def test_counts_match_tree(self):
+        tweets = [self.filters.apply(tweet) for tweet in SyntheticCorpus(seed=9).generate_tweets(2000)]
+        for prune_interval in [10 ** 9, 300, 97]:
+            tree, counts = TweetNGramsPMI.NGramTree(), NGramCounts()
+            for i, tweet in enumerate(tweets, 1):
+                if i % prune_interval == 0:
+                    tree.prune_infrequent(math.ceil(0.004 * i / 2.))
+                    counts.prune_infrequent(math.ceil(0.004 * i / 2.))
+                add_tweet(tree, tweet, 3)
+                add_tweet(counts, tweet, 3)
+
+            limit = int(0.004 * len(tweets))
+            n_grams = tree.get_n_grams(limit, 0.5, self.options)
+            self.assertGreater(len(n_grams), 0)
+            self.assertEqual(n_grams, filter_n_grams(counts.get_frequent_phrases(limit), 0.5, self.options))
+            for n_gram in n_grams:
+                self.assertEqual(tree.get_node(n_gram).num_occurrences, counts.get_count(n_gram))
+
+    def test_pruning_frees_memory(self):
+        counts = NGramCounts()
+        for tweet in SyntheticCorpus(seed=9).generate_tweets(1000):
+            add_tweet(counts, self.filters.apply(tweet), 3)
+
+        n_grams, tokens, memory_usage = len(counts), len(counts.vocabulary), counts.get_memory_usage()
+        counts.prune_infrequent(3)
+        self.assertLess(len(counts), n_grams / 2)
+        self.assertLess(len(counts.vocabulary), tokens)
+        self.assertLess(counts.get_memory_usage(), memory_usage / 2)
+        self.assertTrue(all(count >= 3 for count in counts.counts.values()))
+
+    def test_generate_n_grams(self):
+        output_file = os.path.join(self.directory, "n_grams.json")
+        main.Lexicon.generate_n_grams(self.tweets_file, output_file, 3, 0.002, 0.5, jobs=2)
+        self.assertEqual(self.get_frequent_n_grams(1), json_utils.from_json_file(output_file))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,60 @@
+"""
+Bulk array operations of the lexicon finalization stage (sentiment values, thresholds and normalization), run with
+NumPy when it is installed (pip install fjlc[numpy]). Callers check use_numpy() and fall back to plain Python loops
+otherwise. NumPy is imported on first use, so classifying never pays for importing it.
+"""
+import functools
+
+# Whether to use NumPy when it is installed, see set_use_numpy
+enabled = True
+
+
+@functools.lru_cache(maxsize=None)
+def get_numpy():
+    """
+    :return: The numpy module, None if it is not installed
+    """
+    try:
+        import numpy
+    except ImportError:
+        return None
+    return numpy
+
+
+def use_numpy():
+    """
+    :return: Whether finalization stages should use the NumPy implementations
+    """
+    return enabled and get_numpy() is not None
+
+
+def set_use_numpy(use):
+    """
+    Enables or disables the NumPy implementations, e.g. to compare them with the plain Python implementations
+
+    :param use: Use NumPy if it is installed
+    """
+    global enabled
+    enabled = use
+
+
+def normalize_between(values, norm_min, norm_max):
+    """
+    Performs linear normalization of values between norm_min and norm_max, see map_utils.normalize_map_between
+
+    :param values: NumPy array of at least 2 values
+    :return: NumPy array of normalized values
+    """
+    map_min = values.min()
+    range_factor = (norm_max - norm_min) / float(values.max() - map_min)
+    return norm_min + (values - map_min) * range_factor
+
+
+def sentiment_values(num_positive, num_negative, ratio):
+    """
+    :param num_positive: NumPy array of the number of positive occurrences of n-grams
+    :param num_negative: NumPy array of the number of negative occurrences of n-grams
+    :param ratio: Ratio of negative to positive occurrences of all n-grams
+    :return: NumPy array of the log ratios of the n-grams, see lexicon_creator.calculate_lexicon
+    """
+    return get_numpy().log(ratio * num_positive / num_negative)
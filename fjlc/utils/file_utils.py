@@ -1,3 +1,6 @@
+import hashlib
+
+
 def count_lines(file_name):
     try:
         f = open(file_name)
@@ -14,5 +17,19 @@ def read_entire_file_into_string(file_name):
 
 
 def write_to_file(file, data):
-    with open(file) as f:
+    with open(file, "w") as f:
         f.write(data)
+
+
+def fingerprint_files(*file_names):
+    """
+    :param file_names: Paths of files
+    :return: Hex digest of the contents of the files, changes whenever one of the files changes
+    """
+    digest = hashlib.blake2b(digest_size=16)
+    for file_name in file_names:
+        with open(file_name, "rb") as f:
+            for block in iter(lambda: f.read(1 << 16), b""):
+                digest.update(block)
+        digest.update(b"\0")
+    return digest.hexdigest()
@@ -1,3 +1,6 @@
+from fjlc.utils import array_utils
+
+
 def sort_map_by_value(dictionary):
     """
     Sorts Map by value. Map values must implement Comparable.
@@ -5,7 +8,7 @@ def sort_map_by_value(dictionary):
     :param dictionary: Map to sort 
     :return: Sorted map 
     """
-    return sorted(dictionary, key=dictionary.get)
+    return dict(sorted(dictionary.items(), key=lambda item: item[1]))
 
 
 def normalize_map_between(dictionary, norm_min, norm_max):
@@ -20,6 +23,10 @@ def normalize_map_between(dictionary, norm_min, norm_max):
     if len(dictionary) < 2:
         return {}
 
+    if array_utils.use_numpy():
+        values = array_utils.get_numpy().fromiter(dictionary.values(), float, len(dictionary))
+        return dict(zip(dictionary, array_utils.normalize_between(values, norm_min, norm_max).tolist()))
+
     values = list(dictionary.values())
 
     norm_range = norm_max - norm_min
@@ -0,0 +1,177 @@
+import time
+from contextlib import contextmanager
+
+# Number of lines a counting loop processes between each update of its BuildMetrics
+UPDATE_INTERVAL = 1000
+
+
+class BuildMetrics:
+    """
+    Progress and throughput telemetry of a long running build, such as lexicon creation or n-gram mining. Counting
+    loops time their stages with local clocks and add lines, bytes and stage times in batches of UPDATE_INTERVAL lines,
+    and a report is passed to the callback (and written as a log line) at most once every report_interval seconds, so
+    the telemetry costs next to nothing and can be left on in production batch jobs.
+
+    A report is a dictionary with:
+     * lines, bytes: Number of lines and bytes processed so far
+     * elapsed: Seconds since start
+     * lines_per_second, bytes_per_second: Average throughput since start
+     * progress: Percentage of the input processed, None if the input size is unknown
+     * eta: Estimated number of seconds left, None if unknown
+     * stage_times: Map of stage name to seconds spent in it, summed over all worker processes
+     * peak_sizes: Map of counter name to the largest size it reached
+     * finished: Whether the build is done
+    """
+
+    def __init__(self, callback=None, log_file=None, report_interval=10.0):
+        """
+        :param callback: Function called with every report, None for no callback
+        :param log_file: Stream to write a log line for every report to, such as sys.stderr, None for no log
+        :param report_interval: Minimum number of seconds between two reports
+        """
+        self.callback = callback
+        self.log_file = log_file
+        self.report_interval = report_interval
+        self.lines = 0
+        self.bytes = 0
+        self.total_bytes = None
+        self.get_position = None
+        self.stage_times = {}
+        self.peak_sizes = {}
+        self.finished = False
+        self.start_time = self.last_report = self.end_time = time.monotonic()
+
+    def start(self, total_bytes=None, get_position=None):
+        """
+        Starts the clock of the build
+
+        :param total_bytes: Size of the input in bytes, None if unknown
+        :param get_position: Function returning the number of bytes of the input read so far, for inputs that are
+                             read in this process. Bytes added with add are counted on top of it.
+        """
+        self.total_bytes = total_bytes
+        self.get_position = get_position
+        self.finished = False
+        self.start_time = self.last_report = time.monotonic()
+
+    def add(self, lines=0, num_bytes=0, stage_times=None):
+        """
+        Adds processed lines and bytes, and the seconds spent per stage processing them
+        """
+        self.lines += lines
+        self.bytes += num_bytes
+        if stage_times is not None:
+            for stage, seconds in stage_times.items():
+                self.add_stage_time(stage, seconds)
+        self.report_if_due()
+
+    def add_stage_time(self, stage, seconds):
+        self.stage_times[stage] = self.stage_times.get(stage, 0.0) + seconds
+
+    @contextmanager
+    def stage(self, name):
+        """
+        Context manager adding the time spent in its body to stage name
+        """
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add_stage_time(name, time.perf_counter() - start)
+
+    def record_size(self, name, size):
+        """
+        Records the current size of a counter, keeping the largest size seen
+        """
+        if size > self.peak_sizes.get(name, 0):
+            self.peak_sizes[name] = size
+
+    def merge(self, other):
+        """
+        Adds the lines, bytes and stage times of the BuildMetrics of a worker process, and takes the peak of its sizes
+        """
+        for name, size in other.peak_sizes.items():
+            self.record_size(name, size)
+        self.add(other.lines, other.bytes, other.stage_times)
+
+    def get_bytes(self):
+        return self.bytes + (self.get_position() if self.get_position is not None else 0)
+
+    def get_report(self):
+        elapsed = (self.end_time if self.finished else time.monotonic()) - self.start_time
+        num_bytes = self.get_bytes()
+
+        progress = eta = None
+        if self.finished:
+            progress, eta = 100.0, 0.0
+        elif self.total_bytes:
+            progress = min(100.0, 100.0 * num_bytes / self.total_bytes)
+            if num_bytes > 0:
+                eta = elapsed * (self.total_bytes - num_bytes) / num_bytes
+
+        return {
+            "lines": self.lines,
+            "bytes": num_bytes,
+            "elapsed": elapsed,
+            "lines_per_second": self.lines / elapsed if elapsed > 0 else 0.0,
+            "bytes_per_second": num_bytes / elapsed if elapsed > 0 else 0.0,
+            "progress": progress,
+            "eta": eta,
+            "stage_times": dict(self.stage_times),
+            "peak_sizes": dict(self.peak_sizes),
+            "finished": self.finished,
+        }
+
+    def report_if_due(self):
+        if time.monotonic() - self.last_report >= self.report_interval:
+            self.report()
+
+    def report(self):
+        """
+        Passes a report to the callback and writes it to the log, if any
+        """
+        self.last_report = time.monotonic()
+        if self.callback is None and self.log_file is None:
+            return
+
+        report = self.get_report()
+        if self.callback is not None:
+            self.callback(report)
+        if self.log_file is not None:
+            self.log_file.write(format_report(report) + "\n")
+            self.log_file.flush()
+
+    def finish(self):
+        """
+        Marks the build as done, which stops the clock, and sends the final report
+        """
+        self.end_time = time.monotonic()
+        self.finished = True
+        self.report()
+
+
+def format_report(report):
+    """
+    :param report: Report of BuildMetrics.get_report
+    :return: Single line summary of report
+    """
+    line = "{} lines ({:.0f}/s), {:.1f} MB ({:.2f} MB/s)".format(
+        report["lines"], report["lines_per_second"], report["bytes"] / 1e6, report["bytes_per_second"] / 1e6)
+    if report["progress"] is not None:
+        line += ", {:.1f}%".format(report["progress"])
+    if report["eta"] is not None:
+        line += ", ETA " + format_seconds(report["eta"])
+    if len(report["stage_times"]) > 0:
+        line += " | " + " ".join("{} {:.1f}s".format(stage, seconds)
+                                 for stage, seconds in report["stage_times"].items())
+    if len(report["peak_sizes"]) > 0:
+        line += " | peak " + " ".join("{} {}".format(name, size) for name, size in report["peak_sizes"].items())
+    return line
+
+
+def format_seconds(seconds):
+    """
+    :return: seconds formatted as minutes and seconds, "mm:ss"
+    """
+    minutes, seconds = divmod(int(seconds), 60)
+    return "{:02d}:{:02d}".format(minutes, seconds)
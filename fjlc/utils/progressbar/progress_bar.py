@@ -0,0 +1,48 @@
+import sys
+
+from fjlc.utils.progressbar.build_metrics import format_seconds
+
+FULL_PROGRESS = "|" * 100
+NO_PROGRESS = "-" * 100
+
+
+class ProgressBar:
+    """
+    Prints the progress of a build in a nicely formatted ASCII progress bar. Used as the callback of a BuildMetrics,
+    which decides how often the bar is redrawn.
+    """
+
+    def __init__(self, task_name, stream=sys.stderr):
+        """
+        :param task_name: Name of the task, is printed right before the progress bar
+        :param stream: Stream to print the progress bar to
+        """
+        self.task_name = task_name
+        self.stream = stream
+        self.started = False
+
+    def __call__(self, report):
+        if not self.started:
+            self.stream.write(self.task_name + "\n")
+            self.started = True
+
+        self.stream.write("\r" + get_progress(report))
+        if report["finished"]:
+            self.stream.write("\n\n")
+        self.stream.flush()
+
+
+def get_progress(report):
+    """
+    :param report: Report of BuildMetrics.get_report
+    :return: Progress bar with elapsed and remaining time
+    """
+    time_remaining = "Infin" if report["eta"] is None else format_seconds(report["eta"])
+    return get_progress_bar(report["progress"] or 0.0) + " Elapsed: " + format_seconds(report["elapsed"]) + \
+        " | Remaining: " + time_remaining
+
+
+def get_progress_bar(percent):
+    bar = FULL_PROGRESS[:int(percent)] + NO_PROGRESS[int(percent):]
+    status = "Finish" if percent >= 100 else "{:05.2f}%".format(percent)
+    return "[" + bar[:46] + " " + status + " " + bar[54:] + "]"
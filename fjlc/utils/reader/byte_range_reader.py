@@ -0,0 +1,123 @@
+import io
+import mmap
+import os
+
+
+def split_into_byte_ranges(file_name, num_ranges):
+    """
+    Splits a file into contiguous byte ranges of about equal size that start and end at line boundaries, so that
+    reading the ranges one after another gives exactly the lines of the whole file, in order.
+
+    :param file_name: File to split
+    :param num_ranges: Requested number of ranges, fewer are returned for files with few lines
+    :return: List of (start, end) byte offsets, end exclusive
+    """
+    size = os.path.getsize(file_name)
+    boundaries = [0]
+    with open(file_name, "rb") as f:
+        for i in range(1, num_ranges):
+            offset = size * i // num_ranges
+            if offset <= boundaries[-1]:
+                continue
+
+            # A range never starts in the middle of a line
+            boundary = align_to_line(f, offset, size)
+            if boundaries[-1] < boundary < size:
+                boundaries.append(boundary)
+    boundaries.append(size)
+
+    return [(boundaries[i], boundaries[i + 1]) for i in range(len(boundaries) - 1) if boundaries[i] < size]
+
+
+def align_to_line(f, offset, size):
+    """
+    :param f: File opened in binary mode
+    :param offset: Byte offset in f
+    :param size: Size of f in bytes
+    :return: offset if a line starts there, otherwise the offset of the start of the next line (or size)
+    """
+    if offset <= 0:
+        return 0
+    if offset >= size:
+        return size
+
+    f.seek(offset - 1)
+    f.readline()
+    return f.tell()
+
+
+def align_byte_range(file_name, start, end):
+    """
+    Aligns a byte range to line boundaries: the aligned range holds exactly the lines that start in [start, end), so
+    the aligned ranges of consecutive byte ranges partition the lines of the file.
+
+    :param end: End offset, None for the end of the file
+    :return: Aligned (start, end) byte offsets, end exclusive
+    """
+    size = os.path.getsize(file_name)
+    end = size if end is None else min(end, size)
+    with open(file_name, "rb") as f:
+        start = align_to_line(f, start, size)
+        end = align_to_line(f, end, size)
+    return start, max(start, end)
+
+
+class ByteRange(io.RawIOBase):
+    """
+    Raw binary stream of the bytes [start, end) of a file
+    """
+
+    def __init__(self, file_name, start, end):
+        super(ByteRange, self).__init__()
+        self.file = open(file_name, "rb", buffering=0)
+        self.file.seek(start)
+        self.remaining = end - start
+        self.bytes_read = 0
+
+    def readable(self):
+        return True
+
+    def readinto(self, buffer):
+        size = min(len(buffer), self.remaining)
+        if size <= 0:
+            return 0
+        read = self.file.readinto(memoryview(buffer)[:size])
+        self.remaining -= read
+        self.bytes_read += read
+        return read
+
+    def close(self):
+        self.file.close()
+        super(ByteRange, self).close()
+
+
+class MappedRange(io.RawIOBase):
+    """
+    Raw binary stream of the bytes [start, end) of a memory-mapped file. Reads copy straight from the mapping, without
+    a system call per read.
+    """
+
+    def __init__(self, file_name, start, end):
+        super(MappedRange, self).__init__()
+        with open(file_name, "rb") as f:
+            self.map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        self.position = start
+        self.end = end
+        self.bytes_read = 0
+
+    def readable(self):
+        return True
+
+    def readinto(self, buffer):
+        size = min(len(buffer), self.end - self.position)
+        if size <= 0:
+            return 0
+        with memoryview(self.map) as view:
+            memoryview(buffer)[:size] = view[self.position:self.position + size]
+        self.position += size
+        self.bytes_read += size
+        return size
+
+    def close(self):
+        self.map.close()
+        super(MappedRange, self).close()
@@ -8,8 +8,16 @@ TAB_REGEX = re.compile("\t")
 
 class DataSetReader:
 
-    def __init__(self, file_name, tweet_index, class_index):
-        self.line_reader = LineReader(file_name)
+    def __init__(self, file_name, tweet_index, class_index, start=0, end=None):
+        """
+        Reads the entries of a tab separated dataset file, see LineReader for compressed files and byte ranges
+
+        :param tweet_index: Column of the tweets
+        :param class_index: Column of the classifications
+        :param start: Byte offset to start reading at
+        :param end: Byte offset to stop reading at, None for the end of the file
+        """
+        self.line_reader = LineReader(file_name, start, end)
         self.tweet_index = tweet_index
         self.class_index = class_index
 
@@ -22,11 +30,21 @@ class DataSetReader:
         return DataSetEntry(self.line_reader.__next__(), self.tweet_index, self.class_index)
 
     def __iter__(self):
-        return self
+        for line in self.line_reader:
+            yield DataSetEntry(line, self.tweet_index, self.class_index)
 
     def get_progress(self):
         return self.line_reader.get_progress()
 
+    def get_bytes_read(self):
+        return self.line_reader.get_bytes_read()
+
+    def is_splittable(self):
+        return self.line_reader.is_splittable()
+
+    def get_file_name(self):
+        return self.line_reader.file_name
+
 
 class DataSetEntry:
 
@@ -53,11 +71,11 @@ class Classification(Enum):
     @staticmethod
     def parse_classification_from_string(classification):
         if classification == "positive":
-            return Classification.POSITIVE.name
+            return Classification.POSITIVE
         if classification == "neutral":
-            return Classification.NEUTRAL.name
+            return Classification.NEUTRAL
         if classification == "negative":
-            return Classification.NEGATIVE.name
+            return Classification.NEGATIVE
 
     @staticmethod
     def classify_from_thresholds(value, low_thresh, high_thresh):
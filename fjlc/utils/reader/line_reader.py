@@ -1,24 +1,112 @@
-from fjlc.utils import file_utils
+import bz2
+import gzip
+import io
+import lzma
+import os
+
+from fjlc.utils.reader.byte_range_reader import ByteRange, MappedRange, align_byte_range
+
+# Decompressors of compressed files, by file extension
+DECOMPRESSORS = {
+    ".gz": lambda raw: gzip.GzipFile(fileobj=raw),
+    ".bz2": bz2.BZ2File,
+    ".xz": lzma.LZMAFile,
+}
+
+# Plain files (or byte ranges) of at least this many bytes are memory-mapped, unless told otherwise
+MMAP_MIN_SIZE = 64 << 20
 
 
 class LineReader:
 
-    def __init__(self, file_name):
-        self.total_lines = file_utils.count_lines(file_name)
-        self.file = open(file_name)
+    def __init__(self, file_name, start=0, end=None, use_mmap=None):
+        """
+        Reads the lines of a file in a single pass, decoded and split into lines exactly like open(file_name) does.
+        Files ending in .gz, .bz2 or .xz are decompressed on the fly. Progress is measured in bytes of the file read,
+        so the file is never read in advance.
+
+        :param file_name: File to read
+        :param start: Byte offset to start reading at, moved to the start of the next line if no line starts there
+        :param end: Byte offset to stop reading at, aligned like start, None for the end of the file. Consecutive byte
+                    ranges read all lines of the file exactly once, so they can be read by parallel readers.
+                    Compressed files can only be read as a whole.
+        :param use_mmap: Whether to memory-map a plain file, None to map byte ranges of at least MMAP_MIN_SIZE bytes
+        """
+        self.file_name = file_name
         self.line_counter = 0
 
+        decompressor = DECOMPRESSORS.get(os.path.splitext(file_name)[1].lower())
+        self.compressed = decompressor is not None
+        if self.compressed:
+            if start != 0 or end is not None:
+                raise ValueError("Can not read a byte range of compressed file " + file_name)
+            self.size = os.path.getsize(file_name)
+            self.raw = ByteRange(file_name, 0, self.size)
+            stream = decompressor(self.raw)
+        else:
+            start, end = align_byte_range(file_name, start, end)
+            self.size = end - start
+            if use_mmap is None:
+                use_mmap = self.size >= MMAP_MIN_SIZE
+            # Empty files can not be mapped
+            self.raw = MappedRange(file_name, start, end) if use_mmap and self.size > 0 else \
+                ByteRange(file_name, start, end)
+            stream = io.BufferedReader(self.raw)
+
+        self.file = io.TextIOWrapper(stream)
+        self.next_line = self.file.readline()
+        if self.next_line == "":
+            self.close()
+
+    def is_splittable(self):
+        """
+        :return: Whether the file can be read in byte ranges, see __init__
+        """
+        return not self.compressed
+
     def has_next(self):
-        return self.line_counter < self.total_lines
+        return self.next_line != ""
 
     def __next__(self):
         if not self.has_next():
             raise StopIteration
+        line = self.next_line
         self.line_counter += 1
-        return self.file.readline()
+        self.next_line = self.file.readline()
+        if self.next_line == "":
+            self.close()
+        return line
 
     def __iter__(self):
+        """
+        Iterates the remaining lines, faster than calling __next__ for every line. has_next is False once iteration
+        has started.
+        """
+        if not self.has_next():
+            return
+        line, self.next_line = self.next_line, ""
+        self.line_counter += 1
+        yield line
+
+        for line in self.file:
+            self.line_counter += 1
+            yield line
+        self.close()
+
+    def __enter__(self):
         return self
 
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def close(self):
+        self.file.close()
+
     def get_progress(self):
-        return 0 if self.total_lines else 100.0 * self.line_counter / self.total_lines
+        return 100.0 * self.get_bytes_read() / self.size if self.size else 100.0
+
+    def get_bytes_read(self):
+        """
+        :return: Number of bytes of the file (compressed bytes, for compressed files) read so far
+        """
+        return self.raw.bytes_read
@@ -0,0 +1,53 @@
+import itertools
+import os
+
+
+def get_num_jobs(jobs):
+    """
+    Resolves the number of worker processes to use
+
+    :param jobs: Requested number of jobs, None or a value smaller than 1 means one job per available core
+    :return: Number of jobs, at least 1
+    """
+    if jobs is None or jobs < 1:
+        return os.cpu_count() or 1
+    return jobs
+
+
+def chunks(iterable, chunksize):
+    """
+    Splits an iterable into lists of at most chunksize elements, consuming the iterable lazily
+
+    :param iterable: Iterable to split
+    :param chunksize: Maximum number of elements per chunk
+    :return: Generator of lists
+    """
+    iterator = iter(iterable)
+    while True:
+        chunk = list(itertools.islice(iterator, chunksize))
+        if len(chunk) == 0:
+            return
+        yield chunk
+
+
+def ordered_imap(pool, function, iterable, chunksize, max_pending_chunks):
+    """
+    Applies function to chunks of iterable in the pool and yields the results in input order. Unlike Pool.imap, the
+    input is consumed lazily: at most max_pending_chunks chunks are submitted but not yet yielded, which keeps memory
+    use bounded for arbitrarily long inputs.
+
+    :param pool: multiprocessing.Pool to run function in
+    :param function: Picklable function that takes a list of elements and returns a list of results
+    :param iterable: Elements to apply function to
+    :param chunksize: Number of elements sent to a worker at a time
+    :param max_pending_chunks: Maximum number of chunks in flight
+    :return: Generator of results, one per element in iterable
+    """
+    pending = []
+    for chunk in chunks(iterable, chunksize):
+        pending.append(pool.apply_async(function, (chunk,)))
+        if len(pending) >= max_pending_chunks:
+            yield from pending.pop(0).get()
+
+    for result in pending:
+        yield from result.get()
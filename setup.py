@@ -85,6 +85,7 @@ setup(
     extras_require={
         'dev': [],
         'test': [],
+        'numpy': ['numpy'],
     },
 
     # If there are data files included in your packages that need to be
@@ -108,7 +109,9 @@ setup(
     # pip to create the appropriate form of executable for the target platform.
     entry_points={
         'console_scripts': [
-    #        'sample=sample:main',
+            'fjlc-classify=fjlc.stream_classifier:main',
+            'fjlc-serve=fjlc.server:main',
+            'fjlc-compile=fjlc.classifier.model_artifact:main',
         ],
     },
 )